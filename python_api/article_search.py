@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Recherche plein texte dans sahaba-articles-detailles.json (index inversé persistant).
+
+L'index est construit une fois puis écrit dans ARTICLES_INDEX_DIR; aux
+démarrages suivants, il est rechargé en mémoire partagée (np.load en
+mmap_mode) tant que l'empreinte SHA-256 du corpus n'a pas changé: aucun
+re-tokenisation au redémarrage.
+
+Tokenisation:
+- français : minuscules, accents retirés (NFKD), élisions séparées
+  (l'Islam → islam), mots vides courants ignorés
+- arabe    : voyelles (tashkeel) et tatweel retirés, alif / ya / ta marbuta
+  normalisés; l'article « ال » est aussi retiré pour indexer la forme nue
+
+Score: BM25 sur des fréquences pondérées par champ (nom > titre > intertitres
+> texte), calculé à la construction et stocké dans les postings: une requête
+se réduit à quelques np.add.at sur des tableaux déjà en mémoire. Le dernier
+mot de la requête est aussi cherché comme préfixe (saisie en cours).
+
+Fichiers: terms.json (vocabulaire trié), term_offsets.npy / postings_docs.npy
+/ postings_scores.npy (postings CSR), doc_offsets.npy + docs.bin (articles en
+JSON, décodés un par un pour la projection des champs), meta.json (empreinte,
+écrit en dernier). Chaque index est un sous-répertoire versionné
+(<empreinte>-v<format>) construit à part puis renommé; le fichier CURRENT,
+remplacé atomiquement (os.replace), désigne la version publiée: un worker qui
+démarre pendant une reconstruction voit toujours un index complet.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import time
+import unicodedata
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+ARTICLES_PATH = Path(os.getenv(
+    "ARTICLES_PATH", str(Path(__file__).resolve().parent.parent / "sahaba-articles-detailles.json")))
+ARTICLES_INDEX_DIR = Path(os.getenv(
+    "ARTICLES_INDEX_DIR", str(Path(__file__).resolve().parent / "search_index")))
+
+INDEX_FORMAT_VERSION = 1
+# Tentatives de chargement si la version publiée est remplacée pendant la lecture
+LOAD_ATTEMPTS = 3
+
+# Poids des champs dans la fréquence des termes
+FIELD_WEIGHTS = {
+    "nom_francais": 5.0,
+    "nom_arabe": 5.0,
+    "titre_article": 3.0,
+    "section_titre": 2.0,
+    "introduction": 1.5,
+    "contenu": 1.0,
+    "conclusion": 1.0,
+}
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Nombre maximal de termes du vocabulaire couverts par un préfixe
+PREFIX_EXPANSION_LIMIT = 50
+PREFIX_MIN_LENGTH = 2
+
+DEFAULT_FIELDS = ("id", "nom_francais", "nom_arabe", "titre_article")
+
+FRENCH_STOPWORDS = frozenset("""
+a au aux avec ce ces d dans de des du elle en et il ils je l la le les leur lui m
+mais me meme n ne nous on ou par pas pour qu que qui s sa se ses son sur t ta te
+tu un une vous y est sont fut etait
+""".split())
+
+_ARABIC_DIACRITICS = re.compile("[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")
+_ARABIC_LETTERS = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",  # alif hamza / madda / wasla
+    "ى": "ي",  # alif maqsura → ya
+    "ة": "ه",  # ta marbuta → ha
+    "ؤ": "و",  # waw hamza
+    "ئ": "ي",  # ya hamza
+})
+_ARABIC_CHAR = re.compile("[\u0600-\u06FF]")
+_WORD = re.compile(r"\w+")
+
+
+class IndexUnavailable(Exception):
+    """Corpus ou index absent."""
+
+
+def normalize_token(word: str) -> Iterator[str]:
+    """Formes indexées d'un mot sans signes diacritiques arabes (zéro, une ou deux)."""
+    if _ARABIC_CHAR.search(word):
+        word = word.translate(_ARABIC_LETTERS)
+        yield word
+        if word.startswith("ال") and len(word) > 3:
+            yield word[2:]
+        return
+    folded = "".join(c for c in unicodedata.normalize("NFKD", word.casefold()) if not unicodedata.combining(c))
+    if folded and folded not in FRENCH_STOPWORDS and (len(folded) > 1 or folded.isdigit()):
+        yield folded
+
+
+def tokenize(text: str) -> List[str]:
+    # Les signes combinants (harakat, accents décomposés) couperaient les mots en \w+:
+    # forme composée et voyelles arabes retirées avant le découpage
+    text = _ARABIC_DIACRITICS.sub("", unicodedata.normalize("NFC", text or ""))
+    # \w+ coupe aussi sur l'apostrophe: « l'Islam » → « l », « islam »
+    return [token for word in _WORD.findall(text) for token in normalize_token(word)]
+
+
+def _article_fields(article: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+    """(champ pondéré, texte) pour tous les textes d'un article."""
+    for key, value in article.items():
+        if key in FIELD_WEIGHTS and isinstance(value, str):
+            yield key, value
+        elif isinstance(value, dict):
+            # Sections biographiques: {"titre": ..., "contenu": ...}
+            if isinstance(value.get("titre"), str):
+                yield "section_titre", value["titre"]
+            if isinstance(value.get("contenu"), str):
+                yield "contenu", value["contenu"]
+        elif isinstance(value, str) and key != "id":
+            yield "contenu", value
+
+
+def _corpus_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_index(articles: Sequence[Dict[str, Any]], directory: Path, digest: str) -> None:
+    """Construit et écrit l'index (meta.json en dernier: un index incomplet n'est jamais chargé)."""
+    weighted_tf: Dict[str, Dict[int, float]] = defaultdict(lambda: defaultdict(float))
+    lengths = np.zeros(len(articles))
+    for doc, article in enumerate(articles):
+        for field, text in _article_fields(article):
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                weighted_tf[token][doc] += weight
+                lengths[doc] += weight
+
+    n_docs = len(articles)
+    average_length = float(lengths.mean()) if n_docs else 1.0
+    terms = sorted(weighted_tf)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    docs: List[int] = []
+    scores: List[float] = []
+    for i, term in enumerate(terms):
+        postings = weighted_tf[term]
+        idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+        for doc, tf in sorted(postings.items()):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc] / average_length)
+            docs.append(doc)
+            scores.append(idf * tf * (BM25_K1 + 1) / (tf + norm))
+        offsets[i + 1] = len(docs)
+
+    directory.mkdir(parents=True, exist_ok=True)
+    meta_path = directory / "meta.json"
+    if meta_path.exists():
+        meta_path.unlink()
+    (directory / "terms.json").write_text(json.dumps(terms, ensure_ascii=False), encoding="utf-8")
+    np.save(directory / "term_offsets.npy", offsets)
+    np.save(directory / "postings_docs.npy", np.asarray(docs, dtype=np.int32))
+    np.save(directory / "postings_scores.npy", np.asarray(scores, dtype=np.float32))
+
+    blobs = [json.dumps(article, ensure_ascii=False).encode("utf-8") for article in articles]
+    doc_offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    doc_offsets[1:] = np.cumsum([len(b) for b in blobs])
+    np.save(directory / "doc_offsets.npy", doc_offsets)
+    (directory / "docs.bin").write_bytes(b"".join(blobs))
+
+    fields = sorted({key for article in articles for key in article})
+    ids = [article.get("id", i) for i, article in enumerate(articles)]
+    meta = {"format": INDEX_FORMAT_VERSION, "corpus_sha256": digest, "documents": n_docs,
+            "terms": len(terms), "fields": fields, "ids": ids}
+    meta_path.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+
+class ArticleIndex:
+    """Index chargé (tableaux en mmap) et opérations de recherche / pagination."""
+
+    def __init__(self, directory: Path):
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        self.meta = meta
+        self.fields: List[str] = meta["fields"]
+        self.ids: List[Any] = meta["ids"]
+        self._positions = {str(doc_id): i for i, doc_id in enumerate(self.ids)}
+        self.terms: List[str] = json.loads((directory / "terms.json").read_text(encoding="utf-8"))
+        self._term_ids = {term: i for i, term in enumerate(self.terms)}
+        self._term_offsets = np.load(directory / "term_offsets.npy", mmap_mode="r")
+        self._postings_docs = np.load(directory / "postings_docs.npy", mmap_mode="r")
+        self._postings_scores = np.load(directory / "postings_scores.npy", mmap_mode="r")
+        self._doc_offsets = np.load(directory / "doc_offsets.npy", mmap_mode="r")
+        self._docs = (np.memmap(directory / "docs.bin", dtype=np.uint8, mode="r")
+                      if (directory / "docs.bin").stat().st_size else np.zeros(0, dtype=np.uint8))
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    def document(self, position: int) -> Dict[str, Any]:
+        start, end = int(self._doc_offsets[position]), int(self._doc_offsets[position + 1])
+        return json.loads(self._docs[start:end].tobytes())
+
+    def project(self, position: int, fields: Sequence[str]) -> Dict[str, Any]:
+        article = self.document(position)
+        return {field: article[field] for field in fields if field in article}
+
+    def check_fields(self, fields: Iterable[str]) -> List[str]:
+        """Champs demandés, dans l'ordre; ValueError si l'un n'existe pas dans le corpus."""
+        fields = list(dict.fromkeys(f for f in fields if f))
+        unknown = [f for f in fields if f not in self.fields]
+        if unknown:
+            raise ValueError(f"Champs inconnus: {', '.join(unknown)} (disponibles: {', '.join(self.fields)})")
+        return fields
+
+    def position(self, doc_id: Any) -> Optional[int]:
+        return self._positions.get(str(doc_id))
+
+    def _expand(self, token: str) -> List[int]:
+        term = self._term_ids.get(token)
+        return [term] if term is not None else []
+
+    def _expand_prefix(self, prefix: str) -> List[int]:
+        start = bisect_left(self.terms, prefix)
+        matches = []
+        for i in range(start, min(start + PREFIX_EXPANSION_LIMIT, len(self.terms))):
+            if not self.terms[i].startswith(prefix):
+                break
+            matches.append(i)
+        return matches
+
+    def search(self, query: str, limit: int = 10, offset: int = 0,
+               prefix: bool = True) -> Tuple[int, List[Tuple[int, float]]]:
+        """(nombre total de documents trouvés, [(position, score)] de la page demandée).
+
+        Tous les mots de la requête doivent être présents (ET); le dernier peut
+        n'être qu'un préfixe si `prefix`.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return 0, []
+        scores = np.zeros(self.size, dtype=np.float64)
+        matched = np.zeros(self.size, dtype=np.int32)
+        for i, token in enumerate(tokens):
+            last = i == len(tokens) - 1
+            terms = self._expand(token)
+            if last and prefix and len(token) >= PREFIX_MIN_LENGTH:
+                terms = sorted(set(terms) | set(self._expand_prefix(token)))
+            hit = np.zeros(self.size, dtype=bool)
+            for term in terms:
+                start, end = int(self._term_offsets[term]), int(self._term_offsets[term + 1])
+                docs = self._postings_docs[start:end]
+                np.add.at(scores, docs, self._postings_scores[start:end])
+                hit[docs] = True
+            matched += hit
+        candidates = np.flatnonzero(matched == len(tokens))
+        total = len(candidates)
+        if total == 0 or offset >= total:
+            return total, []
+        wanted = min(total, offset + limit)
+        order = candidates[np.argsort(-scores[candidates], kind="stable")[:wanted]]
+        return total, [(int(p), float(scores[p])) for p in order[offset:wanted]]
+
+
+def _version_name(digest: str) -> str:
+    return f"{digest[:16]}-v{INDEX_FORMAT_VERSION}"
+
+
+def _published(directory: Path) -> Optional[Path]:
+    """Version désignée par CURRENT (None si aucun index n'est publié)."""
+    try:
+        name = (directory / "CURRENT").read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    return directory / name if name else None
+
+
+def _publish(directory: Path, version: Path) -> None:
+    pointer = directory / f".CURRENT-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    pointer.write_text(version.name, encoding="utf-8")
+    os.replace(pointer, directory / "CURRENT")
+
+
+def _remove_stale_versions(directory: Path, keep: Path) -> None:
+    # Les workers qui lisent encore une ancienne version gardent leurs mmaps (POSIX);
+    # sous Windows la suppression échoue et sera retentée au prochain build
+    for path in directory.iterdir():
+        if path.is_dir() and path != keep and not path.name.startswith(".build-"):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _load_current(directory: Path, digest: str) -> Optional[ArticleIndex]:
+    """Index publié s'il correspond au corpus (None sinon, à reconstruire)."""
+    for attempt in range(LOAD_ATTEMPTS):
+        version = _published(directory)
+        if version is None or version.name != _version_name(digest):
+            return None
+        try:
+            index = ArticleIndex(version)
+        except FileNotFoundError:
+            # Version remplacée et supprimée entre la lecture de CURRENT et celle des fichiers
+            time.sleep(0.05 * (attempt + 1))
+            continue
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[WARN] Index des articles illisible, reconstruction: {e}")
+            return None
+        meta = index.meta
+        if meta.get("format") == INDEX_FORMAT_VERSION and meta.get("corpus_sha256") == digest:
+            return index
+        return None
+    return None
+
+
+def load_or_build(corpus_path: Path = ARTICLES_PATH, directory: Path = ARTICLES_INDEX_DIR) -> Tuple[ArticleIndex, bool]:
+    """Charge l'index publié s'il correspond au corpus, sinon le reconstruit et le publie.
+
+    Retourne (index, reconstruit).
+    """
+    if not corpus_path.exists():
+        raise IndexUnavailable(f"Corpus introuvable: {corpus_path}")
+    digest = _corpus_digest(corpus_path)
+    directory.mkdir(parents=True, exist_ok=True)
+    index = _load_current(directory, digest)
+    if index is not None:
+        return index, False
+
+    version = directory / _version_name(digest)
+    if not (version / "meta.json").exists():
+        data = json.loads(corpus_path.read_text(encoding="utf-8"))
+        articles = data.get("articles", []) if isinstance(data, dict) else data
+        staging = directory / f".build-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        build_index(articles, staging, digest)
+        try:
+            staging.rename(version)
+        except OSError:
+            # Même version publiée par un autre worker entre-temps (complète: renommée après écriture)
+            shutil.rmtree(staging, ignore_errors=True)
+    _publish(directory, version)
+    _remove_stale_versions(directory, version)
+    return ArticleIndex(version), True
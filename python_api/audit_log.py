@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Journal d'audit des prédictions (append-only), écrit hors du chemin critique.
+
+`record()` ne fait qu'ajouter l'enregistrement dans un tampon circulaire en
+mémoire (aucune I/O): la latence des requêtes ne dépend pas du disque. Une
+tâche de fond vide le tampon par lots et les écrit dans un thread
+(asyncio.to_thread), vers:
+- jsonl  : fichiers JSON Lines compressés gzip, avec rotation par taille
+           (audit/predictions-AAAAMMJJ-HHMMSS-<pid>.jsonl.gz, un fichier par
+           worker, créé en mode exclusif); chaque lot est "flushé"
+           (Z_SYNC_FLUSH): un arrêt brutal ne perd que le lot en cours
+- sqlite : table `predictions` (mode WAL), un INSERT groupé par lot
+
+Le scoring en masse (flux, colonnaire, jobs) passe par `record_batch()`: le
+lot entier, en colonnes, rejoint une file de lots bornée en lignes
+(AUDIT_QUEUE_ROWS) et n'est sérialisé que par le thread d'écriture: en flux
+Arrow IPC (audit/batches-AAAAMMJJ-HHMMSS-<pid>.arrows, colonnes telles
+quelles, aucun objet Python par ligne) si pyarrow est installé, sinon en
+enregistrements dans le journal principal. Quand la file est pleine, l'appelant (thread du threadpool ou
+worker de job, jamais l'event loop) attend que le vidage libère de la place:
+aucun score de masse n'est perdu, le débit s'aligne sur celui du disque.
+Le temps d'attente est exposé dans `backpressure_seconds`.
+
+Pour /predict et /batch_predict, si le disque ne suit pas, le tampon
+(AUDIT_BUFFER_SIZE) écarte les enregistrements les plus anciens plutôt que
+de ralentir la requête. La perte
+n'est jamais silencieuse: elle est comptée dans `dropped` (/metrics,
+audit_records_total{result="dropped"}), signalée dans les logs et inscrite
+dans le journal lui-même (ligne {"event": "dropped"} en JSON Lines, table
+`audit_gaps` en SQLite) à l'endroit du trou.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Any, Callable, Deque, Dict, List, Mapping, Optional
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    pa = None
+
+AUDIT_ENABLED = os.getenv("AUDIT_LOG_ENABLED", "1").lower() not in ("0", "false", "no")
+AUDIT_BACKEND = os.getenv("AUDIT_BACKEND", "jsonl")
+AUDIT_DIR = Path(os.getenv("AUDIT_DIR", str(Path(__file__).resolve().parent / "audit")))
+AUDIT_BUFFER_SIZE = int(os.getenv("AUDIT_BUFFER_SIZE", "20000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "1000"))
+AUDIT_QUEUE_ROWS = int(os.getenv("AUDIT_QUEUE_ROWS", "100000"))
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "1.0"))
+AUDIT_MAX_FILE_BYTES = int(os.getenv("AUDIT_MAX_FILE_BYTES", str(64 * 1024 * 1024)))
+
+BACKENDS = ("jsonl", "sqlite")
+# Attente maximale entre deux vérifications que la tâche de vidage tourne toujours
+BACKPRESSURE_CHECK_SECONDS = 0.5
+
+FlushObserver = Callable[[float, int], None]
+
+
+class JsonlSink:
+    """Fichiers .jsonl.gz en ajout seul, rotation quand la taille brute dépasse `max_bytes`."""
+
+    def __init__(self, directory: Path, max_bytes: int = AUDIT_MAX_FILE_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._file: Optional[IO[bytes]] = None
+        self._written = 0
+
+    def _open(self) -> IO[bytes]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+        # pid dans le nom + création exclusive ("xb"): deux workers n'écrivent jamais le même fichier
+        name = f"predictions-{stamp}-{os.getpid()}"
+        suffix = 0
+        while True:
+            path = self.directory / (f"{name}.jsonl.gz" if suffix == 0 else f"{name}-{suffix}.jsonl.gz")
+            try:
+                file = gzip.open(path, "xb", compresslevel=6)
+                break
+            except FileExistsError:
+                suffix += 1
+        self._written = 0
+        return file
+
+    def write_gap(self, timestamp: float, dropped: int) -> None:
+        self.write([{"ts": timestamp, "event": "dropped", "count": dropped}])
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        if self._file is None or self._written >= self.max_bytes:
+            self.close()
+            self._file = self._open()
+        payload = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records).encode("utf-8")
+        self._file.write(payload)
+        self._file.flush(zlib.Z_SYNC_FLUSH)
+        self._written += len(payload)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ArrowBatchSink:
+    """Lots de masse en flux Arrow IPC (.arrows), rotation par taille; colonnes écrites telles quelles."""
+
+    def __init__(self, directory: Path, max_bytes: int = AUDIT_MAX_FILE_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._file: Optional[IO[bytes]] = None
+        self._writer: Any = None
+        self._schema: Any = None
+        self._written = 0
+
+    def _open(self, schema: Any) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+        name = f"batches-{stamp}-{os.getpid()}"
+        suffix = 0
+        while True:
+            path = self.directory / (f"{name}.arrows" if suffix == 0 else f"{name}-{suffix}.arrows")
+            try:
+                self._file = open(path, "xb")
+                break
+            except FileExistsError:
+                suffix += 1
+        self._writer = pa.ipc.new_stream(self._file, schema)
+        self._schema = schema
+        self._written = 0
+
+    @staticmethod
+    def _column(values: Any) -> Any:
+        if isinstance(values, pa.ChunkedArray):
+            values = values.combine_chunks()
+        if not isinstance(values, pa.Array):
+            values = pa.array(values)
+        if pa.types.is_dictionary(values.type):
+            values = values.dictionary_decode()
+        if pa.types.is_large_string(values.type):
+            values = values.cast(pa.string())
+        return values
+
+    @classmethod
+    def table(cls, batch: "AuditBatch") -> Any:
+        n = len(batch)
+        constant = pa.array(np.zeros(n, dtype=np.int32))
+        columns = {
+            "ts": pa.array(np.full(n, batch.ts)),
+            "endpoint": pa.DictionaryArray.from_arrays(constant, pa.array([batch.endpoint])),
+            "model_version": pa.DictionaryArray.from_arrays(constant, pa.array([batch.model_version])),
+        }
+        for name, values in batch.inputs.items():
+            columns[name] = cls._column(values)
+        if batch.features is not None:
+            features = np.ascontiguousarray(batch.features, dtype=float)
+            columns["features"] = pa.FixedSizeListArray.from_arrays(pa.array(features.ravel()), features.shape[1])
+        columns["probability"] = pa.array(np.asarray(batch.probabilities, dtype=float))
+        columns["risk_level"] = pa.array(np.asarray(batch.risk_levels)).dictionary_encode()
+        return pa.table(columns)
+
+    def write(self, batch: "AuditBatch") -> None:
+        table = self.table(batch)
+        if self._writer is None or self._written >= self.max_bytes or not table.schema.equals(self._schema):
+            self.close()
+            self._open(table.schema)
+        self._writer.write_table(table)
+        self._file.flush()
+        self._written += table.nbytes
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SqliteSink:
+    """Table `predictions` d'une base SQLite (WAL: lectures concurrentes pendant l'écriture)."""
+
+    def __init__(self, directory: Path):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        # Utilisée uniquement depuis le thread d'écriture (un seul à la fois)
+        self._conn = sqlite3.connect(str(directory / "predictions.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS predictions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                endpoint TEXT NOT NULL,
+                model_version TEXT NOT NULL,
+                inputs TEXT NOT NULL,
+                features TEXT,
+                probability REAL NOT NULL,
+                risk_level TEXT NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS audit_gaps (
+                ts REAL NOT NULL,
+                dropped INTEGER NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def write_gap(self, timestamp: float, dropped: int) -> None:
+        with self._conn:
+            self._conn.execute("INSERT INTO audit_gaps (ts, dropped) VALUES (?, ?)", (timestamp, dropped))
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        rows = [
+            (
+                r["ts"], r["endpoint"], r["model_version"],
+                json.dumps(r["inputs"], ensure_ascii=False, default=str),
+                json.dumps(r.get("features")) if r.get("features") is not None else None,
+                r["probability"], r["risk_level"],
+            )
+            for r in records
+        ]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO predictions (ts, endpoint, model_version, inputs, features, probability, risk_level)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class AuditBatch:
+    """Lot scoré en masse, gardé en colonnes jusqu'à son écriture."""
+
+    __slots__ = ("ts", "endpoint", "model_version", "inputs", "features", "probabilities", "risk_levels")
+
+    def __init__(self, endpoint: str, model_version: str, inputs: Mapping[str, Any],
+                 features: Optional[np.ndarray], probabilities: np.ndarray, risk_levels: np.ndarray):
+        self.ts = time.time()
+        self.endpoint = endpoint
+        self.model_version = model_version
+        self.inputs = inputs
+        self.features = features
+        self.probabilities = probabilities
+        self.risk_levels = risk_levels
+
+    def __len__(self) -> int:
+        return len(self.probabilities)
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Enregistrements ligne à ligne (thread d'écriture uniquement)."""
+        names = list(self.inputs)
+        columns = [self.inputs[name] for name in names]
+        columns = [c.to_pylist() if hasattr(c, "to_pylist") else c.tolist() if hasattr(c, "tolist") else list(c)
+                   for c in columns]
+        vectors = self.features.tolist() if self.features is not None else [None] * len(self)
+        return [
+            {
+                "ts": self.ts,
+                "endpoint": self.endpoint,
+                "model_version": self.model_version,
+                "inputs": dict(zip(names, row)),
+                "features": vector,
+                "probability": probability,
+                "risk_level": level,
+            }
+            for row, vector, probability, level in zip(
+                zip(*columns), vectors, np.asarray(self.probabilities, dtype=float).tolist(),
+                np.asarray(self.risk_levels).tolist())
+        ]
+
+
+class AuditLog:
+    """Tampon circulaire (requêtes unitaires) + file de lots bornée (masse), vidés en tâche de fond."""
+
+    def __init__(
+        self,
+        backend: str = AUDIT_BACKEND,
+        directory: Path = AUDIT_DIR,
+        buffer_size: int = AUDIT_BUFFER_SIZE,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL_SECONDS,
+        enabled: bool = AUDIT_ENABLED,
+        queue_rows: int = AUDIT_QUEUE_ROWS,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"AUDIT_BACKEND inconnu: {backend} (attendu: {', '.join(BACKENDS)})")
+        self.backend = backend
+        self.directory = Path(directory)
+        self.enabled = enabled
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.flush_observers: List[FlushObserver] = []
+        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=max(1, buffer_size))
+        self._lock = threading.Lock()
+        self._sink: Any = None
+        self._batch_sink: Optional[ArrowBatchSink] = None
+        # Une écriture à la fois (tâche de fond, ou appelant direct sans tâche de fond)
+        self._write_lock = threading.Lock()
+        self.queue_rows = max(1, queue_rows)
+        self._batches: Deque[AuditBatch] = deque()
+        self._queued_rows = 0
+        self._batches_changed = threading.Condition(self._lock)
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.stats: Dict[str, int] = {"accepted": 0, "dropped": 0, "written": 0, "failed": 0, "flushes": 0}
+        self.backpressure_seconds = 0.0
+        # Pertes pas encore inscrites dans le journal (trou signalé au prochain vidage)
+        self._unreported_drops = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._buffer.maxlen or 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._buffer) + self._queued_rows
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def record(self, endpoint: str, model_version: str, inputs: Dict[str, Any], features: Optional[List[float]],
+               probability: float, risk_level: str) -> None:
+        """Ajoute un enregistrement au tampon (O(1), sans I/O; appelable depuis n'importe quel thread)."""
+        if not self.enabled:
+            return
+        entry = {
+            "ts": time.time(),
+            "endpoint": endpoint,
+            "model_version": model_version,
+            "inputs": inputs,
+            "features": features,
+            "probability": probability,
+            "risk_level": risk_level,
+        }
+        self._append([entry])
+
+    def record_batch(self, endpoint: str, model_version: str, inputs: Mapping[str, Any],
+                     features: Optional[np.ndarray], probabilities: np.ndarray, risk_levels: np.ndarray) -> None:
+        """Met en file un lot déjà scoré (entrées en colonnes), sans perte.
+
+        Bloque tant que la file de lots est pleine (AUDIT_QUEUE_ROWS): à
+        appeler hors event loop. Sans tâche de vidage (script, tests), le lot
+        est écrit directement par l'appelant.
+        """
+        if not self.enabled or len(probabilities) == 0:
+            return
+        batch = AuditBatch(endpoint, model_version, inputs, features, probabilities, risk_levels)
+        n = len(batch)
+        started = time.perf_counter()
+        with self._batches_changed:
+            # Un lot plus gros que la file passe seul quand elle est vide
+            while self.running and self._queued_rows and self._queued_rows + n > self.queue_rows:
+                self._batches_changed.wait(BACKPRESSURE_CHECK_SECONDS)
+            self.stats["accepted"] += n
+            self.backpressure_seconds += time.perf_counter() - started
+            if self.running:
+                self._batches.append(batch)
+                self._queued_rows += n
+                loop, wakeup = self._loop, self._wakeup
+            else:
+                loop = wakeup = None
+        if loop is None:
+            self._write_batches([batch])
+            return
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            # Event loop fermé: le lot sera écrit par stop()
+            pass
+
+    def _append(self, entries: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            overflow = len(self._buffer) + len(entries) - self.capacity
+            if overflow > 0:
+                # Les plus anciens sont écrasés: perte comptée et signalée, jamais d'attente côté requête
+                self.stats["dropped"] += overflow
+                self._unreported_drops += overflow
+            self._buffer.extend(entries)
+            self.stats["accepted"] += len(entries)
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            count = min(self.batch_size, len(self._buffer))
+            return [self._buffer.popleft() for _ in range(count)]
+
+    def _sink_for_write(self) -> Any:
+        if self._sink is None:
+            self._sink = JsonlSink(self.directory) if self.backend == "jsonl" else SqliteSink(self.directory)
+        return self._sink
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        with self._write_lock:
+            self._sink_for_write().write(batch)
+
+    def _write_gap(self, dropped: int) -> None:
+        with self._write_lock:
+            self._sink_for_write().write_gap(time.time(), dropped)
+
+    def _write_batches(self, batches: List[AuditBatch]) -> None:
+        """Écrit des lots de masse (conversion en enregistrements dans ce thread)."""
+        rows = sum(len(b) for b in batches)
+        started = time.perf_counter()
+        try:
+            with self._write_lock:
+                if pa is not None:
+                    if self._batch_sink is None:
+                        self._batch_sink = ArrowBatchSink(self.directory)
+                    for batch in batches:
+                        self._batch_sink.write(batch)
+                else:
+                    sink = self._sink_for_write()
+                    for batch in batches:
+                        sink.write(batch.records())
+        except Exception as e:
+            with self._lock:
+                self.stats["failed"] += rows
+            print(f"[WARN] Audit: écriture de {rows} enregistrements impossible: {e}")
+            # Fichiers rouverts au prochain lot
+            self._sink = self._batch_sink = None
+            return
+        with self._lock:
+            self.stats["written"] += rows
+            self.stats["flushes"] += 1
+        for observer in list(self.flush_observers):
+            observer(time.perf_counter() - started, rows)
+
+    async def _flush_batches(self) -> None:
+        """Écrit les lots en file; la place n'est libérée qu'une fois le lot écrit."""
+        while True:
+            with self._lock:
+                batches = list(self._batches)
+            if not batches:
+                return
+            await asyncio.to_thread(self._write_batches, batches)
+            with self._batches_changed:
+                for _ in batches:
+                    self._queued_rows -= len(self._batches.popleft())
+                self._batches_changed.notify_all()
+
+    async def _report_drops(self) -> None:
+        """Inscrit dans le journal les pertes survenues depuis le dernier vidage."""
+        with self._lock:
+            dropped, self._unreported_drops = self._unreported_drops, 0
+        if not dropped:
+            return
+        print(f"[WARN] Audit: tampon plein, {dropped} enregistrements écartés (AUDIT_BUFFER_SIZE={self.capacity})")
+        try:
+            await asyncio.to_thread(self._write_gap, dropped)
+        except Exception as e:
+            print(f"[WARN] Audit: impossible d'inscrire la perte de {dropped} enregistrements: {e}")
+            self._sink = None
+
+    async def flush(self) -> int:
+        """Écrit tout le contenu actuel du tampon, lot par lot (I/O dans un thread)."""
+        await self._report_drops()
+        await self._flush_batches()
+        written = 0
+        while True:
+            batch = self._drain()
+            if not batch:
+                return written
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                self.stats["failed"] += len(batch)
+                print(f"[WARN] Audit: écriture de {len(batch)} enregistrements impossible: {e}")
+                # Sink rouvert (nouveau fichier / connexion) au prochain lot
+                self._sink = None
+                return written
+            self.stats["written"] += len(batch)
+            self.stats["flushes"] += 1
+            written += len(batch)
+            for observer in list(self.flush_observers):
+                observer(time.perf_counter() - started, len(batch))
+
+    async def _run(self, stopping: asyncio.Event, wakeup: asyncio.Event) -> None:
+        while not stopping.is_set():
+            try:
+                # Réveil anticipé quand un lot de masse attend
+                await asyncio.wait_for(wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        """Lance la tâche de vidage (à appeler depuis l'event loop, au démarrage)."""
+        if self.enabled and (self._task is None or self._task.done()):
+            self._loop = asyncio.get_running_loop()
+            self._stopping = asyncio.Event()
+            self._wakeup = asyncio.Event()
+            self._task = self._loop.create_task(self._run(self._stopping, self._wakeup))
+
+    async def stop(self) -> None:
+        """Arrête la tâche de fond (sans interrompre un lot en cours) et écrit le reste du tampon."""
+        if self._task is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        with self._batches_changed:
+            # Appelants en attente: ils écrivent désormais eux-mêmes
+            self._batches_changed.notify_all()
+        await self.flush()
+        if self._sink is not None:
+            await asyncio.to_thread(self._sink.close)
+            self._sink = None
+        if self._batch_sink is not None:
+            await asyncio.to_thread(self._batch_sink.close)
+            self._batch_sink = None
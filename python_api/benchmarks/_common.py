@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""Utilitaires partagés par les benchmarks (statistiques, rapport JSON, comparaison)."""
+
+from __future__ import annotations
+
+import json
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+# Les modules de l'API s'importent à plat (comme dans main.py)
+API_DIR = Path(__file__).resolve().parent.parent
+if str(API_DIR) not in sys.path:
+    sys.path.insert(0, str(API_DIR))
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def summarize(samples_seconds: Iterable[float]) -> Dict[str, float]:
+    """Résumé d'une série de durées (secondes) en millisecondes."""
+    values = sorted(samples_seconds)
+    if not values:
+        return {"n": 0}
+    return {
+        "n": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "min_ms": round(values[0] * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3),
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Pic de mémoire résidente du processus (None si indisponible, ex: Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: kilo-octets, macOS: octets
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def new_report(name: str, **params: Any) -> Dict[str, Any]:
+    return {
+        "benchmark": name,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "results": [],
+    }
+
+
+def write_report(report: Dict[str, Any], output: Optional[str]) -> None:
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        Path(output).write_text(text, encoding="utf-8")
+        print(f"[OK] Rapport écrit: {output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+def _flatten_ms(node: Any, prefix: str = "") -> Dict[str, float]:
+    flat: Dict[str, float] = {}
+    if isinstance(node, dict):
+        for key, value in node.items():
+            path = f"{prefix}.{key}" if prefix else str(key)
+            if isinstance(value, (int, float)) and key in ("mean_ms", "p95_ms"):
+                flat[path] = float(value)
+            else:
+                flat.update(_flatten_ms(value, path))
+    elif isinstance(node, list):
+        for i, item in enumerate(node):
+            label = item.get("name", item.get("size", i)) if isinstance(item, dict) else i
+            flat.update(_flatten_ms(item, f"{prefix}[{label}]"))
+    return flat
+
+
+def compare_to_baseline(report: Dict[str, Any], baseline_path: str, tolerance: float) -> List[str]:
+    """Liste des mesures (mean/p95) plus lentes que baseline × tolérance."""
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    current = _flatten_ms(report.get("results"))
+    previous = _flatten_ms(baseline.get("results"))
+    regressions = []
+    for path, value in sorted(current.items()):
+        ref = previous.get(path)
+        # Sous 1 ms le bruit de mesure domine
+        if ref and ref >= 1.0 and value > ref * tolerance:
+            regressions.append(f"{path}: {value:.3f} ms (référence {ref:.3f} ms, x{value / ref:.2f})")
+    return regressions
+
+
+class Timer:
+    """Chronomètre simple: `with Timer() as t: ...; t.elapsed`."""
+
+    def __enter__(self) -> "Timer":
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.elapsed = time.perf_counter() - self.started
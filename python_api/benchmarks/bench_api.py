@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Benchmark et test de charge de l'API de prédiction (main.py).
+
+Scénarios:
+- encode_features      : coût unitaire de l'encodage d'un profil
+- predict              : POST /predict séquentiel (client ASGI en processus)
+- batch_predict        : POST /batch_predict pour chaque taille de lot
+- load                 : N clients concurrents sur /predict (ASGI en processus)
+- load_uvicorn         : idem via un vrai serveur uvicorn local (--uvicorn)
+
+Sans best_recidivism_model.joblib (ou avec --synthetic), un modèle de
+substitution (RandomForest entraîné sur des profils synthétiques) est utilisé
+afin de mesurer un vrai coût d'inférence plutôt que le mode démonstration.
+
+Exemples:
+    python benchmarks/bench_api.py --output api.json
+    python benchmarks/bench_api.py --batch-sizes 1,100,10000 --clients 32 --uvicorn
+    python benchmarks/bench_api.py --baseline api.json --tolerance 1.3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import random
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+from _common import Timer, compare_to_baseline, new_report, peak_rss_mb, summarize, write_report
+
+import httpx
+import numpy as np
+
+import main
+
+# Part de valeurs hors vocabulaire (repli sur les valeurs par défaut de encode_features)
+UNKNOWN_RATE = 0.05
+
+
+def random_profile(rng: random.Random) -> Dict[str, Any]:
+    profile: Dict[str, Any] = {"Age": rng.randint(16, 70)}
+    for feature, vocabulary in main.ENCODERS.items():
+        if rng.random() < UNKNOWN_RATE:
+            profile[feature] = "Inconnu"
+        else:
+            profile[feature] = rng.choice(list(vocabulary))
+    return profile
+
+
+def build_synthetic_model(seed: int = 0, rows: int = 5000) -> Any:
+    """RandomForest entraîné sur des profils aléatoires (substitut du modèle réel)."""
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = random.Random(seed)
+    profiles = [main.CriminalProfile(**random_profile(rng)) for _ in range(rows)]
+    X = np.vstack([main.encode_features(p) for p in profiles])
+    # Cible: règle métier bruitée, pour des arbres de profondeur réaliste
+    y = np.array([
+        int(main.simulate_prediction(p) + rng.uniform(-0.15, 0.15) > 0.35)
+        for p in profiles
+    ])
+    model = RandomForestClassifier(n_estimators=100, max_depth=10, random_state=seed, n_jobs=1)
+    model.fit(X, y)
+    return model
+
+
+def setup_model(force_synthetic: bool) -> str:
+    if not force_synthetic and main.load_model():
+        return type(main.model).__name__
+    main.model = build_synthetic_model()
+    return f"synthetic:{type(main.model).__name__}"
+
+
+def _throughput(count: int, seconds: float) -> float:
+    return round(count / seconds, 1) if seconds > 0 else 0.0
+
+
+# ============================================================
+# Scénarios
+# ============================================================
+
+def bench_encode(rng: random.Random, iterations: int) -> Dict[str, Any]:
+    profiles = [main.CriminalProfile(**random_profile(rng)) for _ in range(iterations)]
+    samples = []
+    for profile in profiles:
+        started = time.perf_counter()
+        main.encode_features(profile)
+        samples.append(time.perf_counter() - started)
+    return {"name": "encode_features", "calls": iterations,
+            "latency": summarize(samples), "throughput_per_s": _throughput(iterations, sum(samples))}
+
+
+async def _timed_post(client: httpx.AsyncClient, url: str, payload: Any) -> float:
+    started = time.perf_counter()
+    response = await client.post(url, json=payload)
+    elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        raise RuntimeError(f"{url}: HTTP {response.status_code} {response.text[:200]}")
+    return elapsed
+
+
+async def bench_predict(client: httpx.AsyncClient, rng: random.Random, requests_count: int) -> Dict[str, Any]:
+    payloads = [random_profile(rng) for _ in range(requests_count)]
+    with Timer() as wall:
+        samples = [await _timed_post(client, "/predict", p) for p in payloads]
+    return {"name": "predict", "requests": requests_count,
+            "latency": summarize(samples), "throughput_per_s": _throughput(requests_count, wall.elapsed)}
+
+
+async def bench_batch(client: httpx.AsyncClient, rng: random.Random, sizes: List[int],
+                      repeat: int) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes:
+        payload = [random_profile(rng) for _ in range(size)]
+        await _timed_post(client, "/batch_predict", payload)  # échauffement
+
+        samples = [await _timed_post(client, "/batch_predict", payload) for _ in range(repeat)]
+
+        # Mesure mémoire séparée: tracemalloc fausserait les temps
+        gc.collect()
+        tracemalloc.start()
+        await _timed_post(client, "/batch_predict", payload)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        mean = sum(samples) / len(samples)
+        results.append({
+            "name": f"batch_predict[{size}]",
+            "size": size,
+            "latency": summarize(samples),
+            "rows_per_s": _throughput(size, mean),
+            "tracemalloc_peak_mb": round(peak / (1024 * 1024), 2),
+        })
+    return results
+
+
+async def bench_load(client: httpx.AsyncClient, rng: random.Random, clients: int,
+                     requests_per_client: int, name: str = "load") -> Dict[str, Any]:
+    payloads = [[random_profile(rng) for _ in range(requests_per_client)] for _ in range(clients)]
+
+    async def worker(batch: List[Dict[str, Any]]) -> List[float]:
+        return [await _timed_post(client, "/predict", p) for p in batch]
+
+    with Timer() as wall:
+        per_client = await asyncio.gather(*(worker(b) for b in payloads))
+    samples = [s for client_samples in per_client for s in client_samples]
+    return {"name": name, "clients": clients, "requests": len(samples),
+            "latency": summarize(samples), "throughput_per_s": _throughput(len(samples), wall.elapsed)}
+
+
+# ============================================================
+# Serveur uvicorn local (optionnel)
+# ============================================================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LocalServer:
+    """uvicorn dans un thread du processus (le modèle de substitution reste partagé)."""
+
+    def __init__(self) -> None:
+        import uvicorn
+
+        self.port = _free_port()
+        self.server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=self.port,
+                                                    log_level="warning", lifespan="off"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> "LocalServer":
+        self.thread.start()
+        deadline = time.time() + 10
+        while not self.server.started:
+            if time.time() > deadline:
+                raise RuntimeError("uvicorn n'a pas démarré")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+# ============================================================
+# Main
+# ============================================================
+
+async def run(args: argparse.Namespace, report: Dict[str, Any]) -> None:
+    rng = random.Random(args.seed)
+    results = report["results"]
+
+    results.append(bench_encode(rng, args.encode_iterations))
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results.append(await bench_predict(client, rng, args.requests))
+        sizes = [int(s) for s in args.batch_sizes.split(",") if s.strip()]
+        results.extend(await bench_batch(client, rng, sizes, args.repeat))
+        results.append(await bench_load(client, rng, args.clients, args.requests_per_client))
+
+    if args.uvicorn:
+        with LocalServer() as server:
+            limits = httpx.Limits(max_connections=args.clients)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.port}", limits=limits,
+                                         timeout=60) as client:
+                results.append(await bench_load(client, rng, args.clients, args.requests_per_client,
+                                                name="load_uvicorn"))
+
+    report["peak_rss_mb"] = peak_rss_mb()
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", action="store_true", help="forcer le modèle de substitution")
+    parser.add_argument("--encode-iterations", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=500, help="requêtes /predict séquentielles")
+    parser.add_argument("--batch-sizes", default="1,10,100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=3, help="répétitions par taille de lot")
+    parser.add_argument("--clients", type=int, default=16, help="clients concurrents")
+    parser.add_argument("--requests-per-client", type=int, default=50)
+    parser.add_argument("--uvicorn", action="store_true", help="ajouter un test de charge via uvicorn local")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="fichier JSON de sortie (défaut: stdout)")
+    parser.add_argument("--baseline", help="rapport JSON de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="ratio de régression toléré")
+    args = parser.parse_args()
+
+    model_name = setup_model(args.synthetic)
+    report = new_report("api", model=model_name, **{k: v for k, v in vars(args).items()
+                                                    if k not in ("output", "baseline")})
+    asyncio.run(run(args, report))
+    write_report(report, args.output)
+
+    if args.baseline:
+        regressions = compare_to_baseline(report, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"[REGRESSION] {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
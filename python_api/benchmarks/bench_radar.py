@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Benchmark hors-ligne du pipeline Radar Sénégal (aucun accès réseau ni Groq).
+
+Étapes chronométrées: fetch, parse, filter, llm, render (via STAGE_OBSERVERS).
+Les corpus sont soit synthétiques (taille croissante: nombre d'articles par
+site), soit un répertoire de fixtures enregistré avec RADAR_REPLAY_MODE=record.
+
+Exemples:
+    python benchmarks/bench_radar.py --sizes 20,100,500 --repeat 5
+    python benchmarks/bench_radar.py --html-only --output radar.json
+    python benchmarks/bench_radar.py --fixtures fixtures/radar --baseline radar.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List
+from xml.sax.saxutils import escape
+
+from _common import Timer, compare_to_baseline, new_report, peak_rss_mb, summarize, write_report
+
+import radar_replay
+import senegal_radar
+from radar_hosts import HOSTS
+
+STAGES = ["fetch", "parse", "filter", "llm", "render"]
+
+_INCIDENTS = ["Manifestation", "Affrontement", "Grève", "Accident grave", "Braquage",
+              "Tension", "Blocage", "Agression", "Incendie", "Arrestation"]
+_FOREIGN = ["Ukraine", "Syrie", "France", "Canada", "Japon"]
+_NEUTRAL = ["Économie: le budget 2025 adopté", "Sport: victoire des Lions",
+            "Culture: ouverture du festival", "Agriculture: bonne campagne arachidière"]
+_RSS_PROBES = ["/rss", "/feed", "/feeds/posts/default", "/rss.xml", "/feed.xml"]
+
+
+def _titles(rng: random.Random, count: int) -> List[str]:
+    places = list(senegal_radar.LOCATIONS_DB)
+    titles = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.4:
+            titles.append(f"{rng.choice(_INCIDENTS)} à {rng.choice(places)}: la police sur place ({i})")
+        elif roll < 0.6:
+            titles.append(f"{rng.choice(_INCIDENTS)} en {rng.choice(_FOREIGN)}, bilan lourd ({i})")
+        else:
+            titles.append(f"{rng.choice(_NEUTRAL)} ({i})")
+    return titles
+
+
+def _homepage(titles: List[str], with_rss: bool) -> str:
+    link = '<link rel="alternate" type="application/rss+xml" href="/rss"/>' if with_rss else ""
+    padding = "<div class='ad'>" + "x" * 2000 + "</div>"
+    items = "".join(
+        f"<article><h2><a href='/article/{i}'>{escape(t)}</a></h2>"
+        f"<p>{escape(t)} — lire la suite</p>{padding}</article>"
+        for i, t in enumerate(titles)
+    )
+    return (f"<!DOCTYPE html><html><head><meta charset='utf-8'/><title>Actu</title>{link}</head>"
+            f"<body><nav>{'<a href=/rubrique>Rubrique</a>' * 10}</nav>{items}</body></html>")
+
+
+def _feed(site: str, titles: List[str]) -> str:
+    items = "".join(
+        f"<item><title>{escape(t)}</title><link>{site}/article/{i}</link>"
+        f"<description>{escape(t)}. Les autorités appellent au calme.</description>"
+        f"<pubDate>Mon, 06 Jan 2025 10:00:00 GMT</pubDate></item>"
+        for i, t in enumerate(titles)
+    )
+    return (f"<?xml version='1.0' encoding='utf-8'?><rss version='2.0'><channel>"
+            f"<title>{site}</title><link>{site}</link>{items}</channel></rss>")
+
+
+def build_synthetic_corpus(directory: Path, size: int, html_only: bool, seed: int = 42) -> None:
+    """Écrit un corpus de fixtures: `size` articles par site d'actualités."""
+    store = radar_replay.FixtureStore(directory)
+    rng = random.Random(seed)
+    for site in senegal_radar.SENEGAL_NEWS_SITES:
+        titles = _titles(rng, size)
+        store.save_response(site, 200, _homepage(titles, not html_only).encode("utf-8"),
+                            "text/html; charset=utf-8", "utf-8")
+        if html_only:
+            for path in _RSS_PROBES:
+                store.save_response(site.rstrip("/") + path, 404, b"", "text/html", "utf-8")
+        else:
+            store.save_response(site.rstrip("/") + "/rss", 200, _feed(site, titles).encode("utf-8"),
+                                "application/rss+xml; charset=utf-8", "utf-8")
+
+
+def run_once() -> Dict[str, Any]:
+    """Un passage complet du pipeline; retourne la durée cumulée par étape."""
+    totals: Dict[str, float] = defaultdict(float)
+
+    def observer(stage: str, seconds: float, labels: Dict[str, Any]) -> None:
+        totals[stage] += seconds
+
+    HOSTS.reset()
+    senegal_radar.STAGE_OBSERVERS.append(observer)
+    try:
+        with Timer() as total:
+            news = senegal_radar.scrape_senegal_news()
+            alerts = senegal_radar.analyze_with_groq(news).get("alerts", [])
+            senegal_radar.render_map_html(alerts)
+    finally:
+        senegal_radar.STAGE_OBSERVERS.remove(observer)
+
+    return {"stages": dict(totals), "total": total.elapsed,
+            "news_count": len(news), "alerts_count": len(alerts)}
+
+
+def bench_corpus(label: Any, fixtures_dir: Path, repeat: int, llm_latency_ms: float) -> Dict[str, Any]:
+    radar_replay.configure(mode="replay", fixtures_dir=fixtures_dir, llm="local",
+                           local_latency_ms=llm_latency_ms)
+    run_once()  # échauffement (imports paresseux, caches folium)
+
+    runs = [run_once() for _ in range(repeat)]
+    return {
+        "size": label,
+        "news_count": runs[-1]["news_count"],
+        "alerts_count": runs[-1]["alerts_count"],
+        "stages": {stage: summarize(r["stages"].get(stage, 0.0) for r in runs) for stage in STAGES},
+        "total": summarize(r["total"] for r in runs),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="20,100,500", help="articles par site (corpus synthétiques)")
+    parser.add_argument("--fixtures", help="répertoire de fixtures enregistrées (remplace --sizes)")
+    parser.add_argument("--html-only", action="store_true", help="corpus sans RSS (fallback HTML)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="latence simulée du LLM local")
+    parser.add_argument("--output", help="fichier JSON de sortie (défaut: stdout)")
+    parser.add_argument("--baseline", help="rapport JSON de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="ratio de régression toléré")
+    args = parser.parse_args()
+
+    report = new_report("radar", repeat=args.repeat, html_only=args.html_only,
+                        llm_latency_ms=args.llm_latency_ms)
+    try:
+        if args.fixtures:
+            report["results"].append(bench_corpus("recorded", Path(args.fixtures), args.repeat,
+                                                  args.llm_latency_ms))
+        else:
+            for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+                with tempfile.TemporaryDirectory(prefix="radar_bench_") as tmp:
+                    build_synthetic_corpus(Path(tmp), size, args.html_only)
+                    report["results"].append(bench_corpus(size, Path(tmp), args.repeat,
+                                                          args.llm_latency_ms))
+    finally:
+        radar_replay.configure(mode="off")
+
+    write_report(report, args.output)
+
+    if args.baseline:
+        regressions = compare_to_baseline(report, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"[REGRESSION] {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
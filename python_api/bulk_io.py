@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Lecture / écriture en flux pour le scoring en masse (CSV ou NDJSON).
+
+Le fichier reçu est d'abord "spoolé" (SpooledTemporaryFile: mémoire au-delà
+d'un seuil → disque), puis relu bloc par bloc et découpé en paquets de
+lignes: la mémoire reste bornée par la taille d'un paquet, quelle que soit la
+taille du fichier. Le spool évite de lire la requête pendant l'écriture de la
+réponse, ce que la plupart des clients HTTP/1.1 ne supportent pas.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import csv
+import io
+import json
+import tempfile
+from collections import deque
+from typing import IO, Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+FORMATS = ("csv", "ndjson")
+READ_CHUNK_BYTES = 64 * 1024
+SPOOL_MAX_MEMORY_BYTES = 1024 * 1024
+# Taille des écritures groupées de spool_stream
+SPOOL_WRITE_BYTES = 256 * 1024
+_DELIMITERS = (",", ";", "\t")
+
+
+def detect_format(content_type: Optional[str], filename: Optional[str] = None) -> str:
+    """csv si l'extension ou le Content-Type l'indique, ndjson sinon."""
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if name.endswith((".csv", ".tsv", ".txt")):
+        return "csv"
+    content_type = (content_type or "").lower()
+    if "csv" in content_type or "text/plain" in content_type:
+        return "csv"
+    return "ndjson"
+
+
+async def spool_stream(byte_stream: AsyncIterator[bytes], target: Optional[IO[bytes]] = None) -> IO[bytes]:
+    """Copie un flux d'octets dans `target` (défaut: fichier temporaire, en mémoire jusqu'à 1 Mo).
+
+    Les écritures (disque) sont regroupées par SPOOL_WRITE_BYTES et faites
+    dans un thread: l'event loop ne bloque jamais sur le fichier.
+    """
+    spool = target if target is not None else tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY_BYTES)
+    pending: List[bytes] = []
+    size = 0
+    async for chunk in byte_stream:
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= SPOOL_WRITE_BYTES:
+            await asyncio.to_thread(spool.write, b"".join(pending))
+            pending, size = [], 0
+    if pending:
+        await asyncio.to_thread(spool.write, b"".join(pending))
+    await asyncio.to_thread(spool.seek, 0)
+    return spool
+
+
+def _detect_delimiter(header_line: str) -> str:
+    # Les exports Excel francophones utilisent ';'
+    return max(_DELIMITERS, key=header_line.count)
+
+
+class BulkReader:
+    """Découpe un fichier CSV/NDJSON en paquets de lignes (dict colonne → valeur)."""
+
+    def __init__(self, fileobj: IO[bytes], fmt: str):
+        if fmt not in FORMATS:
+            raise ValueError(f"Format d'entrée non supporté: {fmt} (attendu: {', '.join(FORMATS)})")
+        self.fmt = fmt
+        self.columns: List[str] = []
+        self.rows_read = 0
+        self.bytes_read = 0
+        self._file = fileobj
+        # utf-8-sig: ignore le BOM des exports Excel
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self._lines: deque = deque()
+        self._partial = ""
+        self._eof = False
+        self._delimiter = ","
+
+    def _read_line(self) -> Optional[str]:
+        """Prochaine ligne complète (None en fin de fichier)."""
+        while not self._lines:
+            if self._eof:
+                return None
+            chunk = self._file.read(READ_CHUNK_BYTES)
+            self.bytes_read += len(chunk)
+            if chunk:
+                text = self._partial + self._decoder.decode(chunk)
+            else:
+                text = self._partial + self._decoder.decode(b"", final=True)
+                self._eof = True
+            lines = text.split("\n")
+            # La dernière ligne peut être incomplète (sauf en fin de flux)
+            self._partial = "" if self._eof else lines.pop()
+            if self._eof and lines and lines[-1] == "":
+                lines.pop()
+            self._lines.extend(lines)
+        return self._lines.popleft().rstrip("\r")
+
+    def _read_csv_record(self) -> Optional[List[str]]:
+        line = self._read_line()
+        if line is None:
+            return None
+        # Champ entre guillemets contenant un saut de ligne: on complète l'enregistrement
+        while line.count('"') % 2 == 1:
+            more = self._read_line()
+            if more is None:
+                break
+            line = f"{line}\n{more}"
+        return next(csv.reader([line], delimiter=self._delimiter), [])
+
+    def start(self) -> None:
+        """Lit l'en-tête CSV (à appeler avant de commencer la réponse)."""
+        if self.fmt != "csv":
+            return
+        header = self._read_line()
+        while header is not None and not header.strip():
+            header = self._read_line()
+        if header is None:
+            raise ValueError("Fichier CSV vide")
+        self._delimiter = _detect_delimiter(header)
+        self.columns = [c.strip() for c in next(csv.reader([header], delimiter=self._delimiter))]
+
+    def missing_columns(self, required: Sequence[str]) -> List[str]:
+        if self.fmt != "csv":
+            return []
+        return [c for c in required if c not in self.columns]
+
+    def _next_row(self) -> Optional[Dict[str, Any]]:
+        while True:
+            if self.fmt == "csv":
+                record = self._read_csv_record()
+                if record is None:
+                    return None
+                if not any(v.strip() for v in record):
+                    continue
+                return {c: v.strip() for c, v in zip(self.columns, record)}
+
+            line = self._read_line()
+            if line is None:
+                return None
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                return {"__error__": f"JSON invalide: {e.msg}"}
+            return row if isinstance(row, dict) else {"__error__": "Objet JSON attendu"}
+
+    def chunks(self, size: int) -> Iterator[List[Dict[str, Any]]]:
+        """Paquets d'au plus `size` lignes."""
+        rows: List[Dict[str, Any]] = []
+        while True:
+            row = self._next_row()
+            if row is None:
+                break
+            rows.append(row)
+            self.rows_read += 1
+            if len(rows) >= size:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
+
+
+def format_ndjson(records: List[Dict[str, Any]]) -> str:
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+
+
+def format_csv(records: List[Dict[str, Any]], columns: Sequence[str], header: bool = False) -> str:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=list(columns), extrasaction="ignore", lineterminator="\n")
+    if header:
+        writer.writeheader()
+    writer.writerows(records)
+    return out.getvalue()
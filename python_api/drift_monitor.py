@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Surveillance en continu de la dérive des entrées (mémoire constante).
+
+Le chemin de prédiction alimente, par fenêtres de temps glissantes
+(DRIFT_WINDOW_SECONDS, les DRIFT_WINDOWS dernières sont conservées):
+- un compteur par catégorie de chaque vocabulaire ENCODERS, plus une case
+  "inconnu" (valeur remplacée par ENCODER_DEFAULTS lors de l'encodage)
+- un histogramme des âges (tranches de AGE_BIN_YEARS ans, hors bornes à part)
+- un histogramme fin (PROBABILITY_BINS cases sur [0, 1]) de
+  recidive_probability, qui sert d'esquisse de quantiles fusionnable
+  (erreur ≤ 1 / PROBABILITY_BINS)
+
+Chaque fenêtre n'est qu'un jeu de tableaux numpy de taille fixe: la mémoire
+ne dépend pas du trafic. Le score de dérive est le PSI (Population Stability
+Index) de la fenêtre courante contre une référence: celle épinglée
+(set_reference / DRIFT_REFERENCE_PATH) ou, à défaut, le cumul des fenêtres
+précédentes. Repères usuels: < 0.1 stable, 0.1-0.25 modéré, > 0.25 significatif.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Mapping, Optional
+
+import numpy as np
+
+DRIFT_WINDOW_SECONDS = float(os.getenv("DRIFT_WINDOW_SECONDS", "300"))
+DRIFT_WINDOWS = int(os.getenv("DRIFT_WINDOWS", "12"))
+DRIFT_MIN_COUNT = int(os.getenv("DRIFT_MIN_COUNT", "100"))
+DRIFT_REFERENCE_PATH = os.getenv("DRIFT_REFERENCE_PATH", "")
+
+AGE_BIN_YEARS = 5
+PROBABILITY_BINS = 1000
+# Regroupement de l'esquisse en déciles pour le PSI (trop de cases vides sinon)
+PROBABILITY_PSI_BINS = 10
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+_EPSILON = 1e-4
+
+
+def psi(current: np.ndarray, reference: np.ndarray) -> float:
+    """Population Stability Index entre deux histogrammes (comptes bruts)."""
+    cur = current / max(1, current.sum()) + _EPSILON
+    ref = reference / max(1, reference.sum()) + _EPSILON
+    return float(np.sum((cur - ref) * np.log(cur / ref)))
+
+
+def drift_status(score: Optional[float]) -> str:
+    if score is None:
+        return "insufficient_data"
+    if score >= PSI_SIGNIFICANT:
+        return "significant"
+    if score >= PSI_MODERATE:
+        return "moderate"
+    return "stable"
+
+
+class DriftWindow:
+    """Comptes d'une fenêtre de temps (tableaux de taille fixe)."""
+
+    def __init__(self, vocab_sizes: Mapping[str, int], age_bins: int, started_at: float):
+        self.started_at = started_at
+        self.count = 0
+        # Dernière case = catégorie inconnue
+        self.categories = {name: np.zeros(size + 1, dtype=np.int64) for name, size in vocab_sizes.items()}
+        self.ages = np.zeros(age_bins, dtype=np.int64)
+        self.probabilities = np.zeros(PROBABILITY_BINS, dtype=np.int64)
+
+    def add(self, other: "DriftWindow") -> None:
+        self.count += other.count
+        for name, counts in other.categories.items():
+            self.categories[name] += counts
+        self.ages += other.ages
+        self.probabilities += other.probabilities
+
+    def remove(self, other: "DriftWindow") -> None:
+        self.count -= other.count
+        for name, counts in other.categories.items():
+            self.categories[name] -= counts
+        self.ages -= other.ages
+        self.probabilities -= other.probabilities
+
+    def copy(self) -> "DriftWindow":
+        window = DriftWindow({}, 0, self.started_at)
+        window.count = self.count
+        window.categories = {name: counts.copy() for name, counts in self.categories.items()}
+        window.ages = self.ages.copy()
+        window.probabilities = self.probabilities.copy()
+        return window
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "categories": {name: counts.tolist() for name, counts in self.categories.items()},
+            "ages": self.ages.tolist(),
+            "probabilities": self.probabilities.tolist(),
+        }
+
+
+class DriftMonitor:
+    """Compteurs fenêtrés des entrées et des probabilités (thread-safe)."""
+
+    def __init__(
+        self,
+        encoders: Mapping[str, Mapping[str, int]],
+        age_min: int,
+        age_max: int,
+        window_seconds: float = DRIFT_WINDOW_SECONDS,
+        windows: int = DRIFT_WINDOWS,
+        min_count: int = DRIFT_MIN_COUNT,
+    ):
+        self.vocabularies = {name: list(vocabulary) for name, vocabulary in encoders.items()}
+        self.positions = {name: {v: i for i, v in enumerate(vocab)} for name, vocab in self.vocabularies.items()}
+        self.age_min = age_min
+        self.age_max = age_max
+        # Tranches [age_min, age_max] + une case "hors bornes"
+        self.age_bins = (age_max - age_min) // AGE_BIN_YEARS + 2
+        self.window_seconds = window_seconds
+        self.min_count = min_count
+        self._sizes = {name: len(vocab) for name, vocab in self.vocabularies.items()}
+        self._lock = threading.Lock()
+        self._history: Deque[DriftWindow] = deque(maxlen=max(1, windows))
+        self._current = self._new_window(time.time())
+        self._reference: Optional[DriftWindow] = None
+
+    def _new_window(self, started_at: float) -> DriftWindow:
+        return DriftWindow(self._sizes, self.age_bins, started_at)
+
+    def _window(self, now: float) -> DriftWindow:
+        # Appelé sous verrou: bascule de fenêtre si la courante est expirée
+        if now - self._current.started_at >= self.window_seconds:
+            self._history.append(self._current)
+            # Alignement sur la grille pour que les fenêtres restent comparables
+            elapsed = (now - self._current.started_at) // self.window_seconds * self.window_seconds
+            self._current = self._new_window(self._current.started_at + elapsed)
+        return self._current
+
+    def _age_bin(self, ages: np.ndarray) -> np.ndarray:
+        bins = (ages - self.age_min) // AGE_BIN_YEARS
+        out_of_range = (ages < self.age_min) | (ages > self.age_max) | np.isnan(ages)
+        return np.where(out_of_range, self.age_bins - 1, np.nan_to_num(bins)).astype(np.int64)
+
+    # ------------------------------------------------------------------
+    # Alimentation
+    # ------------------------------------------------------------------
+
+    def observe_one(self, values: Mapping[str, Any], probability: float) -> None:
+        """Chemin rapide pour /predict (un profil, quelques µs)."""
+        age = values.get("Age")
+        if age is None or not self.age_min <= age <= self.age_max:
+            age_bin = self.age_bins - 1
+        else:
+            age_bin = int((age - self.age_min) // AGE_BIN_YEARS)
+        prob_bin = min(PROBABILITY_BINS - 1, max(0, int(probability * PROBABILITY_BINS)))
+        with self._lock:
+            window = self._window(time.time())
+            window.count += 1
+            for name, positions in self.positions.items():
+                window.categories[name][positions.get(values.get(name), self._sizes[name])] += 1
+            window.ages[age_bin] += 1
+            window.probabilities[prob_bin] += 1
+
+    def category_positions(self, name: str, values: Any) -> np.ndarray:
+        """Position de chaque valeur dans le vocabulaire de `name` (-1 si inconnue)."""
+        import pandas as pd
+
+        series = pd.Series(values, dtype=object)
+        # Valeurs non textuelles (list, dict...) : inconnues, et non hachables pour map
+        mapped = series.where(series.map(type).eq(str)).map(self.positions[name])
+        return mapped.fillna(-1).to_numpy(dtype=np.int64)
+
+    def observe_batch(self, positions: Mapping[str, np.ndarray], ages: np.ndarray,
+                      probabilities: np.ndarray) -> None:
+        """Lot vectorisé: positions dans les vocabulaires (-1 = inconnue), âges, probabilités."""
+        n = len(probabilities)
+        if n == 0:
+            return
+        category_counts = {
+            name: np.bincount(np.where(pos < 0, self._sizes[name], pos), minlength=self._sizes[name] + 1)
+            for name, pos in positions.items()
+        }
+        age_counts = np.bincount(self._age_bin(np.asarray(ages, dtype=float)), minlength=self.age_bins)
+        prob_bins = np.clip((np.asarray(probabilities) * PROBABILITY_BINS).astype(np.int64), 0, PROBABILITY_BINS - 1)
+        prob_counts = np.bincount(prob_bins, minlength=PROBABILITY_BINS)
+        with self._lock:
+            window = self._window(time.time())
+            window.count += n
+            for name, counts in category_counts.items():
+                window.categories[name] += counts
+            window.ages += age_counts
+            window.probabilities += prob_counts
+
+    # ------------------------------------------------------------------
+    # Référence
+    # ------------------------------------------------------------------
+
+    def pin_reference(self, include_current: bool = True) -> int:
+        """Épingle comme référence le cumul des fenêtres conservées; retourne son effectif."""
+        with self._lock:
+            reference = self._new_window(time.time())
+            for window in list(self._history) + ([self._current] if include_current else []):
+                reference.add(window)
+            self._reference = reference
+            return reference.count
+
+    def clear_reference(self) -> None:
+        with self._lock:
+            self._reference = None
+
+    def save_reference(self, path: str) -> None:
+        with self._lock:
+            reference = self._reference
+        if reference is None:
+            raise ValueError("Aucune référence épinglée")
+        Path(path).write_text(json.dumps(reference.to_dict()), encoding="utf-8")
+
+    def load_reference(self, path: str) -> None:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        reference = self._new_window(time.time())
+        reference.count = int(data["count"])
+        for name, counts in data["categories"].items():
+            if name in reference.categories and len(counts) == len(reference.categories[name]):
+                reference.categories[name] = np.asarray(counts, dtype=np.int64)
+        if len(data["ages"]) == self.age_bins:
+            reference.ages = np.asarray(data["ages"], dtype=np.int64)
+        if len(data["probabilities"]) == PROBABILITY_BINS:
+            reference.probabilities = np.asarray(data["probabilities"], dtype=np.int64)
+        with self._lock:
+            self._reference = reference
+
+    # ------------------------------------------------------------------
+    # Rapport
+    # ------------------------------------------------------------------
+
+    def _scores(self, current: DriftWindow, reference: DriftWindow) -> Dict[str, Optional[float]]:
+        enough = current.count >= self.min_count and reference.count >= self.min_count
+        if not enough:
+            return {name: None for name in list(current.categories) + ["Age", "recidive_probability"]}
+        scores: Dict[str, Optional[float]] = {
+            name: psi(counts, reference.categories[name]) for name, counts in current.categories.items()
+        }
+        scores["Age"] = psi(current.ages, reference.ages)
+        step = PROBABILITY_BINS // PROBABILITY_PSI_BINS
+        scores["recidive_probability"] = psi(
+            current.probabilities.reshape(-1, step).sum(axis=1),
+            reference.probabilities.reshape(-1, step).sum(axis=1),
+        )
+        return scores
+
+    @staticmethod
+    def _quantiles(window: DriftWindow) -> Optional[Dict[str, float]]:
+        if window.count == 0:
+            return None
+        cumulative = np.cumsum(window.probabilities)
+        # Centre de la case contenant le rang demandé
+        return {
+            f"p{int(q * 100)}": round((int(np.searchsorted(cumulative, q * window.count)) + 0.5) / PROBABILITY_BINS, 4)
+            for q in QUANTILES
+        }
+
+    def _unknown_rates(self, window: DriftWindow) -> Dict[str, Optional[float]]:
+        return {
+            name: (round(float(counts[-1]) / window.count, 4) if window.count else None)
+            for name, counts in window.categories.items()
+        }
+
+    def report(self) -> Dict[str, Any]:
+        """Scores PSI de la fenêtre courante et de chaque fenêtre conservée contre la référence."""
+        with self._lock:
+            current = self._window(time.time())
+            history = list(self._history)
+            pinned = self._reference
+            # Copies: le calcul se fait hors verrou
+            current_copy = self._new_window(current.started_at)
+            current_copy.add(current)
+
+        if pinned is not None:
+            reference, source = pinned, "pinned"
+        else:
+            reference, source = self._new_window(0.0), "trailing_windows"
+            for window in history:
+                reference.add(window)
+
+        scores = self._scores(current_copy, reference)
+        known = [s for s in scores.values() if s is not None]
+        max_psi = max(known) if known else None
+        unknown = self._unknown_rates(current_copy)
+        reference_unknown = self._unknown_rates(reference)
+
+        features: Dict[str, Any] = {}
+        for name, counts in current_copy.categories.items():
+            top = np.argsort(counts[:-1])[::-1][:5]
+            features[name] = {
+                "psi": None if scores[name] is None else round(scores[name], 4),
+                "unknown_rate": unknown[name],
+                "reference_unknown_rate": reference_unknown[name],
+                "top": {self.vocabularies[name][i]: int(counts[i]) for i in top if counts[i] > 0},
+            }
+        features["Age"] = {"psi": None if scores["Age"] is None else round(scores["Age"], 4),
+                           "out_of_range": int(current_copy.ages[-1])}
+
+        return {
+            "window_seconds": self.window_seconds,
+            "current_window": {"started_at": current_copy.started_at, "count": current_copy.count},
+            "reference": {"source": source, "count": reference.count},
+            "status": drift_status(max_psi),
+            "max_psi": None if max_psi is None else round(max_psi, 4),
+            "features": features,
+            "recidive_probability": {
+                "psi": None if scores["recidive_probability"] is None else round(scores["recidive_probability"], 4),
+                "quantiles": self._quantiles(current_copy),
+                "reference_quantiles": self._quantiles(reference),
+            },
+            "windows": [self._window_summary(w, reference, leave_out=pinned is None) for w in history],
+        }
+
+    def _window_summary(self, window: DriftWindow, reference: DriftWindow, leave_out: bool) -> Dict[str, Any]:
+        if leave_out:
+            # Référence glissante: les autres fenêtres seulement (sinon la fenêtre se compare à elle-même)
+            reference = reference.copy()
+            reference.remove(window)
+        scores = [s for s in self._scores(window, reference).values() if s is not None]
+        max_psi = max(scores) if scores else None
+        return {
+            "started_at": window.started_at,
+            "count": window.count,
+            "max_psi": None if max_psi is None else round(max_psi, 4),
+            "status": drift_status(max_psi),
+        }
+
+    def current_scores(self) -> Dict[str, Optional[float]]:
+        """PSI par variable de la fenêtre courante (pour /metrics)."""
+        report = self.report()
+        scores = {name: f["psi"] for name, f in report["features"].items()}
+        scores["recidive_probability"] = report["recidive_probability"]["psi"]
+        return scores
+
+    def current_unknown_rates(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            return self._unknown_rates(self._window(time.time()))
+
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Contributions par variable calculées à partir du modèle chargé (facteurs d'influence).
+
+Pour chaque ligne, la probabilité se décompose en `biais + somme des
+contributions`, en unités de probabilité (signées):
+- forêts / arbres scikit-learn : contributions par chemin d'arbre (Saabas).
+  Chaque nœud porte l'écart de valeur avec son parent, attribué à la variable
+  testée par le parent; la matrice (nœuds × variables) est précalculée une
+  fois par modèle. Pour un lot, `decision_path` donne la matrice creuse
+  (lignes × nœuds visités) et un seul produit matriciel creux donne toutes
+  les contributions: aucun parcours d'arbre en Python.
+- gradient boosting et modèles linéaires : même principe sur la marge
+  (log-odds), puis mise à l'échelle proportionnelle vers la probabilité
+- autres modèles : occlusion (écart de probabilité quand la variable prend
+  la valeur de référence), en un seul appel au modèle pour tout le lot
+
+Les lignes identiques d'un lot ne sont expliquées qu'une fois et les
+résultats sont gardés dans un cache LRU par vecteur encodé
+(EXPLAIN_CACHE_SIZE).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+EXPLAIN_CACHE_SIZE = int(os.getenv("EXPLAIN_CACHE_SIZE", "50000"))
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _node_deltas(tree: Any, n_features: int, classifier: bool, scale: float = 1.0) -> Tuple["Any", float]:
+    """Matrice creuse (nœuds × variables) des écarts enfant - parent, et valeur de la racine."""
+    from scipy import sparse
+
+    values = tree.value[:, 0, :]
+    if classifier:
+        # Fractions de classes (comptes pondérés dans les anciennes versions de scikit-learn)
+        values = values / np.maximum(values.sum(axis=1, keepdims=True), 1e-12)
+        values = values[:, -1]
+    else:
+        values = values[:, 0]
+    values = values * scale
+
+    left, right = tree.children_left, tree.children_right
+    parents = np.full(tree.node_count, -1, dtype=np.int64)
+    internal = np.flatnonzero(left >= 0)
+    parents[left[internal]] = internal
+    parents[right[internal]] = internal
+
+    children = np.flatnonzero(parents >= 0)
+    deltas = values[children] - values[parents[children]]
+    features = tree.feature[parents[children]]
+    matrix = sparse.csr_matrix((deltas, (children, features)), shape=(tree.node_count, n_features))
+    return matrix, float(values[0])
+
+
+class Explainer:
+    """Contributions par variable pour un modèle donné (thread-safe).
+
+    `predict` est la fonction de probabilité de l'API (utilisée par
+    l'occlusion) et `baseline` le vecteur encodé de référence.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        n_features: int,
+        predict: Callable[[np.ndarray], np.ndarray],
+        baseline: np.ndarray,
+        cache_size: int = EXPLAIN_CACHE_SIZE,
+    ):
+        self.model = model
+        self.n_features = n_features
+        self.predict = predict
+        self.baseline = np.asarray(baseline, dtype=float)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+        self._trees: Optional[Tuple[Any, float]] = None
+        self._stages: Optional[List[Any]] = None
+        self.method = self._prepare()
+
+    def _prepare(self) -> str:
+        model = self.model
+        classifier = hasattr(model, "predict_proba")
+        try:
+            from scipy import sparse
+            from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor
+        except ImportError:
+            return "occlusion"
+
+        estimators = getattr(model, "estimators_", None)
+        if (isinstance(estimators, list) and estimators and hasattr(model, "decision_path")
+                and all(hasattr(e, "tree_") for e in estimators)):
+            # Forêts (RandomForest, ExtraTrees): moyenne des arbres
+            parts = [_node_deltas(e.tree_, self.n_features, classifier, 1.0 / len(estimators)) for e in estimators]
+            # Même ordre que les nœuds concaténés de model.decision_path
+            self._trees = (sparse.vstack([m for m, _ in parts]).tocsr(), sum(b for _, b in parts))
+            return "tree_path"
+        if hasattr(model, "tree_"):
+            self._trees = _node_deltas(model.tree_, self.n_features, classifier)
+            return "tree_path"
+        if isinstance(model, (GradientBoostingClassifier, GradientBoostingRegressor)) and model.estimators_.shape[1] == 1:
+            # Une matrice par étage: decision_path n'existe pas sur l'ensemble
+            self._stages = [_node_deltas(e.tree_, self.n_features, False, model.learning_rate)[0]
+                            for e in model.estimators_[:, 0]]
+            return "margin"
+        coef = getattr(model, "coef_", None)
+        if coef is not None and np.asarray(coef).reshape(-1).shape[0] == self.n_features:
+            return "margin"
+        return "occlusion"
+
+    # ------------------------------------------------------------------
+
+    def _tree_path(self, X: np.ndarray) -> np.ndarray:
+        matrix, _ = self._trees
+        indicator = self.model.decision_path(X)
+        if isinstance(indicator, tuple):  # forêts: (indicateur, n_nodes_ptr)
+            indicator = indicator[0]
+        return (indicator @ matrix).toarray()
+
+    def _margin(self, X: np.ndarray) -> np.ndarray:
+        model = self.model
+        if self._stages is not None:
+            contributions = np.zeros((len(X), self.n_features))
+            for est, matrix in zip(model.estimators_[:, 0], self._stages):
+                contributions += (est.decision_path(X) @ matrix).toarray()
+        else:
+            contributions = X * np.asarray(model.coef_, dtype=float).reshape(1, -1)
+        margin = np.asarray(model.decision_function(X) if hasattr(model, "decision_function")
+                            else model.predict(X), dtype=float).reshape(-1)
+        if not hasattr(model, "predict_proba"):
+            return contributions
+        # Log-odds → probabilité: répartition proportionnelle de p(x) - sigmoid(biais)
+        bias = margin - contributions.sum(axis=1)
+        total = margin - bias
+        near_zero = np.abs(total) < 1e-12
+        slope = np.where(
+            near_zero,
+            _sigmoid(bias) * (1 - _sigmoid(bias)),
+            (_sigmoid(margin) - _sigmoid(bias)) / np.where(near_zero, 1.0, total),
+        )
+        return contributions * slope[:, None]
+
+    def _occlusion(self, X: np.ndarray) -> np.ndarray:
+        n = len(X)
+        # Bloc j: toutes les lignes avec la variable j à sa valeur de référence
+        occluded = np.repeat(X[None, :, :], self.n_features, axis=0)
+        for j in range(self.n_features):
+            occluded[j, :, j] = self.baseline[j]
+        probabilities = self.predict(np.vstack([X, occluded.reshape(-1, self.n_features)]))
+        base, others = probabilities[:n], probabilities[n:].reshape(self.n_features, n)
+        return (base[None, :] - others).T
+
+    def _compute(self, X: np.ndarray) -> np.ndarray:
+        if self.method == "tree_path":
+            return self._tree_path(X)
+        if self.method == "margin":
+            return self._margin(X)
+        return self._occlusion(X)
+
+    def explain(self, features: np.ndarray) -> np.ndarray:
+        """Contributions (lignes × variables) pour une matrice encodée."""
+        features = np.ascontiguousarray(features, dtype=float)
+        if len(features) == 0:
+            return np.empty((0, self.n_features))
+        unique, inverse = np.unique(features, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        keys = [row.tobytes() for row in unique]
+        results = np.empty((len(unique), self.n_features))
+
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    results[i] = cached
+            self.stats["hits"] += len(keys) - len(missing)
+            self.stats["misses"] += len(missing)
+
+        if missing:
+            computed = self._compute(unique[missing])
+            results[missing] = computed
+            with self._lock:
+                for i, row in zip(missing, computed):
+                    self._cache[keys[i]] = row
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return results[inverse]
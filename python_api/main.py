@@ -4,20 +4,47 @@ API FastAPI pour la prédiction de récidive criminelle
 Charge et utilise le modèle best_recidivism_model.joblib
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import joblib
 import pandas as pd
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 import os
 import sys
 import asyncio
+import hashlib
+import time
+from functools import partial
 from pathlib import Path
 
-from senegal_radar import has_cached_result, render_map_html, run_radar
+# Optionnel: scoring colonnaire Arrow / Parquet (/batch_predict/columnar)
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+from article_search import DEFAULT_FIELDS as ARTICLE_DEFAULT_FIELDS, ArticleIndex, IndexUnavailable, load_or_build
+from audit_log import AuditLog
+from bulk_io import BulkReader, detect_format, format_csv, format_ndjson, spool_stream
+from drift_monitor import DRIFT_REFERENCE_PATH, DriftMonitor
+from explanations import Explainer
+from metrics import (BATCH_SIZE, CONTENT_TYPE as METRICS_CONTENT_TYPE, PREDICTION_STAGE_SECONDS, REGISTRY,
+                     MetricsMiddleware, counts_by, observe_radar_stage, ratio)
+from profiler import (ADMIN_TOKEN, PROFILE_MAX_SECONDS, PROFILING_ENABLED, ProfilerBusy, ProfilingMiddleware,
+                      get_request_profile, is_admin, start_profile, stop_profile)
+from radar_hosts import HOSTS
+from radar_events import RADAR_EVENTS, SSE_KEEPALIVE_SECONDS, format_sse
+from radar_replay import configure_from_env as configure_radar_from_env
+from scoring_jobs import JobQueueFull, ScoringJobManager, copy_upload
+from shadow_model import SHADOW_MODEL_PATH, ShadowScorer
+import senegal_radar
+from senegal_radar import (cache_stats, get_cached_articles, get_cached_result, get_map_html, has_cached_result,
+                           run_radar)
 
 # Windows: éviter crash UnicodeEncodeError quand la console n'est pas en UTF-8
 try:
@@ -45,8 +72,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Profil d'une requête à la demande (en-tête X-Profile); absent sans ADMIN_TOKEN
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Comptage et latence par route (/metrics); ajouté en dernier = middleware le plus externe
+app.add_middleware(MetricsMiddleware)
+
 # Variables globales pour le modèle
 model = None
+# Empreinte du fichier chargé (journal d'audit); None hors load_model
+model_version: Optional[str] = None
 feature_names = ['Region_Name', 'Age', 'Ethnie', 'Profession', 'Ville_Actuelle', 'Type_Crime_Initial', 'Plateforme_Principale']
 
 # Encodeurs par défaut (à ajuster selon votre entraînement)
@@ -80,6 +116,20 @@ ENCODERS = {
     }
 }
 
+# Plage d'âge acceptée (identique au formulaire de profilage du frontend)
+AGE_MIN = 10
+AGE_MAX = 100
+
+# Valeur encodée utilisée quand une catégorie est inconnue des encodeurs
+ENCODER_DEFAULTS = {
+    'Region_Name': 0,
+    'Ethnie': 6,
+    'Profession': 7,
+    'Ville_Actuelle': 8,
+    'Type_Crime_Initial': 6,
+    'Plateforme_Principale': 7,
+}
+
 class CriminalProfile(BaseModel):
     Region_Name: str
     Age: int
@@ -94,6 +144,8 @@ class PredictionResponse(BaseModel):
     risk_level: str
     confidence: float
     factors: Dict[str, float]
+    # Contributions signées par variable, calculées à partir du modèle (?explain=true)
+    contributions: Optional[Dict[str, float]] = None
     status: str = "success"
 
 def load_model():
@@ -103,7 +155,7 @@ def load_model():
     - L’API doit pouvoir démarrer même si le modèle est absent/incompatible,
       car d’autres fonctionnalités (ex: Radar IA) ne dépendent pas du modèle.
     """
-    global model
+    global model, model_version
     model_path = Path(__file__).parent / "best_recidivism_model.joblib"
 
     if not model_path.exists():
@@ -117,7 +169,9 @@ def load_model():
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
             model = joblib.load(model_path)
-        print(f"[OK] Modele charge: {type(model).__name__}")
+        digest = hashlib.sha256(model_path.read_bytes()).hexdigest()[:12]
+        model_version = f"{type(model).__name__}:{digest}"
+        print(f"[OK] Modele charge: {type(model).__name__} ({model_version})")
         return True
     except Exception as e:
         print(f"[WARN] Erreur chargement modele: {str(e)[:400]}")
@@ -125,21 +179,75 @@ def load_model():
         model = None
         return False
 
+def current_model_version() -> str:
+    if model is None:
+        return "demo"
+    return model_version or type(model).__name__
+
 def encode_features(profile: CriminalProfile) -> np.ndarray:
     """Encode les features catégorielles selon les encodeurs utilisés lors de l'entraînement"""
     features = []
     
     # Encoder chaque feature dans l'ordre attendu par le modèle
-    features.append(ENCODERS['Region_Name'].get(profile.Region_Name, 0))
+    features.append(ENCODERS['Region_Name'].get(profile.Region_Name, ENCODER_DEFAULTS['Region_Name']))
     features.append(profile.Age / 100.0)  # Normalisation de l'âge
-    features.append(ENCODERS['Ethnie'].get(profile.Ethnie, 6))
-    features.append(ENCODERS['Profession'].get(profile.Profession, 7))
-    features.append(ENCODERS['Ville_Actuelle'].get(profile.Ville_Actuelle, 8))
-    features.append(ENCODERS['Type_Crime_Initial'].get(profile.Type_Crime_Initial, 6))
-    features.append(ENCODERS['Plateforme_Principale'].get(profile.Plateforme_Principale, 7))
+    features.append(ENCODERS['Ethnie'].get(profile.Ethnie, ENCODER_DEFAULTS['Ethnie']))
+    features.append(ENCODERS['Profession'].get(profile.Profession, ENCODER_DEFAULTS['Profession']))
+    features.append(ENCODERS['Ville_Actuelle'].get(profile.Ville_Actuelle, ENCODER_DEFAULTS['Ville_Actuelle']))
+    features.append(ENCODERS['Type_Crime_Initial'].get(profile.Type_Crime_Initial, ENCODER_DEFAULTS['Type_Crime_Initial']))
+    features.append(ENCODERS['Plateforme_Principale'].get(profile.Plateforme_Principale, ENCODER_DEFAULTS['Plateforme_Principale']))
     
     return np.array([features])
 
+def encode_columns(columns: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """Encodage vectorisé de colonnes brutes (même logique que encode_features).
+
+    Retourne la matrice (n × features) et un masque des lignes valides:
+    âge entier entre AGE_MIN et AGE_MAX et toutes les catégories renseignées
+    sous forme de texte (une liste ou un objet NDJSON rend la ligne invalide).
+    """
+    ages = pd.to_numeric(pd.Series(columns['Age']), errors='coerce')
+    valid = (ages.notna() & (ages % 1 == 0) & ages.between(AGE_MIN, AGE_MAX)).to_numpy()
+    X = np.empty((len(ages), len(feature_names)), dtype=float)
+
+    for j, name in enumerate(feature_names):
+        if name == 'Age':
+            X[:, j] = ages.fillna(0).to_numpy(dtype=float) / 100.0
+            continue
+        values = pd.Series(columns[name], dtype=object)
+        # Seuls les textes sont encodés (list / dict ne sont pas hachables)
+        is_text = values.map(type).eq(str)
+        valid &= (is_text & (values != '')).to_numpy()
+        values = values.where(is_text)
+        X[:, j] = values.map(ENCODERS[name]).fillna(ENCODER_DEFAULTS[name]).to_numpy(dtype=float)
+
+    return X, valid
+
+def model_probabilities(estimator: Any, features: np.ndarray) -> np.ndarray:
+    """Probabilités de récidive d'un modèle donné pour une matrice encodée (un seul appel)."""
+    if hasattr(estimator, 'predict_proba'):
+        probabilities = estimator.predict_proba(features)
+        return probabilities[:, 1] if probabilities.shape[1] > 1 else probabilities[:, 0]
+    if hasattr(estimator, 'predict'):
+        prediction = np.asarray(estimator.predict(features), dtype=float)
+        return np.where((prediction >= 0) & (prediction <= 1), prediction, sigmoid(prediction))
+    raise ValueError("Type de modèle non supporté")
+
+def predict_probabilities(features: np.ndarray) -> np.ndarray:
+    """Probabilités de récidive du modèle chargé pour une matrice encodée."""
+    return model_probabilities(model, features)
+
+def risk_levels(probabilities: np.ndarray) -> np.ndarray:
+    """Version vectorisée de calculate_risk_level."""
+    return np.select(
+        [probabilities < 0.25, probabilities < 0.5, probabilities < 0.75],
+        ["low", "medium", "high"],
+        default="critical",
+    )
+
+def confidences(probabilities: np.ndarray) -> np.ndarray:
+    return np.minimum(0.95, 0.7 + 0.25 * (1 - np.abs(probabilities - 0.5) * 2))
+
 def calculate_risk_level(probability: float) -> str:
     """Détermine le niveau de risque basé sur la probabilité"""
     if probability < 0.25:
@@ -152,7 +260,7 @@ def calculate_risk_level(probability: float) -> str:
         return "critical"
 
 def calculate_feature_importance(profile: CriminalProfile) -> Dict[str, float]:
-    """Calcule l'importance des features pour cette prédiction (approximative)"""
+    """Importance heuristique des features (mode démonstration, sans modèle)"""
     factors = {}
     
     # Facteurs de risque basés sur le domaine d'expertise
@@ -163,6 +271,23 @@ def calculate_feature_importance(profile: CriminalProfile) -> Dict[str, float]:
     
     return factors
 
+# Vecteur de référence pour l'explication par occlusion: catégories par défaut, 25 ans
+EXPLAIN_BASELINE = np.array([25 / 100.0 if name == 'Age' else ENCODER_DEFAULTS[name] for name in feature_names],
+                            dtype=float)
+_explainer: Optional[Explainer] = None
+
+def explain_contributions(features: np.ndarray) -> List[Dict[str, float]]:
+    """Contributions calculées à partir du modèle chargé, pour toutes les lignes d'un lot.
+
+    Contributions signées par variable (unités de probabilité), en un appel
+    vectorisé; l'explainer est reconstruit si le modèle change.
+    """
+    global _explainer
+    if _explainer is None or _explainer.model is not model:
+        _explainer = Explainer(model, len(feature_names), predict_probabilities, EXPLAIN_BASELINE)
+    contributions = np.round(_explainer.explain(features), 4) + 0.0  # pas de -0.0 dans le JSON
+    return [dict(zip(feature_names, row)) for row in contributions.tolist()]
+
 def simulate_prediction(profile: CriminalProfile) -> float:
     """Simule une prédiction basée sur des règles heuristiques"""
     import random
@@ -182,6 +307,19 @@ def simulate_prediction(profile: CriminalProfile) -> float:
     
     return max(0.0, min(1.0, base_risk + random_factor))
 
+# Journal d'audit des prédictions (tampon mémoire vidé par une tâche de fond)
+try:
+    AUDIT_LOG = AuditLog()
+except ValueError as e:
+    print(f"[WARN] {e}; journal d'audit en JSON Lines")
+    AUDIT_LOG = AuditLog(backend="jsonl")
+
+# Dérive des entrées (fenêtres de comptes de taille fixe, alimentées par les prédictions)
+DRIFT_MONITOR = DriftMonitor(ENCODERS, AGE_MIN, AGE_MAX)
+
+# Modèle candidat scoré en arrière-plan sur les mêmes vecteurs (SHADOW_MODEL_PATH)
+SHADOW = ShadowScorer(model_probabilities, risk_levels)
+
 @app.on_event("startup")
 async def startup_event():
     """Initialisation au démarrage de l'API (modèle optionnel)."""
@@ -193,6 +331,54 @@ async def startup_event():
         # Ne jamais empêcher l'API de démarrer à cause du modèle
         print(f"[WARN] Initialisation modele ignoree (erreur): {e}")
 
+    # Radar: enregistrement / rejeu hors-ligne et LLM local (RADAR_REPLAY_MODE, RADAR_LLM)
+    try:
+        configure_radar_from_env()
+    except Exception as e:
+        print(f"[WARN] Configuration Radar ignoree (erreur): {e}")
+
+    # Référence de dérive épinglée lors d'une exécution précédente
+    if DRIFT_REFERENCE_PATH and Path(DRIFT_REFERENCE_PATH).exists():
+        try:
+            DRIFT_MONITOR.load_reference(DRIFT_REFERENCE_PATH)
+        except Exception as e:
+            print(f"[WARN] Reference de derive ignoree (erreur): {e}")
+
+    if SHADOW_MODEL_PATH:
+        try:
+            SHADOW.load(SHADOW_MODEL_PATH)
+            print(f"[OK] Modele shadow charge: {SHADOW.model_version}")
+        except Exception as e:
+            print(f"[WARN] Modele shadow ignore (erreur): {str(e)[:400]}")
+
+    # Index des articles: rechargé depuis le disque, reconstruit seulement si le corpus a changé
+    global ARTICLE_INDEX
+    try:
+        started = time.perf_counter()
+        ARTICLE_INDEX, rebuilt = await asyncio.to_thread(load_or_build)
+        print(f"[OK] Index des articles {'construit' if rebuilt else 'charge'}: "
+              f"{ARTICLE_INDEX.size} articles, {len(ARTICLE_INDEX.terms)} termes "
+              f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+    except IndexUnavailable as e:
+        print(f"[INFO] Recherche d'articles desactivee: {e}")
+    except Exception as e:
+        print(f"[WARN] Index des articles ignore (erreur): {e}")
+
+    AUDIT_LOG.start()
+    SHADOW.start()
+    # Progression des runs Radar exécutés par les autres workers (cache partagé uniquement)
+    global _radar_relay_task
+    if senegal_radar.SHARED_CACHE.shared:
+        _radar_relay_task = asyncio.create_task(RADAR_EVENTS.relay(senegal_radar.SHARED_CACHE.exchange_events))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _radar_relay_task is not None:
+        _radar_relay_task.cancel()
+    # Les enregistrements encore en mémoire sont écrits avant l'arrêt
+    await AUDIT_LOG.stop()
+    await asyncio.to_thread(SHADOW.stop)
+
 @app.get("/")
 async def root():
     """Point d'entrée de l'API"""
@@ -214,10 +400,290 @@ async def health_check():
     }
 
 
+# ============================================================
+# Métriques Prometheus
+# ============================================================
+
+# Enfants pré-liés: aucune recherche d'étiquettes sur le chemin de /predict
+_PREDICT_ENCODE = PREDICTION_STAGE_SECONDS.labels("predict", "encode")
+_PREDICT_INFERENCE = PREDICTION_STAGE_SECONDS.labels("predict", "inference")
+_PREDICT_EXPLAIN = PREDICTION_STAGE_SECONDS.labels("predict", "explain")
+_PREDICT_RESPONSE = PREDICTION_STAGE_SECONDS.labels("predict", "response")
+_BATCH_ENCODE = PREDICTION_STAGE_SECONDS.labels("batch_predict", "encode")
+_BATCH_INFERENCE = PREDICTION_STAGE_SECONDS.labels("batch_predict", "inference")
+_BATCH_EXPLAIN = PREDICTION_STAGE_SECONDS.labels("batch_predict", "explain")
+_BATCH_RESPONSE = PREDICTION_STAGE_SECONDS.labels("batch_predict", "response")
+
+# Étapes Radar: fetch / parse / filter par site, find_rss_feed, llm, analyze_with_groq, render
+senegal_radar.STAGE_OBSERVERS.append(observe_radar_stage)
+
+def _radar_cache_hit_ratio() -> Dict[Tuple[str, ...], float]:
+    stats = cache_stats()
+    return {(): ratio(stats["hit"], stats["hit"] + stats["miss"])}
+
+REGISTRY.callback("model_loaded", "1 si le modèle est chargé, 0 en mode démonstration",
+                  lambda: {(): 1.0 if model is not None else 0.0})
+REGISTRY.callback("radar_cache_lookups", "Consultations du cache Radar par issue (hit, miss, refresh, stale, wait)",
+                  lambda: {(k,): v for k, v in cache_stats().items()}, ("result",), kind="counter")
+REGISTRY.callback("radar_cache_hit_ratio", "Part des consultations du cache Radar servies depuis le cache",
+                  _radar_cache_hit_ratio)
+REGISTRY.callback("radar_host_circuit_open", "1 si le disjoncteur du site est ouvert",
+                  lambda: {(host,): float(s["state"] == "open") for host, s in HOSTS.snapshot().items()},
+                  ("site",))
+
+AUDIT_FLUSH_SECONDS = REGISTRY.histogram(
+    "audit_flush_duration_seconds", "Durée d'écriture d'un lot du journal d'audit")
+AUDIT_LOG.flush_observers.append(lambda seconds, count: AUDIT_FLUSH_SECONDS.observe(seconds))
+REGISTRY.callback("audit_records", "Enregistrements d'audit (accepted, dropped, written, failed)",
+                  lambda: {(k,): v for k, v in AUDIT_LOG.stats.items() if k != "flushes"}, ("result",),
+                  kind="counter")
+REGISTRY.callback("audit_buffer_depth", "Enregistrements d'audit en attente d'écriture",
+                  lambda: {(): AUDIT_LOG.depth})
+REGISTRY.callback("audit_buffer_capacity", "Capacité du tampon d'audit (au-delà: pertes)",
+                  lambda: {(): AUDIT_LOG.capacity})
+REGISTRY.callback("audit_backpressure_seconds", "Temps passé par le scoring en masse à attendre l'écriture de l'audit",
+                  lambda: {(): AUDIT_LOG.backpressure_seconds}, kind="counter")
+
+@app.get("/metrics")
+async def metrics():
+    """Métriques au format texte Prometheus."""
+    return Response(content=REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+# ============================================================
+# Administration: profileur par échantillonnage
+# ============================================================
+
+def _require_admin(request: Request) -> None:
+    # Endpoints de profilage invisibles tant qu'aucun ADMIN_TOKEN n'est configuré
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not is_admin(request.headers.get("x-admin-token")):
+        raise HTTPException(status_code=403, detail="Jeton administrateur invalide")
+
+def _require_admin_token(request: Request) -> None:
+    # Actions d'exploitation (dérive, shadow): la route existe, indépendamment du profilage
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=503, detail="ADMIN_TOKEN non configuré: action d'administration indisponible")
+    if not is_admin(request.headers.get("x-admin-token")):
+        raise HTTPException(status_code=403, detail="Jeton administrateur invalide")
+
+@app.get("/admin/profile")
+async def admin_profile(request: Request, seconds: float = 10.0, mode: str = "wall", interval_ms: float = 5.0):
+    """Profil par échantillonnage du processus entier pendant `seconds` secondes.
+
+    Retourne les piles agrégées au format collapsed (flamegraph.pl, speedscope):
+    - mode=wall : temps écoulé (attentes I/O comprises), poids = échantillons
+    - mode=cpu  : temps CPU par thread, poids = microsecondes
+
+    Exemple:
+        curl -H "X-Admin-Token: $ADMIN_TOKEN" ".../admin/profile?seconds=30&mode=cpu" > cpu.folded
+    """
+    _require_admin(request)
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds doit être entre 0 et {PROFILE_MAX_SECONDS:g}")
+    try:
+        sampler = start_profile(mode, interval_ms / 1000.0)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        stop_profile(sampler)
+
+    summary = sampler.summary()
+    collapsed = await asyncio.to_thread(sampler.collapsed)
+    return Response(
+        content=collapsed,
+        media_type="text/plain",
+        headers={"X-Profile-Mode": summary["mode"], "X-Profile-Samples": str(summary["samples"])},
+    )
+
+@app.get("/admin/profile/requests/{profile_id}")
+async def admin_request_profile(request: Request, profile_id: str, format: str = "collapsed"):
+    """Profil d'une requête envoyée avec `X-Profile: wall|cpu` (voir l'en-tête X-Profile-Id)."""
+    _require_admin(request)
+    profile = get_request_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profil introuvable: {profile_id}")
+    summary, collapsed = profile
+    if format == "json":
+        return {"summary": summary, "collapsed": collapsed}
+    return Response(content=collapsed, media_type="text/plain")
+
+
+# ============================================================
+# Dérive des entrées
+# ============================================================
+
+def _drift_psi() -> Dict[Tuple[str, ...], float]:
+    return {(name,): score for name, score in DRIFT_MONITOR.current_scores().items() if score is not None}
+
+REGISTRY.callback("input_drift_psi", "PSI de la fenêtre courante contre la référence, par variable",
+                  _drift_psi, ("feature",))
+REGISTRY.callback("input_unknown_category_rate",
+                  "Part des valeurs inconnues des encodeurs dans la fenêtre courante",
+                  lambda: {(k,): v for k, v in DRIFT_MONITOR.current_unknown_rates().items() if v is not None},
+                  ("feature",))
+
+@app.get("/drift")
+async def input_drift():
+    """Dérive des entrées et des probabilités: fenêtre courante et fenêtres conservées contre la référence."""
+    return DRIFT_MONITOR.report()
+
+@app.post("/drift/reference")
+async def pin_drift_reference(request: Request, include_current: bool = True):
+    """Épingle les fenêtres conservées comme référence (sauvegardée dans DRIFT_REFERENCE_PATH si défini)."""
+    _require_admin_token(request)
+    count = DRIFT_MONITOR.pin_reference(include_current)
+    if DRIFT_REFERENCE_PATH:
+        await asyncio.to_thread(DRIFT_MONITOR.save_reference, DRIFT_REFERENCE_PATH)
+    return {"status": "pinned", "count": count, "saved_to": DRIFT_REFERENCE_PATH or None}
+
+@app.delete("/drift/reference")
+async def clear_drift_reference(request: Request):
+    """Revient à la référence par défaut (cumul des fenêtres précédentes)."""
+    _require_admin_token(request)
+    DRIFT_MONITOR.clear_reference()
+    return {"status": "cleared"}
+
+
+# ============================================================
+# Modèle shadow
+# ============================================================
+
+SHADOW_BATCH_SECONDS = REGISTRY.histogram(
+    "shadow_batch_duration_seconds", "Durée d'inférence du modèle shadow par lot")
+SHADOW.batch_observers.append(lambda seconds, count: SHADOW_BATCH_SECONDS.observe(seconds))
+REGISTRY.callback("shadow_rows", "Lignes soumises au modèle shadow (submitted, dropped, scored, failed)",
+                  lambda: {(k,): v for k, v in SHADOW.stats.items() if k != "batches"}, ("result",),
+                  kind="counter")
+REGISTRY.callback("shadow_agreement_ratio", "Accord du modèle shadow avec le modèle principal",
+                  lambda: {(k,): v for k, v in SHADOW.snapshot()["agreement"].items()
+                           if k in ("risk_level", "decision") and v is not None},
+                  ("kind",))
+REGISTRY.callback("shadow_queue_rows", "Lignes en attente de scoring par le modèle shadow",
+                  lambda: {(): SHADOW.depth})
+
+@app.get("/shadow")
+async def shadow_report():
+    """Accord et latence du modèle shadow par rapport au modèle principal."""
+    return SHADOW.snapshot()
+
+@app.post("/shadow/reset")
+async def reset_shadow_stats(request: Request):
+    """Remet à zéro les statistiques du modèle shadow (jeton admin)."""
+    _require_admin_token(request)
+    SHADOW.reset()
+    return {"status": "reset"}
+
+
+# ============================================================
+# Articles (sahaba-articles-detailles.json): recherche plein texte
+# ============================================================
+
+ARTICLE_INDEX: Optional[ArticleIndex] = None
+ARTICLES_MAX_LIMIT = 100
+
+def _article_index() -> ArticleIndex:
+    if ARTICLE_INDEX is None:
+        raise HTTPException(status_code=503, detail="Index des articles indisponible")
+    return ARTICLE_INDEX
+
+def _article_fields(index: ArticleIndex, fields: Optional[str], default: Optional[Tuple[str, ...]]) -> List[str]:
+    """Champs demandés (`fields=a,b`) ou ceux par défaut (tous si `default` est None)."""
+    requested = fields.split(",") if fields else list(default if default is not None else index.fields)
+    try:
+        return index.check_fields(f.strip() for f in requested)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/articles")
+async def list_articles(offset: int = 0, limit: int = 20, fields: Optional[str] = None):
+    """Articles paginés, limités aux champs demandés (défaut: id, noms et titre)."""
+    index = _article_index()
+    selected = _article_fields(index, fields, ARTICLE_DEFAULT_FIELDS)
+    offset, limit = max(0, offset), max(1, min(limit, ARTICLES_MAX_LIMIT))
+    end = min(index.size, offset + limit)
+    return {
+        "total": index.size,
+        "offset": offset,
+        "next_offset": end if end < index.size else None,
+        "items": [index.project(position, selected) for position in range(offset, end)],
+    }
+
+@app.get("/articles/search")
+async def search_articles(q: str, offset: int = 0, limit: int = 10, fields: Optional[str] = None,
+                          prefix: bool = True):
+    """Recherche classée (BM25) sur les noms, titres et textes, en français ou en arabe.
+
+    Tous les mots doivent être présents; accents et voyelles arabes sont
+    ignorés; le dernier mot est aussi cherché comme préfixe (`prefix=false`
+    pour le désactiver). Seuls les champs demandés sont renvoyés.
+    """
+    index = _article_index()
+    selected = _article_fields(index, fields, ARTICLE_DEFAULT_FIELDS)
+    offset, limit = max(0, offset), max(1, min(limit, ARTICLES_MAX_LIMIT))
+    started = time.perf_counter()
+    total, hits = index.search(q, limit=limit, offset=offset, prefix=prefix)
+    results = [{"score": round(score, 4), **index.project(position, selected)} for position, score in hits]
+    return {
+        "query": q,
+        "total": total,
+        "offset": offset,
+        "next_offset": offset + len(hits) if offset + len(hits) < total else None,
+        "results": results,
+        "took_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+@app.get("/articles/{article_id}")
+async def get_article(article_id: str, fields: Optional[str] = None):
+    """Un article complet, ou seulement les champs demandés."""
+    index = _article_index()
+    selected = _article_fields(index, fields, None)
+    position = index.position(article_id)
+    if position is None:
+        raise HTTPException(status_code=404, detail=f"Article introuvable: {article_id}")
+    return index.project(position, selected)
+
+
 # ============================================================
 # Radar Sénégal (scraping + Groq + carte)
 # ============================================================
 
+# Refresh forcé en cours (partagé entre /alerts, /map et /stream pour éviter les runs en double)
+_radar_refresh_task: Optional[asyncio.Task] = None
+# Relais des événements Radar entre workers (lancé au démarrage)
+_radar_relay_task: Optional[asyncio.Task] = None
+
+
+async def _run_radar_refresh() -> Dict[str, Any]:
+    try:
+        return await asyncio.to_thread(run_radar, True, on_event=RADAR_EVENTS.publish)
+    except Exception as e:
+        RADAR_EVENTS.publish({"type": "run_error", "data": {"detail": str(e)[:400]}})
+        raise
+
+
+def _start_radar_refresh() -> asyncio.Task:
+    """Lance un refresh en tâche de fond, ou réutilise celui déjà en cours."""
+    global _radar_refresh_task
+    if _radar_refresh_task is None or _radar_refresh_task.done():
+        _radar_refresh_task = asyncio.create_task(_run_radar_refresh())
+        # Évite "Task exception was never retrieved" quand seul le flux SSE suit le run
+        _radar_refresh_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return _radar_refresh_task
+
+
+async def _get_radar_result(refresh: bool) -> Dict[str, Any]:
+    if refresh:
+        return await asyncio.shield(_start_radar_refresh())
+    return await asyncio.to_thread(run_radar, False, on_event=RADAR_EVENTS.publish)
+
+
 @app.get("/senegal-radar/alerts")
 async def senegal_radar_alerts(refresh: bool = False):
     """Retourne les alertes détectées via le pipeline Radar Sénégal.
@@ -229,7 +695,7 @@ async def senegal_radar_alerts(refresh: bool = False):
     - refresh=true: force un nouveau scraping + analyse
     """
     try:
-        return await asyncio.to_thread(run_radar, refresh)
+        return await _get_radar_result(refresh)
     except RuntimeError as e:
         # ex: GROQ_API_KEY manquant
         raise HTTPException(status_code=503, detail=str(e))
@@ -255,14 +721,65 @@ async def senegal_radar_map(refresh: bool = False):
                 )
             )
 
-        data = await asyncio.to_thread(run_radar, refresh)
-        html = render_map_html(data.get("alerts", []))
+        data = await _get_radar_result(refresh)
+        # Carte déjà rendue par le worker qui a exécuté le run (rendue ici sinon)
+        html = await asyncio.to_thread(get_map_html, data)
         return HTMLResponse(content=html)
     except RuntimeError as e:
         raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur Radar Sénégal: {str(e)}")
 
+@app.get("/senegal-radar/articles")
+async def senegal_radar_articles():
+    """Articles scrapés lors du dernier run Radar (partagés entre workers)."""
+    articles = await asyncio.to_thread(get_cached_articles)
+    if articles is None:
+        raise HTTPException(status_code=404, detail="Aucune analyse Radar n'a encore été générée")
+    return {"articles": articles, "count": len(articles), "status": "success"}
+
+@app.get("/senegal-radar/hosts")
+async def senegal_radar_hosts():
+    """État de santé par site d'actualités (latences, timeout adaptatif, disjoncteur)."""
+    return {"hosts": HOSTS.snapshot(), "status": "success"}
+
+
+@app.get("/senegal-radar/stream")
+async def senegal_radar_stream(request: Request, refresh: bool = False):
+    """Flux Server-Sent Events du pipeline Radar Sénégal.
+
+    Événements: snapshot (dernier résultat en cache), run_started, site_fetched,
+    scrape_done, llm_chunk_done, alert, run_done, run_error.
+
+    - refresh=false (défaut): envoie le snapshot en cache puis reste à l'écoute
+      des runs déclenchés ailleurs (plus besoin de poller /alerts)
+    - refresh=true: déclenche un nouveau run (ou rejoint celui en cours)
+    """
+    queue = RADAR_EVENTS.subscribe()
+    cached = await asyncio.to_thread(get_cached_result)
+    if refresh:
+        _start_radar_refresh()
+
+    async def event_stream():
+        try:
+            if cached is not None and not refresh:
+                yield format_sse({"type": "snapshot", "data": cached})
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            RADAR_EVENTS.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/encoders")
 async def get_encoders():
     """Retourne les encodeurs disponibles"""
@@ -272,9 +789,12 @@ async def get_encoders():
     }
 
 @app.post("/predict", response_model=PredictionResponse)
-async def predict_recidivism(profile: CriminalProfile):
+async def predict_recidivism(profile: CriminalProfile, explain: bool = False):
     """
     Prédiction de récidive basée sur le profil criminel
+
+    - explain=true: ajoute `contributions`, contribution signée de chaque
+      variable calculée à partir du modèle (plus coûteux que la prédiction)
     """
     if model is None:
         # Mode simulation si le modèle n'est pas disponible
@@ -282,6 +802,9 @@ async def predict_recidivism(profile: CriminalProfile):
         risk_level = calculate_risk_level(recidive_prob)
         factors = calculate_feature_importance(profile)
         confidence = 0.65  # Confiance réduite en mode simulation
+        inputs = profile.model_dump()
+        AUDIT_LOG.record("predict", current_model_version(), inputs, None, float(recidive_prob), risk_level)
+        DRIFT_MONITOR.observe_one(inputs, float(recidive_prob))
         
         return PredictionResponse(
             recidive_probability=float(recidive_prob),
@@ -292,8 +815,10 @@ async def predict_recidivism(profile: CriminalProfile):
         )
     
     try:
+        started = time.perf_counter()
         # Encoder les features
         features = encode_features(profile)
+        encoded = time.perf_counter()
         
         # Faire la prédiction
         if hasattr(model, 'predict_proba'):
@@ -307,20 +832,35 @@ async def predict_recidivism(profile: CriminalProfile):
             recidive_prob = prediction if 0 <= prediction <= 1 else sigmoid(prediction)
         else:
             raise ValueError("Type de modèle non supporté")
+        inferred = time.perf_counter()
         
         # Calculer les métriques dérivées
         risk_level = calculate_risk_level(recidive_prob)
         factors = calculate_feature_importance(profile)
+        contributions = explain_contributions(features)[0] if explain else None
+        explained = time.perf_counter()
         
         # Simuler une confiance basée sur la cohérence des données
         confidence = min(0.95, 0.7 + 0.25 * (1 - abs(recidive_prob - 0.5) * 2))
         
-        return PredictionResponse(
+        response = PredictionResponse(
             recidive_probability=float(recidive_prob),
             risk_level=risk_level,
             confidence=float(confidence),
-            factors=factors
+            factors=factors,
+            contributions=contributions
         )
+        _PREDICT_ENCODE.observe(encoded - started)
+        _PREDICT_INFERENCE.observe(inferred - encoded)
+        if explain:
+            _PREDICT_EXPLAIN.observe(explained - inferred)
+        _PREDICT_RESPONSE.observe(time.perf_counter() - explained)
+        inputs = profile.model_dump()
+        AUDIT_LOG.record("predict", current_model_version(), inputs, features[0].tolist(),
+                         response.recidive_probability, risk_level)
+        DRIFT_MONITOR.observe_one(inputs, response.recidive_probability)
+        SHADOW.submit(features, np.array([response.recidive_probability]))
+        return response
         
     except Exception as e:
         raise HTTPException(
@@ -329,16 +869,29 @@ async def predict_recidivism(profile: CriminalProfile):
         )
 
 @app.post("/batch_predict")
-async def batch_predict(profiles: list[CriminalProfile]):
-    """Prédiction en lot pour plusieurs profils"""
+async def batch_predict(profiles: list[CriminalProfile], explain: bool = False):
+    """Prédiction en lot pour plusieurs profils
+
+    - explain=true: ajoute `contributions` à chaque résultat, calculées pour
+      tout le lot en un appel après la boucle
+    """
     if model is None:
         raise HTTPException(status_code=503, detail="Modèle non chargé")
     
+    BATCH_SIZE.labels("batch_predict").observe(len(profiles))
+    # Durées cumulées par étape sur tout le lot (une observation par requête)
+    encode_s = inference_s = response_s = 0.0
+    version = current_model_version()
     results = []
+    # Lignes scorées (indice du résultat, vecteur encodé): expliquées ensemble après la boucle
+    explained_rows: List[int] = []
+    explained_features: List[np.ndarray] = []
     for profile in profiles:
         try:
+            started = time.perf_counter()
             # Réutiliser la logique de prédiction individuelle
             features = encode_features(profile)
+            encoded = time.perf_counter()
             
             if hasattr(model, 'predict_proba'):
                 probabilities = model.predict_proba(features)[0]
@@ -346,6 +899,9 @@ async def batch_predict(profiles: list[CriminalProfile]):
             else:
                 prediction = model.predict(features)[0]
                 recidive_prob = prediction if 0 <= prediction <= 1 else sigmoid(prediction)
+            inferred = time.perf_counter()
+            encode_s += encoded - started
+            inference_s += inferred - encoded
             
             results.append({
                 "recidive_probability": float(recidive_prob),
@@ -353,6 +909,13 @@ async def batch_predict(profiles: list[CriminalProfile]):
                 "confidence": min(0.95, 0.7 + 0.25 * (1 - abs(recidive_prob - 0.5) * 2)),
                 "factors": calculate_feature_importance(profile)
             })
+            explained_rows.append(len(results) - 1)
+            explained_features.append(features[0])
+            response_s += time.perf_counter() - inferred
+            inputs = profile.model_dump()
+            AUDIT_LOG.record("batch_predict", version, inputs, features[0].tolist(),
+                             results[-1]["recidive_probability"], results[-1]["risk_level"])
+            DRIFT_MONITOR.observe_one(inputs, results[-1]["recidive_probability"])
         except Exception as e:
             results.append({
                 "error": str(e),
@@ -362,9 +925,543 @@ async def batch_predict(profiles: list[CriminalProfile]):
                 "factors": {}
             })
     
+    if explained_rows:
+        SHADOW.submit(np.vstack(explained_features),
+                      np.array([results[i]["recidive_probability"] for i in explained_rows]))
+    if explain and explained_rows:
+        started = time.perf_counter()
+        for index, contributions in zip(explained_rows, explain_contributions(np.vstack(explained_features))):
+            results[index]["contributions"] = contributions
+        _BATCH_EXPLAIN.observe(time.perf_counter() - started)
+    _BATCH_ENCODE.observe(encode_s)
+    _BATCH_INFERENCE.observe(inference_s)
+    _BATCH_RESPONSE.observe(response_s)
     return {"results": results, "count": len(results)}
 
 
+# Taille des paquets de lignes pour le scoring en flux (borne la mémoire)
+STREAM_CHUNK_ROWS = 1000
+STREAM_RESULT_COLUMNS = ["row", "recidive_probability", "risk_level", "confidence", "error"]
+
+def observe_scored(
+    endpoint: str,
+    categories: Dict[str, Any],
+    positions: Dict[str, np.ndarray],
+    features: np.ndarray,
+    probabilities: np.ndarray,
+) -> None:
+    """Journalise un lot de lignes valides scorées et le transmet à la dérive et au modèle shadow.
+
+    Appelé hors event loop: l'audit peut faire attendre le lot (contre-pression).
+
+    `categories`: valeurs brutes des variables catégorielles des lignes valides
+    (listes, tableaux numpy ou colonnes Arrow; l'âge, déjà validé, est repris
+    du vecteur encodé).
+    """
+    ages = np.rint(features[:, feature_names.index('Age')] * 100.0)
+    inputs = {name: ages.astype(np.int64) if name == 'Age' else categories[name] for name in feature_names}
+    AUDIT_LOG.record_batch(endpoint, current_model_version(), inputs, features, probabilities,
+                           risk_levels(probabilities))
+    DRIFT_MONITOR.observe_batch(positions, ages, probabilities)
+    SHADOW.submit(features, probabilities)
+
+def score_row_chunk(
+    rows: List[Dict[str, Any]], endpoint: str = "batch_predict_stream"
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """Score un paquet de lignes brutes (CSV/NDJSON) en un seul appel au modèle.
+
+    Retourne (probabilités, NaN si ligne invalide; code d'erreur par ligne,
+    -1 si valide; messages d'erreur indexés par code).
+    """
+    columns = {name: [row.get(name) for row in rows] for name in feature_names}
+    features, valid = encode_columns(columns)
+
+    probabilities = np.full(len(rows), np.nan)
+    if valid.any():
+        probabilities[valid] = predict_probabilities(features[valid])
+
+    if valid.any():
+        positions = {
+            name: DRIFT_MONITOR.category_positions(name, values)[valid]
+            for name, values in columns.items() if name in ENCODERS
+        }
+        rows_kept = np.flatnonzero(valid)
+        categories = {name: [columns[name][i] for i in rows_kept] for name in ENCODERS}
+        observe_scored(endpoint, categories, positions, features[valid], probabilities[valid])
+
+    error_codes = np.full(len(rows), -1, dtype=np.int32)
+    messages: List[str] = []
+    codes: Dict[str, int] = {}
+    for i in np.flatnonzero(~valid):
+        row = rows[i]
+        missing = [name for name in feature_names if row.get(name) in (None, '')]
+        not_text = [name for name in ENCODERS if name not in missing and not isinstance(row.get(name), str)]
+        message = row.get("__error__") or (
+            f"Champs manquants: {', '.join(missing)}" if missing
+            else f"Valeurs invalides (texte attendu): {', '.join(not_text)}" if not_text
+            else f"Age invalide (entier entre {AGE_MIN} et {AGE_MAX} attendu)"
+        )
+        if message not in codes:
+            codes[message] = len(messages)
+            messages.append(message)
+        error_codes[i] = codes[message]
+    return probabilities, error_codes, messages
+
+def result_records(
+    probabilities: np.ndarray,
+    error_codes: np.ndarray,
+    messages: List[str],
+    first_row: int,
+    ids: Optional[Tuple[str, List[Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """Résultats ligne à ligne (format de /batch_predict/stream) à partir des colonnes scorées."""
+    scored = np.nan_to_num(probabilities)
+    levels = risk_levels(scored)
+    confidence = confidences(scored)
+
+    records = []
+    for i in range(len(probabilities)):
+        record: Dict[str, Any] = {"row": first_row + i}
+        if ids is not None:
+            record[ids[0]] = ids[1][i]
+        if error_codes[i] < 0:
+            record.update(
+                recidive_probability=float(scored[i]),
+                risk_level=str(levels[i]),
+                confidence=float(confidence[i]),
+            )
+        else:
+            record.update(
+                recidive_probability=0.0,
+                risk_level="unknown",
+                confidence=0.0,
+                error=messages[error_codes[i]],
+            )
+        records.append(record)
+    return records
+
+def score_rows(rows: List[Dict[str, Any]], first_row: int, id_column: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Score un paquet de lignes brutes et retourne un résultat par ligne."""
+    ids = (id_column, [row.get(id_column) for row in rows]) if id_column else None
+    return result_records(*score_row_chunk(rows), first_row, ids)
+
+@app.post("/batch_predict/stream")
+async def batch_predict_stream(
+    request: Request,
+    input_format: Optional[str] = None,
+    output_format: str = "ndjson",
+    chunk_size: int = STREAM_CHUNK_ROWS,
+    id_column: Optional[str] = None,
+):
+    """Scoring en masse d'un fichier CSV ou NDJSON.
+
+    Le fichier (formulaire multipart, champ `file`, ou corps brut) est lu et
+    scoré par paquets de `chunk_size` lignes; les résultats sont renvoyés au fil
+    de l'eau (NDJSON ou CSV) et la mémoire reste bornée par la taille d'un paquet.
+
+    - input_format: csv | ndjson (défaut: déduit du nom de fichier / Content-Type)
+    - output_format: ndjson (défaut) | csv
+    - id_column: colonne d'identifiant à recopier dans chaque résultat
+
+    Exemples:
+        curl -F file=@profils.csv ".../batch_predict/stream?output_format=csv"
+        curl --data-binary @profils.ndjson -H "Content-Type: application/x-ndjson" .../batch_predict/stream
+    """
+    if model is None:
+        raise HTTPException(status_code=503, detail="Modèle non chargé")
+    if output_format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="output_format doit valoir 'ndjson' ou 'csv'")
+
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        # Starlette spoole déjà les fichiers envoyés (mémoire puis disque)
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Champ 'file' manquant dans le formulaire")
+        source, fmt = upload.file, input_format or detect_format(upload.content_type, upload.filename)
+    else:
+        source, fmt = await spool_stream(request.stream()), input_format or detect_format(content_type)
+
+    try:
+        reader = BulkReader(source, fmt)
+        reader.start()
+        missing = reader.missing_columns(feature_names)
+        if missing:
+            raise ValueError(f"Colonnes manquantes: {', '.join(missing)}")
+    except ValueError as e:
+        source.close()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    chunk_size = max(1, min(chunk_size, 10000))
+    output_columns = STREAM_RESULT_COLUMNS if not id_column else ["row", id_column] + STREAM_RESULT_COLUMNS[1:]
+
+    # Générateur synchrone: Starlette l'itère dans son threadpool, la lecture et
+    # l'inférence ne bloquent donc pas l'event loop (/predict reste réactif)
+    def results():
+        try:
+            if output_format == "csv":
+                yield format_csv([], output_columns, header=True)
+            first_row = 0
+            for rows in reader.chunks(chunk_size):
+                scored = score_rows(rows, first_row, id_column)
+                first_row += len(rows)
+                if output_format == "csv":
+                    yield format_csv(scored, output_columns)
+                else:
+                    yield format_ndjson(scored)
+            BATCH_SIZE.labels("batch_predict_stream").observe(first_row)
+        finally:
+            source.close()
+
+    media_type = "text/csv" if output_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(results(), media_type=media_type)
+
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+def encode_arrow_table(
+    table: "pa.Table",
+    strict: bool = False,
+    category_positions: Optional[Dict[str, np.ndarray]] = None,
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """Encodage et validation colonnaires d'une table Arrow (aucun objet Python par ligne).
+
+    Retourne (matrice encodée, code d'erreur par ligne: -1 si valide, messages).
+    Les catégories inconnues prennent la valeur par défaut comme dans
+    encode_features, sauf en mode `strict` où la ligne est rejetée.
+    Si `category_positions` est fourni, il reçoit pour chaque variable
+    catégorielle la position de chaque valeur dans son vocabulaire (-1 si inconnue).
+    """
+    n = table.num_rows
+    features = np.empty((n, len(feature_names)), dtype=float)
+    error_codes = np.full(n, -1, dtype=np.int32)
+    messages: List[str] = []
+
+    def flag(bad: np.ndarray, message: str) -> None:
+        # Seule la première erreur de chaque ligne est conservée
+        bad = bad & (error_codes < 0)
+        if bad.any():
+            error_codes[bad] = len(messages)
+            messages.append(message)
+
+    for j, name in enumerate(feature_names):
+        column = table.column(name).combine_chunks()
+        if pa.types.is_dictionary(column.type):
+            column = column.dictionary_decode()
+
+        if name == 'Age':
+            ages = pc.cast(column, pa.float64()).to_numpy(zero_copy_only=False)
+            flag(np.isnan(ages), "Age manquant")
+            with np.errstate(invalid='ignore'):
+                flag((ages % 1 != 0) | (ages < AGE_MIN) | (ages > AGE_MAX),
+                     f"Age invalide (entier entre {AGE_MIN} et {AGE_MAX} attendu)")
+            features[:, j] = np.nan_to_num(ages) / 100.0
+            continue
+
+        vocabulary = ENCODERS[name]
+        positions = pc.index_in(pc.cast(column, pa.string()), value_set=pa.array(list(vocabulary)))
+        positions = positions.fill_null(-1).to_numpy(zero_copy_only=False)
+        # Position -1 (inconnue) → dernier élément = valeur par défaut
+        codes = np.array(list(vocabulary.values()) + [ENCODER_DEFAULTS[name]], dtype=float)
+        features[:, j] = codes[positions]
+        if category_positions is not None:
+            category_positions[name] = positions
+
+        flag(column.is_null().to_numpy(zero_copy_only=False), f"{name} manquant")
+        if strict:
+            flag(positions < 0, f"{name} inconnu des encodeurs")
+
+    return features, error_codes, messages
+
+def score_arrow_chunk(
+    table: "pa.Table", strict: bool = False, endpoint: str = "batch_predict_columnar"
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """(probabilités NaN si invalide, codes d'erreur, messages) pour une table Arrow."""
+    positions: Dict[str, np.ndarray] = {}
+    features, error_codes, messages = encode_arrow_table(table, strict, positions)
+    valid = error_codes < 0
+
+    probabilities = np.full(table.num_rows, np.nan)
+    if valid.any():
+        probabilities[valid] = predict_probabilities(features[valid])
+        # Colonnes Arrow passées telles quelles à l'audit (aucun objet Python par ligne)
+        kept = table.filter(pa.array(valid))
+        categories = {name: kept.column(name) for name in ENCODERS}
+        observe_scored(endpoint, categories, {name: p[valid] for name, p in positions.items()},
+                       features[valid], probabilities[valid])
+    return probabilities, error_codes, messages
+
+def score_arrow_table(table: "pa.Table", strict: bool = False, id_column: Optional[str] = None) -> "pa.Table":
+    """Score une table Arrow et retourne les résultats sous forme de colonnes."""
+    probabilities, error_codes, messages = score_arrow_chunk(table, strict)
+    valid = error_codes < 0
+    invalid = ~valid
+
+    columns = {}
+    if id_column:
+        columns[id_column] = table.column(id_column)
+    columns["recidive_probability"] = pa.array(probabilities, mask=invalid)
+    columns["risk_level"] = pa.array(risk_levels(probabilities), mask=invalid).dictionary_encode()
+    columns["confidence"] = pa.array(confidences(probabilities), mask=invalid)
+    columns["error"] = pa.DictionaryArray.from_arrays(
+        pa.array(error_codes, mask=valid), pa.array(messages, type=pa.string())
+    )
+    return pa.table(columns)
+
+def _read_arrow_table(body: bytes, fmt: str) -> "pa.Table":
+    buffer = pa.py_buffer(body)
+    if fmt == "parquet":
+        return pq.read_table(pa.BufferReader(buffer))
+    try:
+        return pa.ipc.open_stream(buffer).read_all()
+    except pa.ArrowInvalid:
+        # Format fichier Arrow (.arrow / Feather v2)
+        return pa.ipc.open_file(buffer).read_all()
+
+def _write_arrow_table(table: "pa.Table", fmt: str) -> bytes:
+    sink = pa.BufferOutputStream()
+    if fmt == "parquet":
+        pq.write_table(table, sink)
+    else:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+@app.post("/batch_predict/columnar")
+async def batch_predict_columnar(
+    request: Request,
+    input_format: Optional[str] = None,
+    output_format: str = "arrow",
+    strict: bool = False,
+    id_column: Optional[str] = None,
+):
+    """Scoring en lot au format colonnaire (Arrow IPC ou Parquet).
+
+    Validation vectorisée (vocabulaires ENCODERS, âge entier entre AGE_MIN et
+    AGE_MAX) puis un seul appel au modèle; la réponse contient les colonnes
+    recidive_probability, risk_level, confidence et error (nulles selon la validité).
+
+    - input_format: arrow | parquet (défaut: déduit du Content-Type)
+    - output_format: arrow (défaut) | parquet
+    - strict: rejeter les catégories inconnues au lieu d'appliquer la valeur par défaut
+    - id_column: colonne d'identifiant à recopier dans le résultat
+    """
+    if pa is None:
+        raise HTTPException(status_code=501, detail="pyarrow non installé (pip install pyarrow)")
+    if model is None:
+        raise HTTPException(status_code=503, detail="Modèle non chargé")
+
+    content_type = request.headers.get("content-type", "").lower()
+    fmt = input_format or ("parquet" if "parquet" in content_type else "arrow")
+    if fmt not in ("arrow", "parquet") or output_format not in ("arrow", "parquet"):
+        raise HTTPException(status_code=400, detail="Formats supportés: arrow, parquet")
+
+    body = await request.body()
+    try:
+        table = await asyncio.to_thread(_read_arrow_table, body, fmt)
+    except (pa.ArrowException, OSError) as e:
+        raise HTTPException(status_code=400, detail=f"Fichier {fmt} illisible: {str(e)[:200]}")
+    del body
+
+    required = feature_names + ([id_column] if id_column else [])
+    missing = [c for c in required if c not in table.column_names]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Colonnes manquantes: {', '.join(missing)}")
+    BATCH_SIZE.labels("batch_predict_columnar").observe(table.num_rows)
+
+    try:
+        result = await asyncio.to_thread(score_arrow_table, table, strict, id_column)
+        content = await asyncio.to_thread(_write_arrow_table, result, output_format)
+    except pa.ArrowInvalid as e:
+        raise HTTPException(status_code=400, detail=f"Colonne invalide: {str(e)[:200]}")
+
+    # error est nul pour les lignes valides
+    invalid_rows = result.num_rows - result.column("error").null_count
+    return Response(
+        content=content,
+        media_type=PARQUET_MEDIA_TYPE if output_format == "parquet" else ARROW_STREAM_MEDIA_TYPE,
+        headers={
+            "X-Rows": str(result.num_rows),
+            "X-Invalid-Rows": str(invalid_rows),
+        },
+    )
+
+
+# ============================================================
+# Jobs de scoring asynchrones (gros fichiers, résultats sur disque)
+# ============================================================
+
+# Les workers appellent score_row_chunk / score_arrow_chunk hors event loop;
+# le pool est borné (SCORING_JOBS_MAX_WORKERS) pour préserver la latence de /predict
+SCORING_JOBS = ScoringJobManager(
+    score_rows=partial(score_row_chunk, endpoint="scoring_job"),
+    score_table=partial(score_arrow_chunk, endpoint="scoring_job"),
+    required_columns=feature_names,
+)
+REGISTRY.callback("scoring_jobs", "Jobs de scoring connus par statut",
+                  lambda: counts_by(job["status"] for job in SCORING_JOBS.snapshots()), ("status",))
+JOB_EVENTS_POLL_SECONDS = 0.5
+JOB_RESULTS_MAX_LIMIT = 10000
+
+def _job_input_format(content_type: str, filename: Optional[str] = None) -> str:
+    hint = f"{(filename or '').lower()} {content_type.lower()}"
+    if "parquet" in hint:
+        return "parquet"
+    if "arrow" in hint or "feather" in hint:
+        return "arrow"
+    return detect_format(content_type, filename)
+
+def _get_job(job_id: str):
+    job = SCORING_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job introuvable: {job_id}")
+    return job
+
+@app.post("/batch_predict/jobs", status_code=202)
+async def submit_scoring_job(
+    request: Request,
+    input_format: Optional[str] = None,
+    strict: bool = False,
+    id_column: Optional[str] = None,
+):
+    """Soumet un fichier à scorer en arrière-plan et retourne immédiatement un job_id.
+
+    Entrée: formulaire multipart (champ `file`) ou corps brut, au format
+    csv | ndjson | arrow | parquet (défaut: déduit du nom de fichier / Content-Type).
+    `strict` (arrow/parquet): rejeter les catégories inconnues des encodeurs.
+    `id_column`: colonne d'identifiant (obligatoire dans l'entrée) recopiée
+    dans chaque page de résultats.
+
+    Suivi: GET /batch_predict/jobs/{id} (polling) ou /events (SSE);
+    résultats paginés: GET /batch_predict/jobs/{id}/results?offset=&limit=
+    """
+    if model is None:
+        raise HTTPException(status_code=503, detail="Modèle non chargé")
+
+    content_type = request.headers.get("content-type", "")
+    upload = None
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Champ 'file' manquant dans le formulaire")
+        fmt = input_format or _job_input_format(upload.content_type or "", upload.filename)
+    else:
+        fmt = input_format or _job_input_format(content_type)
+
+    try:
+        job = SCORING_JOBS.create(fmt, strict, id_column)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Le fichier est copié sur disque avant la mise en file (mémoire bornée)
+    try:
+        if upload is not None:
+            await asyncio.to_thread(copy_upload, upload.file, job.input_path)
+        else:
+            target = await asyncio.to_thread(open, job.input_path, "wb")
+            try:
+                await spool_stream(request.stream(), target)
+            finally:
+                await asyncio.to_thread(target.close)
+        SCORING_JOBS.submit(job)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception:
+        SCORING_JOBS.discard(job)
+        raise
+
+    return {"job_id": job.id, "status": job.status, "status_url": f"/batch_predict/jobs/{job.id}"}
+
+@app.get("/batch_predict/jobs")
+async def list_scoring_jobs():
+    return {"jobs": SCORING_JOBS.snapshots(), "status": "success"}
+
+@app.get("/batch_predict/jobs/{job_id}")
+async def get_scoring_job(job_id: str):
+    """État et progression d'un job (queued, running, completed, failed, cancelled)."""
+    return _get_job(job_id).snapshot()
+
+@app.get("/batch_predict/jobs/{job_id}/events")
+async def scoring_job_events(request: Request, job_id: str):
+    """Flux SSE de progression: événements `progress` puis un événement final
+    (`completed`, `failed` ou `cancelled`)."""
+    job = _get_job(job_id)
+
+    async def event_stream():
+        last = None
+        idle = 0.0
+        while not await request.is_disconnected():
+            snapshot = job.snapshot()
+            if job.is_terminal:
+                yield format_sse({"type": job.status, "data": snapshot})
+                return
+            state = (snapshot["status"], snapshot["rows_done"])
+            if state != last:
+                last, idle = state, 0.0
+                yield format_sse({"type": "progress", "data": snapshot})
+            elif idle >= SSE_KEEPALIVE_SECONDS:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+            idle += JOB_EVENTS_POLL_SECONDS
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/batch_predict/jobs/{job_id}/results")
+async def scoring_job_results(job_id: str, offset: int = 0, limit: int = 1000):
+    """Page de résultats (format de /batch_predict/stream), disponible dès le
+    premier paquet scoré; `next_offset` est null une fois le job terminé et lu."""
+    job = _get_job(job_id)
+    if job.status in ("failed", "cancelled") and job.rows_done == 0:
+        raise HTTPException(status_code=409, detail=f"Job {job.status}: {job.error or 'aucun résultat'}")
+
+    offset = max(0, offset)
+    limit = max(1, min(limit, JOB_RESULTS_MAX_LIMIT))
+    try:
+        probabilities, error_codes, messages = await asyncio.to_thread(
+            SCORING_JOBS.read_results, job, offset, limit
+        )
+        ids = None
+        if job.id_column:
+            # Même page que les scores, même si d'autres lignes ont été écrites entre-temps
+            ids = (job.id_column, await asyncio.to_thread(SCORING_JOBS.read_ids, job, offset, len(probabilities)))
+    except FileNotFoundError:
+        raise HTTPException(status_code=410, detail="Résultats supprimés")
+
+    records = result_records(probabilities, error_codes, messages, offset, ids)
+    next_offset = offset + len(records)
+    has_more = next_offset < job.rows_done or not job.is_terminal
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "offset": offset,
+        "count": len(records),
+        "rows_done": job.rows_done,
+        "next_offset": next_offset if has_more else None,
+        "results": records,
+    }
+
+@app.post("/batch_predict/jobs/{job_id}/cancel")
+async def cancel_scoring_job(job_id: str):
+    """Annule un job en attente ou en cours (les résultats déjà écrits restent lisibles)."""
+    _get_job(job_id)
+    return SCORING_JOBS.cancel(job_id).snapshot()
+
+@app.delete("/batch_predict/jobs/{job_id}")
+async def delete_scoring_job(job_id: str):
+    """Annule le job si besoin et supprime ses fichiers."""
+    if not SCORING_JOBS.delete(job_id):
+        raise HTTPException(status_code=404, detail=f"Job introuvable: {job_id}")
+    return {"job_id": job_id, "status": "deleted"}
+
+
 def sigmoid(x):
     """Fonction sigmoid pour normaliser les prédictions"""
     return 1 / (1 + np.exp(-x))
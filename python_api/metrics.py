@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Métriques Prometheus (format texte 0.0.4) sans dépendance externe.
+
+Registre minimal: compteurs, histogrammes à buckets fixes et métriques
+"callback" évaluées au moment du scrape (état du cache Radar, jobs...).
+Sur le chemin critique, une observation coûte un bisect et un verrou non
+contesté; les enfants étiquetés peuvent être pré-liés au chargement du module
+(`HISTO.labels(...)`) pour éviter même la recherche dans le dictionnaire.
+
+Les valeurs sont propres au processus: avec plusieurs workers uvicorn, chaque
+worker expose ses propres séries (Prometheus les agrège par instance).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000, 1000000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: Any) -> Any:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: {len(self.labelnames)} étiquettes attendues")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    @abstractmethod
+    def _new_child(self) -> Any:
+        """Série d'une combinaison d'étiquettes (créée au premier `labels()`)."""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def render(self, name: str, labelnames: Sequence[str], key: LabelValues) -> List[str]:
+        return [f"{name}_total{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def render(self, name: str, labelnames: Sequence[str], key: LabelValues) -> List[str]:
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {count}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+
+class CallbackMetric:
+    """Métrique calculée au scrape: `fn()` retourne {valeurs d'étiquettes: valeur}."""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 fn: Callable[[], Dict[LabelValues, float]]):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        # Convention Prometheus: les compteurs exposent le suffixe _total
+        sample = f"{self.name}_total" if self.kind == "counter" else self.name
+        for key, value in sorted(self.fn().items()):
+            lines.append(f"{sample}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Any] = {}
+
+    def register(self, metric: Any) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, fn: Callable[[], Dict[LabelValues, float]],
+                 labelnames: Sequence[str] = (), kind: str = "gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, kind, labelnames, fn))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:  # un callback en erreur ne doit pas casser le scrape
+                lines.append(f"# {metric.name} indisponible: {_escape(str(e))[:200]}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ============================================================
+# Métriques de l'API
+# ============================================================
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests", "Requêtes HTTP par route, méthode et statut", ("method", "route", "status"))
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP (jusqu'au dernier octet)", ("method", "route"))
+PREDICTION_STAGE_SECONDS = REGISTRY.histogram(
+    "prediction_stage_duration_seconds",
+    "Durée par étape de prédiction (encode, inference, explain, response) et par endpoint", ("endpoint", "stage"))
+BATCH_SIZE = REGISTRY.histogram(
+    "batch_size_rows", "Nombre de lignes par requête de scoring en lot", ("endpoint",), buckets=SIZE_BUCKETS)
+RADAR_STAGE_SECONDS = REGISTRY.histogram(
+    "radar_stage_duration_seconds", "Durée des étapes du pipeline Radar (par site si applicable)", ("stage", "site"))
+
+
+def observe_radar_stage(stage: str, seconds: float, labels: Dict[str, Any]) -> None:
+    """Observateur pour senegal_radar.STAGE_OBSERVERS (seule l'étiquette site est conservée)."""
+    RADAR_STAGE_SECONDS.labels(stage, labels.get("site", "")).observe(seconds)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: compte et chronomètre chaque requête HTTP par route.
+
+    La route est le gabarit FastAPI (`/batch_predict/jobs/{job_id}`), pas le
+    chemin brut, pour borner la cardinalité; "unmatched" pour les 404.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope.get("method", "")
+            HTTP_REQUESTS.labels(method, route, status).inc()
+            HTTP_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+
+
+def counts_by(values: Iterable[str]) -> Dict[LabelValues, float]:
+    """Aide pour les callbacks: nombre d'occurrences de chaque valeur."""
+    counts: Dict[LabelValues, float] = {}
+    for value in values:
+        counts[(value,)] = counts.get((value,), 0) + 1
+    return counts
+
+
+def ratio(numerator: float, denominator: float) -> float:
+    return numerator / denominator if denominator else 0.0
+
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Profileur par échantillonnage intégré (diagnostic en production, sans outil externe).
+
+Un thread dédié relève périodiquement la pile de tous les threads Python
+(sys._current_frames: event loop, threadpool Starlette, workers
+asyncio.to_thread du Radar, jobs de scoring) et agrège les piles au format
+"collapsed" (une ligne `thread;f1;f2;...;fN poids`), lisible par
+flamegraph.pl, speedscope ou inferno.
+
+Modes:
+- wall : chaque échantillon compte 1, que le thread calcule ou attende (I/O, verrous)
+- cpu  : poids = temps CPU consommé par le thread depuis l'échantillon
+         précédent (µs), via time.pthread_getcpuclockid (Unix); les threads
+         en attente n'apparaissent pas
+
+Rien n'est actif tant qu'aucun profil n'est demandé: sans ADMIN_TOKEN les
+endpoints répondent 404 et le middleware par requête n'est pas installé.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILING_ENABLED = bool(ADMIN_TOKEN)
+
+PROFILE_HEADER = "x-profile"
+ADMIN_TOKEN_HEADER = "x-admin-token"
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+DEFAULT_INTERVAL_SECONDS = 0.005
+MIN_INTERVAL_SECONDS = 0.001
+# Profils par requête conservés en mémoire (les plus anciens sont écartés)
+REQUEST_PROFILES_KEPT = 20
+
+MODES = ("wall", "cpu")
+
+_CPU_CLOCKS_AVAILABLE = hasattr(time, "pthread_getcpuclockid")
+
+
+class ProfilerBusy(Exception):
+    """Un profil global est déjà en cours."""
+
+
+def is_admin(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def _frame_label(code: Any) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Échantillonne les piles de tous les threads jusqu'à `stop()`."""
+
+    def __init__(self, mode: str = "wall", interval: float = DEFAULT_INTERVAL_SECONDS):
+        if mode not in MODES:
+            raise ValueError(f"Mode inconnu: {mode} (attendu: {', '.join(MODES)})")
+        if mode == "cpu" and not _CPU_CLOCKS_AVAILABLE:
+            raise ValueError("Mode cpu indisponible sur cette plateforme (utiliser wall)")
+        self.mode = mode
+        self.interval = max(MIN_INTERVAL_SECONDS, interval)
+        self.samples = 0
+        self.started_at = 0.0
+        self.elapsed = 0.0
+        # Clé = (nom du thread, codes de la pile): les libellés ne sont construits qu'à la fin
+        self._stacks: Counter = Counter()
+        self._cpu_last: Dict[int, float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StackSampler":
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "StackSampler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started_at
+        return self
+
+    def _cpu_weight(self, ident: int) -> int:
+        try:
+            now = time.clock_gettime(time.pthread_getcpuclockid(ident))
+        except (OSError, OverflowError):
+            return 0
+        previous = self._cpu_last.get(ident)
+        self._cpu_last[ident] = now
+        # Premier relevé d'un thread: pas encore de delta
+        return int((now - previous) * 1_000_000) if previous is not None else 0
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names: Dict[int, str] = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if any(ident not in names for ident in frames):
+                names = {t.ident: t.name for t in threading.enumerate() if t.ident is not None}
+            for ident, frame in frames.items():
+                if ident == me:
+                    continue
+                weight = self._cpu_weight(ident) if self.mode == "cpu" else 1
+                if weight <= 0:
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                self._stacks[(names.get(ident, f"thread-{ident}"), tuple(reversed(codes)))] += weight
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Piles agrégées au format collapsed (poids: échantillons ou µs CPU)."""
+        labels: Dict[Any, str] = {}
+        lines: Counter = Counter()
+        for (thread_name, codes), weight in self._stacks.items():
+            frames = [labels.get(c) or labels.setdefault(c, _frame_label(c)) for c in codes]
+            lines[";".join([thread_name.replace(";", "_")] + frames)] += weight
+        return "".join(f"{stack} {weight}\n" for stack, weight in lines.most_common())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "interval_ms": round(self.interval * 1000, 3),
+            "samples": self.samples,
+            "duration_s": round(self.elapsed, 3),
+            "stacks": len(self._stacks),
+        }
+
+
+# Un seul profil global à la fois (l'échantillonnage a un coût pendant sa durée)
+_profile_lock = threading.Lock()
+
+
+def start_profile(mode: str = "wall", interval: float = DEFAULT_INTERVAL_SECONDS) -> StackSampler:
+    """Démarre le profil global (ProfilerBusy si un autre est en cours)."""
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("Un profil est déjà en cours")
+    try:
+        return StackSampler(mode, interval).start()
+    except Exception:
+        _profile_lock.release()
+        raise
+
+
+def stop_profile(sampler: StackSampler) -> StackSampler:
+    try:
+        return sampler.stop()
+    finally:
+        _profile_lock.release()
+
+
+# ============================================================
+# Profil d'une requête (en-tête X-Profile)
+# ============================================================
+
+_request_profiles: "OrderedDict[str, Tuple[Dict[str, Any], str]]" = OrderedDict()
+_request_profiles_lock = threading.Lock()
+
+
+def get_request_profile(profile_id: str) -> Optional[Tuple[Dict[str, Any], str]]:
+    with _request_profiles_lock:
+        return _request_profiles.get(profile_id)
+
+
+def _store_request_profile(profile_id: str, summary: Dict[str, Any], collapsed: str) -> None:
+    with _request_profiles_lock:
+        _request_profiles[profile_id] = (summary, collapsed)
+        while len(_request_profiles) > REQUEST_PROFILES_KEPT:
+            _request_profiles.popitem(last=False)
+
+
+class ProfilingMiddleware:
+    """Profile une requête isolée si elle porte `X-Profile: wall|cpu` et un jeton admin valide.
+
+    La réponse reçoit `X-Profile-Id`; le profil (tous les threads pendant la
+    requête) se lit ensuite sur GET /admin/profile/requests/{id}. À n'installer
+    que si PROFILING_ENABLED: sans jeton configuré, aucun coût par requête.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        requested = headers.get(PROFILE_HEADER.encode())
+        if requested is None or not is_admin((headers.get(ADMIN_TOKEN_HEADER.encode()) or b"").decode()):
+            await self.app(scope, receive, send)
+            return
+
+        mode = requested.decode().strip().lower()
+        if mode not in MODES or (mode == "cpu" and not _CPU_CLOCKS_AVAILABLE):
+            mode = "wall"
+        sampler = StackSampler(mode, MIN_INTERVAL_SECONDS)
+        # Identifiant unique entre workers et redémarrages (pas de compteur par processus)
+        profile_id = uuid.uuid4().hex
+
+        async def send_with_id(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            # join du thread d'échantillonnage et agrégation des piles hors event loop
+            await asyncio.to_thread(sampler.stop)
+            summary = {**sampler.summary(), "method": scope.get("method"), "path": scope.get("path")}
+            _store_request_profile(profile_id, summary, await asyncio.to_thread(sampler.collapsed))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Bus d'événements du Radar Sénégal (diffusion Server-Sent Events).
+
+Le pipeline Radar tourne dans un thread (asyncio.to_thread) alors que les
+clients SSE sont servis par l'event loop FastAPI: `publish()` est donc
+thread-safe et se contente de planifier l'ajout dans la file de chaque abonné.
+
+Avec plusieurs workers uvicorn, le run s'exécute dans un seul d'entre eux:
+`relay()` échange périodiquement les événements publiés localement contre
+ceux des autres workers (via le cache Radar partagé), pour que tout client
+SSE suive le run quel que soit le worker auquel il est connecté.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# Intervalle entre deux commentaires "keep-alive" (évite la coupure par les proxies)
+SSE_KEEPALIVE_SECONDS = 15.0
+# Intervalle d'échange des événements avec les autres workers
+RELAY_INTERVAL_SECONDS = 0.5
+# Événements locaux en attente d'envoi aux autres workers (au-delà: les plus anciens sont écartés)
+RELAY_OUTBOX_SIZE = 1024
+
+# (événements à envoyer, position lue) -> (nouvelle position, événements reçus)
+EventExchange = Callable[[List[Dict[str, Any]], Optional[int]], Tuple[int, List[Dict[str, Any]]]]
+
+
+class RadarEventBus:
+    """Diffuse les événements du pipeline Radar à tous les abonnés SSE."""
+
+    def __init__(self, max_queue_size: int = 256):
+        self._max_queue_size = max_queue_size
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        # None tant que le relais entre workers n'est pas lancé
+        self._outbox: Optional[Deque[Dict[str, Any]]] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        """Crée une file d'abonné (à appeler depuis l'event loop)."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._max_queue_size)
+        with self._lock:
+            self._subscribers.append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        with self._lock:
+            self._subscribers = [(loop, q) for loop, q in self._subscribers if q is not queue]
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: Dict[str, Any], forward: bool = True) -> None:
+        """Publie un événement (appelable depuis n'importe quel thread).
+
+        `forward=False`: événement reçu d'un autre worker, pas renvoyé.
+        """
+        event = {"id": next(self._ids), "ts": time.time(), **event}
+        with self._lock:
+            subscribers = list(self._subscribers)
+            if forward and self._outbox is not None:
+                self._outbox.append({k: v for k, v in event.items() if k != "id"})
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_put_dropping_oldest, queue, event)
+            except RuntimeError:
+                # Event loop fermé: l'abonné sera nettoyé à sa déconnexion
+                continue
+
+    async def relay(self, exchange: EventExchange, interval: float = RELAY_INTERVAL_SECONDS) -> None:
+        """Boucle d'échange avec les autres workers (tâche de fond de l'event loop).
+
+        L'I/O (`exchange`) tourne dans un thread; rien n'est lu tant qu'aucun
+        client SSE n'est connecté à ce worker.
+        """
+        with self._lock:
+            self._outbox = deque(maxlen=RELAY_OUTBOX_SIZE)
+        position: Optional[int] = None
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                with self._lock:
+                    outgoing = list(self._outbox)
+                    self._outbox.clear()
+                listening = self.subscriber_count > 0
+                if not outgoing and not listening:
+                    position = None
+                    continue
+                try:
+                    current, received = await asyncio.to_thread(exchange, outgoing, position if listening else None)
+                except Exception as e:
+                    print(f"[WARN] Relais des événements Radar indisponible: {e}")
+                    continue
+                # Premier échange après une période sans abonné: pas d'historique
+                position = current if listening else None
+                for event in received:
+                    self.publish(event, forward=False)
+        finally:
+            with self._lock:
+                self._outbox = None
+
+
+def _put_dropping_oldest(queue: asyncio.Queue, event: Dict[str, Any]) -> None:
+    # Client lent: on sacrifie les événements les plus anciens plutôt que de bloquer le pipeline
+    if queue.full():
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+    queue.put_nowait(event)
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Sérialise un événement au format text/event-stream."""
+    payload = json.dumps(event.get("data", {}), ensure_ascii=False, default=str)
+    lines = []
+    if "id" in event:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event.get('type', 'message')}")
+    lines.append(f"data: {payload}")
+    return "\n".join(lines) + "\n\n"
+
+
+# Instance partagée par l'API
+RADAR_EVENTS = RadarEventBus()
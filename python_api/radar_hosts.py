@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Ordonnanceur HTTP "poli" par hôte pour le scraping du Radar Sénégal.
+
+Pour chaque hôte on conserve:
+- un historique de latences → timeout adaptatif (p95 × facteur, borné)
+- un disjoncteur (circuit breaker): après N échecs consécutifs l'hôte est
+  ignoré pendant un délai qui double à chaque réouverture
+- un intervalle minimal entre deux requêtes vers le même hôte
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
+
+MIN_TIMEOUT_SECONDS = float(os.getenv("RADAR_MIN_TIMEOUT", "2"))
+MAX_TIMEOUT_SECONDS = float(os.getenv("RADAR_MAX_TIMEOUT", "8"))
+TIMEOUT_P95_FACTOR = 3.0
+HOST_MIN_INTERVAL_SECONDS = float(os.getenv("RADAR_HOST_MIN_INTERVAL", "0.3"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("RADAR_CIRCUIT_FAILURES", "3"))
+CIRCUIT_BASE_BACKOFF_SECONDS = float(os.getenv("RADAR_CIRCUIT_BACKOFF", "60"))
+CIRCUIT_MAX_BACKOFF_SECONDS = 1800.0
+LATENCY_WINDOW = 50
+
+
+class HostCircuitOpen(Exception):
+    """Levée quand un hôte est temporairement ignoré (disjoncteur ouvert)."""
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+class HostState:
+    """État de santé d'un hôte (protégé par son propre verrou)."""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.lock = threading.Lock()
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.circuit_opens = 0
+        self.open_until = 0.0
+        self.last_request_at = 0.0
+        self.last_error = ""
+
+    def timeout(self) -> float:
+        """Timeout adaptatif: p95 observé × facteur, borné [min, max]."""
+        if len(self.latencies) < 3:
+            return MAX_TIMEOUT_SECONDS
+        p95 = _percentile(sorted(self.latencies), 0.95)
+        return max(MIN_TIMEOUT_SECONDS, min(MAX_TIMEOUT_SECONDS, p95 * TIMEOUT_P95_FACTOR))
+
+    def is_open(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) < self.open_until
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.consecutive_failures = 0
+        # Sonde réussie après réouverture: le disjoncteur se referme complètement
+        self.circuit_opens = 0
+        self.open_until = 0.0
+
+    def record_failure(self, error: str) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = error[:200]
+        if self.consecutive_failures >= CIRCUIT_FAILURE_THRESHOLD:
+            self.circuit_opens += 1
+            backoff = min(
+                CIRCUIT_MAX_BACKOFF_SECONDS,
+                CIRCUIT_BASE_BACKOFF_SECONDS * (2 ** (self.circuit_opens - 1)),
+            )
+            self.open_until = time.time() + backoff
+            # Après expiration, une seule requête "sonde" décide de la fermeture
+            self.consecutive_failures = CIRCUIT_FAILURE_THRESHOLD - 1
+            logger.warning("Hôte %s ignoré pendant %.0fs (%s)", self.host, backoff, self.last_error)
+
+    def snapshot(self) -> Dict[str, Any]:
+        values = sorted(self.latencies)
+        now = time.time()
+        return {
+            "state": "open" if self.is_open(now) else "closed",
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "p50_ms": round(_percentile(values, 0.50) * 1000, 1),
+            "p95_ms": round(_percentile(values, 0.95) * 1000, 1),
+            "timeout_s": round(self.timeout(), 2),
+            "retry_in_s": round(max(0.0, self.open_until - now), 1),
+            "last_error": self.last_error,
+        }
+
+
+class HostScheduler:
+    """Point d'entrée unique des requêtes HTTP sortantes du Radar."""
+
+    def __init__(
+        self,
+        session: Optional[Any] = None,
+        min_interval: float = HOST_MIN_INTERVAL_SECONDS,
+    ):
+        self._session = session or requests.Session()
+        self.min_interval = min_interval
+        self._hosts: Dict[str, HostState] = {}
+        self._lock = threading.Lock()
+
+    def set_session(self, session: Any) -> None:
+        """Remplace la session HTTP (ex: enregistrement / rejeu hors-ligne)."""
+        self._session = session
+
+    def reset(self) -> None:
+        """Oublie l'état de tous les hôtes."""
+        with self._lock:
+            self._hosts.clear()
+
+    def state(self, url: str) -> HostState:
+        host = host_of(url)
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostState(host)
+            return self._hosts[host]
+
+    def is_open(self, url: str) -> bool:
+        return self.state(url).is_open()
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        """GET poli: respecte le disjoncteur, l'intervalle par hôte et le timeout adaptatif.
+
+        Les erreurs réseau et les réponses 5xx comptent comme échecs; une 404
+        prouve que l'hôte répond et alimente donc les latences.
+        """
+        state = self.state(url)
+        with state.lock:
+            if state.is_open():
+                raise HostCircuitOpen(f"{state.host} ignoré (disjoncteur ouvert)")
+            wait = state.last_request_at + self.min_interval - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            state.last_request_at = time.time()
+            state.requests += 1
+            timeout = kwargs.pop("timeout", None) or state.timeout()
+
+        headers = {**DEFAULT_HEADERS, **kwargs.pop("headers", {})}
+        started = time.perf_counter()
+        try:
+            response = self._session.get(url, headers=headers, timeout=timeout, **kwargs)
+        except requests.RequestException as e:
+            with state.lock:
+                state.record_failure(f"{type(e).__name__}: {e}")
+            raise
+
+        with state.lock:
+            if response.status_code >= 500:
+                state.record_failure(f"HTTP {response.status_code}")
+            else:
+                state.record_success(time.perf_counter() - started)
+        return response
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            states = list(self._hosts.values())
+        return {s.host: s.snapshot() for s in states}
+
+
+# Instance partagée par le pipeline Radar
+HOSTS = HostScheduler()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Extraction HTML en flux (mémoire bornée) pour le scraper du Radar Sénégal.
+
+Au lieu de télécharger une page d'accueil entière puis de construire un arbre
+BeautifulSoup complet, on lit la réponse par blocs (plafonnés à
+RADAR_MAX_HTML_BYTES) et on l'analyse de manière incrémentale:
+- `iter_headlines` produit les textes h1/h2/h3/a au fil de l'eau; le
+  consommateur arrête la lecture dès qu'il a assez d'articles
+- `find_feed_link` s'arrête au début du <body>
+
+Backend: lxml (HTMLPullParser) s'il est installé, sinon html.parser (stdlib).
+"""
+
+from __future__ import annotations
+
+import codecs
+import os
+import re
+from html.parser import HTMLParser
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from lxml import etree as _lxml_etree
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    _lxml_etree = None
+
+MAX_HTML_BYTES = int(os.getenv("RADAR_MAX_HTML_BYTES", str(512 * 1024)))
+CHUNK_SIZE = 16 * 1024
+HEADLINE_TAGS = frozenset({"h1", "h2", "h3", "a"})
+FEED_TYPE = "application/rss+xml"
+
+PARSER_BACKEND = "lxml" if _lxml_etree is not None else "html.parser"
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+Headline = Tuple[str, Optional[str]]
+
+
+def iter_response_chunks(response: Any, max_bytes: int = MAX_HTML_BYTES) -> Iterator[bytes]:
+    """Blocs bruts d'une réponse requests (stream=True), plafonnés à `max_bytes`."""
+    read = 0
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        if not chunk:
+            continue
+        if read + len(chunk) > max_bytes:
+            chunk = chunk[: max_bytes - read]
+        read += len(chunk)
+        yield chunk
+        if read >= max_bytes:
+            break
+
+
+def response_encoding(response: Any, first_chunk: bytes) -> str:
+    """Charset explicite de l'en-tête, sinon <meta charset>, sinon UTF-8.
+
+    (requests suppose ISO-8859-1 pour text/* sans charset, ce qui abîme les
+    accents des sites servis en UTF-8.)
+    """
+    content_type = response.headers.get("content-type", "") if response is not None else ""
+    if "charset=" in content_type.lower():
+        return content_type.lower().split("charset=")[-1].split(";")[0].strip() or "utf-8"
+    match = _META_CHARSET.search(first_chunk[:4096])
+    if match:
+        return match.group(1).decode("ascii", "ignore") or "utf-8"
+    return "utf-8"
+
+
+def _clean_text(parts: Iterable[str]) -> str:
+    # Équivalent de BeautifulSoup.get_text(strip=True)
+    return "".join(s.strip() for s in parts if s and s.strip())
+
+
+# ============================================================
+# Backend lxml
+# ============================================================
+
+def _lxml_parser(response: Any, first_chunk: bytes, events: Tuple[str, ...]) -> Any:
+    encoding = response_encoding(response, first_chunk)
+    try:
+        return _lxml_etree.HTMLPullParser(events=events, encoding=encoding)
+    except LookupError:
+        return _lxml_etree.HTMLPullParser(events=events, encoding="utf-8")
+
+
+def _lxml_headlines(chunks: Iterable[bytes], max_tags: int, response: Any) -> Iterator[Headline]:
+    parser = None
+    emitted = 0
+    open_tracked = 0
+
+    for chunk in chunks:
+        if parser is None:
+            parser = _lxml_parser(response, chunk, ("start", "end"))
+        parser.feed(chunk)
+        for event, el in parser.read_events():
+            tag = el.tag if isinstance(el.tag, str) else ""
+            if event == "start":
+                if tag in HEADLINE_TAGS:
+                    open_tracked += 1
+                continue
+
+            if tag in HEADLINE_TAGS:
+                open_tracked -= 1
+                yield _clean_text(el.itertext()), el.get("href")
+                emitted += 1
+                if emitted >= max_tags:
+                    return
+
+            # Hors d'un titre suivi: on libère le sous-arbre déjà traité
+            if open_tracked == 0:
+                el.clear()
+                parent = el.getparent()
+                if parent is not None:
+                    while el.getprevious() is not None:
+                        del parent[0]
+
+
+def _lxml_feed_link(chunks: Iterable[bytes], response: Any) -> Optional[str]:
+    parser = None
+    for chunk in chunks:
+        if parser is None:
+            parser = _lxml_parser(response, chunk, ("start",))
+        parser.feed(chunk)
+        for _, el in parser.read_events():
+            if el.tag == "link" and (el.get("type") or "").lower() == FEED_TYPE and el.get("href"):
+                return el.get("href")
+            if el.tag == "body":
+                return None
+    return None
+
+
+# ============================================================
+# Backend html.parser (stdlib)
+# ============================================================
+
+class _StreamingCollector(HTMLParser):
+    """Collecte les événements utiles pendant `feed()`; le générateur les vide."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.stack: List[Tuple[str, Optional[str], List[str]]] = []
+        self.headlines: List[Headline] = []
+        self.feed_link: Optional[str] = None
+        self.body_started = False
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in HEADLINE_TAGS:
+            self.stack.append((tag, dict(attrs).get("href"), []))
+        elif tag == "link" and self.feed_link is None:
+            values = dict(attrs)
+            if (values.get("type") or "").lower() == FEED_TYPE and values.get("href"):
+                self.feed_link = values["href"]
+        elif tag == "body":
+            self.body_started = True
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag not in HEADLINE_TAGS:
+            return
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                _, href, parts = self.stack.pop(i)
+                # Le texte d'un titre imbriqué compte aussi pour ses ancêtres
+                for _, _, outer in self.stack:
+                    outer.extend(parts)
+                self.headlines.append((_clean_text(parts), href))
+                return
+
+    def handle_data(self, data: str) -> None:
+        if self.stack:
+            self.stack[-1][2].append(data)
+
+
+def _decoded(chunks: Iterable[bytes], response: Any) -> Iterator[str]:
+    decoder = None
+    for chunk in chunks:
+        if decoder is None:
+            encoding = response_encoding(response, chunk)
+            try:
+                decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            except LookupError:
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        yield decoder.decode(chunk)
+
+
+def _stdlib_headlines(chunks: Iterable[bytes], max_tags: int, response: Any) -> Iterator[Headline]:
+    collector = _StreamingCollector()
+    emitted = 0
+    for text in _decoded(chunks, response):
+        collector.feed(text)
+        ready, collector.headlines = collector.headlines, []
+        for headline in ready:
+            yield headline
+            emitted += 1
+            if emitted >= max_tags:
+                return
+
+
+def _stdlib_feed_link(chunks: Iterable[bytes], response: Any) -> Optional[str]:
+    collector = _StreamingCollector()
+    for text in _decoded(chunks, response):
+        collector.feed(text)
+        if collector.feed_link or collector.body_started:
+            break
+    return collector.feed_link
+
+
+# ============================================================
+# API
+# ============================================================
+
+def iter_headlines(response: Any, max_tags: int = 40, max_bytes: int = MAX_HTML_BYTES) -> Iterator[Headline]:
+    """(texte, href) des `max_tags` premiers h1/h2/h3/a, lus en flux.
+
+    Un élément est produit à sa balise fermante (un <a> dans un <h2> sort
+    donc avant le <h2>). Interrompre l'itération arrête la lecture réseau.
+    """
+    chunks = iter_response_chunks(response, max_bytes)
+    if _lxml_etree is not None:
+        return _lxml_headlines(chunks, max_tags, response)
+    return _stdlib_headlines(chunks, max_tags, response)
+
+
+def find_feed_link(response: Any, max_bytes: int = MAX_HTML_BYTES) -> Optional[str]:
+    """href du <link type="application/rss+xml"> du <head>, sans lire le <body>."""
+    chunks = iter_response_chunks(response, max_bytes)
+    if _lxml_etree is not None:
+        return _lxml_feed_link(chunks, response)
+    return _stdlib_feed_link(chunks, response)
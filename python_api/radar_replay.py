@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Enregistrement / rejeu hors-ligne du pipeline Radar Sénégal.
+
+- record : les réponses HTTP (et erreurs réseau) et les réponses du LLM sont
+  enregistrées dans un répertoire de fixtures tout en servant le trafic réel
+- replay : aucune requête réseau; les réponses sont relues depuis les fixtures
+  (un hôte absent des fixtures se comporte comme un hôte injoignable)
+- LLM local (RADAR_LLM=local): remplaçant déterministe de Groq, sans clé API
+
+Configuration par variables d'environnement:
+    RADAR_REPLAY_MODE=off|record|replay   (défaut: off)
+    RADAR_FIXTURES_DIR=...                 (défaut: python_api/fixtures/radar)
+    RADAR_LLM=groq|local                   (défaut: groq)
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import requests
+from langchain_core.messages import AIMessage
+
+import senegal_radar
+from radar_html import MAX_HTML_BYTES, iter_response_chunks
+from radar_hosts import HOST_MIN_INTERVAL_SECONDS, HOSTS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIXTURES_DIR = Path(__file__).parent / "fixtures" / "radar"
+
+# Mots-clés → type d'alerte pour le LLM local (premier trouvé gagne)
+_LOCAL_TYPES = [
+    ("manifestation", "MANIFESTATION"),
+    ("marche", "MANIFESTATION"),
+    ("grève", "GREVE"),
+    ("blocage", "BLOCAGE"),
+    ("accident", "ACCIDENT"),
+    ("mort", "VIOLENCE"),
+    ("agression", "VIOLENCE"),
+    ("violence", "VIOLENCE"),
+    ("braquage", "VIOLENCE"),
+]
+_LOCAL_HIGH_SEVERITY = ("mort", "décès", "blessé", "arme")
+_NEWS_LINE = re.compile(r"^\d+\.\s+(.+)$", re.MULTILINE)
+
+
+def _key(value: str) -> str:
+    return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+
+def _prompt_key(messages: List[Any]) -> str:
+    return _key("\n\x1e\n".join(str(getattr(m, "content", m)) for m in messages))
+
+
+# ============================================================
+# HTTP
+# ============================================================
+
+class FixtureStore:
+    """Fixtures sur disque: http/<sha1(url)>.json et llm/<sha1(prompt)>.json."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+
+    def _path(self, kind: str, key: str) -> Path:
+        return self.directory / kind / f"{key}.json"
+
+    def load(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(kind, key)
+        if not path.exists():
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def save(self, kind: str, key: str, record: Dict[str, Any]) -> None:
+        path = self._path(kind, key)
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(record, ensure_ascii=False, indent=1), encoding="utf-8")
+
+    def save_response(self, url: str, status: int, body: bytes,
+                      content_type: str = "", encoding: Optional[str] = None) -> None:
+        self.save("http", _key(url), {
+            "url": url,
+            "status": status,
+            "content_type": content_type,
+            "encoding": encoding,
+            "body_b64": base64.b64encode(body).decode("ascii"),
+        })
+
+    def save_error(self, url: str, error: str) -> None:
+        self.save("http", _key(url), {"url": url, "error": error})
+
+
+class RecordingSession:
+    """Session HTTP réelle qui enregistre chaque réponse dans les fixtures.
+
+    Réponse en flux (stream=True): seuls les MAX_HTML_BYTES premiers octets,
+    ceux que l'analyse en flux peut lire, sont téléchargés et enregistrés.
+    """
+
+    def __init__(self, store: FixtureStore, session: Optional[requests.Session] = None):
+        self.store = store
+        self._session = session or requests.Session()
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        try:
+            r = self._session.get(url, **kwargs)
+        except requests.RequestException as e:
+            self.store.save_error(url, f"{type(e).__name__}: {e}")
+            raise
+        if not kwargs.get("stream"):
+            self.store.save_response(url, r.status_code, r.content,
+                                     r.headers.get("content-type", ""), r.encoding)
+            return r
+
+        try:
+            body = b"".join(iter_response_chunks(r, MAX_HTML_BYTES))
+        except requests.RequestException as e:
+            self.store.save_error(url, f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            r.close()
+        self.store.save_response(url, r.status_code, body, r.headers.get("content-type", ""), r.encoding)
+        # L'appelant lit les mêmes octets plafonnés que ceux enregistrés (comme au rejeu)
+        r._content = body
+        r._content_consumed = True
+        return r
+
+
+class ReplaySession:
+    """Session HTTP hors-ligne: relit les fixtures, ne touche jamais le réseau."""
+
+    def __init__(self, store: FixtureStore):
+        self.store = store
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        record = self.store.load("http", _key(url))
+        if record is None:
+            raise requests.ConnectionError(f"Aucune fixture pour {url}")
+        if "error" in record:
+            raise requests.ConnectionError(record["error"])
+
+        response = requests.Response()
+        response.url = url
+        response.status_code = int(record["status"])
+        response._content = base64.b64decode(record["body_b64"])
+        response._content_consumed = True
+        if record.get("content_type"):
+            response.headers["content-type"] = record["content_type"]
+        response.encoding = record.get("encoding") or "utf-8"
+        return response
+
+
+# ============================================================
+# LLM
+# ============================================================
+
+class LocalStandInLLM:
+    """Remplaçant déterministe de Groq: une alerte par titre localisable.
+
+    Relit la liste numérotée du prompt, cherche un lieu de LOCATIONS_DB dans
+    chaque titre et déduit type/sévérité par mots-clés. `latency_ms` simule le
+    temps de réponse d'un vrai LLM pour les benchmarks.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, max_alerts: int = 12):
+        self.latency_ms = latency_ms
+        self.max_alerts = max_alerts
+        self._places = sorted(senegal_radar.LOCATIONS_DB, key=len, reverse=True)
+
+    def invoke(self, messages: List[Any]) -> AIMessage:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+        prompt = str(getattr(messages[-1], "content", messages[-1]))
+        alerts = []
+        for title in _NEWS_LINE.findall(prompt):
+            lower = title.lower()
+            place = next((p for p in self._places if p.lower() in lower), None)
+            if place is None:
+                continue
+            alert_type = next((t for kw, t in _LOCAL_TYPES if kw in lower), "TENSION")
+            severity = "ÉLEVÉ" if any(kw in lower for kw in _LOCAL_HIGH_SEVERITY) else "MOYEN"
+            alerts.append({
+                "place": place,
+                "type": alert_type,
+                "info": " ".join(title.split()[:8]),
+                "severity": severity,
+            })
+            if len(alerts) >= self.max_alerts:
+                break
+
+        return AIMessage(content=json.dumps({"alerts": alerts}, ensure_ascii=False))
+
+
+class RecordingLLM:
+    """Enveloppe un LLM réel et enregistre chaque réponse (clé = hash du prompt)."""
+
+    def __init__(self, llm: Any, store: FixtureStore):
+        self._llm = llm
+        self.store = store
+
+    def invoke(self, messages: List[Any]) -> Any:
+        response = self._llm.invoke(messages)
+        self.store.save("llm", _prompt_key(messages), {"content": response.content})
+        return response
+
+
+class ReplayLLM:
+    """Relit les réponses LLM enregistrées; repli sur le LLM local si absente."""
+
+    def __init__(self, store: FixtureStore, fallback: Optional[Any] = None):
+        self.store = store
+        self.fallback = fallback or LocalStandInLLM()
+
+    def invoke(self, messages: List[Any]) -> AIMessage:
+        record = self.store.load("llm", _prompt_key(messages))
+        if record is None:
+            logger.warning("Aucune réponse LLM enregistrée pour ce prompt: LLM local utilisé")
+            return self.fallback.invoke(messages)
+        return AIMessage(content=record["content"])
+
+
+# ============================================================
+# CONFIGURATION
+# ============================================================
+
+def configure(mode: str = "off", fixtures_dir: Optional[Path] = None,
+              llm: str = "groq", local_latency_ms: float = 0.0) -> None:
+    """Active l'enregistrement ou le rejeu pour tout le pipeline Radar."""
+    mode = (mode or "off").lower()
+    store = FixtureStore(Path(fixtures_dir) if fixtures_dir else DEFAULT_FIXTURES_DIR)
+    HOSTS.reset()
+    HOSTS.min_interval = HOST_MIN_INTERVAL_SECONDS
+
+    if mode == "record":
+        HOSTS.set_session(RecordingSession(store))
+    elif mode == "replay":
+        HOSTS.set_session(ReplaySession(store))
+        # Aucun intérêt à espacer des lectures de fichiers
+        HOSTS.min_interval = 0.0
+    elif mode != "off":
+        raise ValueError(f"RADAR_REPLAY_MODE inconnu: {mode}")
+    else:
+        HOSTS.set_session(requests.Session())
+
+    if llm == "local":
+        local = LocalStandInLLM(latency_ms=local_latency_ms)
+        senegal_radar.set_llm_factory(lambda: local)
+    elif mode == "replay":
+        senegal_radar.set_llm_factory(lambda: ReplayLLM(store))
+    elif mode == "record":
+        groq_factory = lambda: RecordingLLM(senegal_radar._build_groq_llm(), store)  # noqa: E731
+        senegal_radar.set_llm_factory(groq_factory)
+    else:
+        senegal_radar.set_llm_factory(None)
+
+    if mode != "off" or llm != "groq":
+        logger.info("Radar: mode=%s, llm=%s, fixtures=%s", mode, llm, store.directory)
+
+
+def configure_from_env() -> None:
+    configure(
+        mode=os.getenv("RADAR_REPLAY_MODE", "off"),
+        fixtures_dir=os.getenv("RADAR_FIXTURES_DIR") or None,
+        llm=os.getenv("RADAR_LLM", "groq").lower(),
+        local_latency_ms=float(os.getenv("RADAR_LOCAL_LLM_LATENCY_MS", "0")),
+    )
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Cache Radar partagé entre les workers uvicorn (base SQLite locale en mode WAL).
+
+Un seul instantané est conservé: résultat du pipeline (alertes), articles
+scrapés et carte Folium déjà rendue, avec un numéro de version croissant.
+Tous les workers lisent le même instantané; une lecture ne relit et ne
+décode la ligne que si la version a changé (copie locale sinon).
+
+Un seul worker rafraîchit à la fois grâce à un bail (table refresh_lease)
+pris dans une transaction `BEGIN IMMEDIATE`: portable (Windows compris) et
+libéré de lui-même à expiration si le worker propriétaire meurt en cours de
+run (RADAR_REFRESH_LEASE_SECONDS). Les autres workers attendent le nouvel
+instantané au lieu de relancer scraping et LLM: le coût sortant ne dépend
+pas du nombre de workers. Ils l'attendent avec un intervalle croissant
+(jusqu'à WAIT_POLL_MAX_SECONDS), et seulement quand aucun instantané,
+même périmé, ne peut être servi.
+
+Les événements de progression du run (table events, courte) sont relayés
+aux autres workers: leurs clients SSE suivent le run quel que soit le
+worker qui l'exécute (`exchange_events`).
+
+RADAR_SHARED_CACHE=0 garde le cache dans le processus (base SQLite en
+mémoire), comme avant.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+RADAR_SHARED_CACHE = os.getenv("RADAR_SHARED_CACHE", "1").lower() not in ("0", "false", "no")
+RADAR_CACHE_PATH = Path(os.getenv(
+    "RADAR_CACHE_PATH", str(Path(__file__).resolve().parent / "radar_cache" / "radar.sqlite3")))
+RADAR_REFRESH_LEASE_SECONDS = float(os.getenv("RADAR_REFRESH_LEASE_SECONDS", "600"))
+WAIT_POLL_SECONDS = 0.25
+WAIT_POLL_MAX_SECONDS = 5.0
+# Événements relayés conservés (les workers les lisent en continu, quelques secondes suffisent)
+EVENTS_KEPT = 1000
+
+
+class RadarSnapshot:
+    __slots__ = ("version", "timestamp", "result", "articles", "map_html")
+
+    def __init__(self, version: int, timestamp: float, result: Dict[str, Any],
+                 articles: List[Dict[str, Any]], map_html: Optional[str]):
+        self.version = version
+        self.timestamp = timestamp
+        self.result = result
+        self.articles = articles
+        self.map_html = map_html
+
+
+class SharedRadarCache:
+    """Instantané Radar + bail de rafraîchissement partagés via SQLite."""
+
+    def __init__(self, path: Optional[Path] = RADAR_CACHE_PATH, lease_seconds: float = RADAR_REFRESH_LEASE_SECONDS):
+        if path is None:
+            # Base en mémoire partagée entre les threads du processus uniquement
+            self._target, self._uri = f"file:radar-{uuid.uuid4().hex}?mode=memory&cache=shared", True
+        else:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._target, self._uri = str(path), False
+        self.shared = path is not None
+        self.lease_seconds = lease_seconds
+        self.process_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._mirror: Optional[RadarSnapshot] = None
+        self._mirror_lock = threading.Lock()
+        self._memory_lock = threading.RLock()
+        # Garde la base mémoire en vie tant que l'objet existe
+        self._keepalive = self._connect()
+        with self._keepalive:
+            self._keepalive.execute(
+                """CREATE TABLE IF NOT EXISTS snapshot (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    version INTEGER NOT NULL,
+                    ts REAL NOT NULL,
+                    result TEXT NOT NULL,
+                    articles TEXT NOT NULL,
+                    map_html TEXT
+                )"""
+            )
+            self._keepalive.execute(
+                """CREATE TABLE IF NOT EXISTS refresh_lease (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    owner TEXT NOT NULL,
+                    expires REAL NOT NULL
+                )"""
+            )
+            self._keepalive.execute(
+                """CREATE TABLE IF NOT EXISTS events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    origin TEXT NOT NULL,
+                    payload TEXT NOT NULL
+                )"""
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._target, uri=self._uri, timeout=10.0, isolation_level=None,
+                               check_same_thread=False)
+        if self.shared:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _owner(self) -> str:
+        # Bail détenu par un thread: deux threads d'un même worker s'excluent aussi
+        return f"{self.process_id}-{threading.get_ident()}"
+
+    @contextmanager
+    def _db(self) -> Iterator[sqlite3.Connection]:
+        if not self.shared:
+            # Base mémoire: une seule connexion, sérialisée (pas de busy timeout en cache partagé)
+            with self._memory_lock:
+                yield self._keepalive
+            return
+        # Une connexion par thread (pipeline dans asyncio.to_thread, threadpool Starlette)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        yield conn
+
+    # ------------------------------------------------------------------
+    # Instantané
+    # ------------------------------------------------------------------
+
+    def version(self) -> int:
+        with self._db() as conn:
+            return self._version(conn)
+
+    @staticmethod
+    def _version(conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT version FROM snapshot WHERE id = 1").fetchone()
+        return int(row[0]) if row else 0
+
+    def read(self) -> Optional[RadarSnapshot]:
+        """Dernier instantané (décodé seulement si un autre worker l'a remplacé)."""
+        version = self.version()
+        if version == 0:
+            return None
+        with self._mirror_lock:
+            if self._mirror is not None and self._mirror.version == version:
+                return self._mirror
+        with self._db() as conn:
+            row = conn.execute("SELECT version, ts, result, articles, map_html FROM snapshot WHERE id = 1").fetchone()
+        if row is None:
+            return None
+        snapshot = RadarSnapshot(int(row[0]), float(row[1]), json.loads(row[2]), json.loads(row[3]), row[4])
+        with self._mirror_lock:
+            if self._mirror is None or self._mirror.version < snapshot.version:
+                self._mirror = snapshot
+        return snapshot
+
+    def write(self, timestamp: float, result: Dict[str, Any], articles: List[Dict[str, Any]],
+              map_html: Optional[str]) -> RadarSnapshot:
+        payload = (json.dumps(result, ensure_ascii=False, default=str),
+                   json.dumps(articles, ensure_ascii=False, default=str))
+        with self._db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._version(conn) + 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO snapshot (id, version, ts, result, articles, map_html)"
+                    " VALUES (1, ?, ?, ?, ?, ?)",
+                    (version, timestamp, payload[0], payload[1], map_html),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        snapshot = RadarSnapshot(version, timestamp, result, articles, map_html)
+        with self._mirror_lock:
+            self._mirror = snapshot
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # Bail de rafraîchissement
+    # ------------------------------------------------------------------
+
+    def try_acquire(self) -> bool:
+        """Prend le bail si personne d'autre ne le détient (ou s'il a expiré)."""
+        now = time.time()
+        with self._db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT owner, expires FROM refresh_lease WHERE id = 1").fetchone()
+                if row is not None and row[0] != self._owner() and row[1] > now:
+                    conn.execute("COMMIT")
+                    return False
+                conn.execute("INSERT OR REPLACE INTO refresh_lease (id, owner, expires) VALUES (1, ?, ?)",
+                             (self._owner(), now + self.lease_seconds))
+                conn.execute("COMMIT")
+                return True
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def release(self) -> None:
+        with self._db() as conn:
+            conn.execute("DELETE FROM refresh_lease WHERE id = 1 AND owner = ?", (self._owner(),))
+
+    def lease_holder(self) -> Optional[Dict[str, Any]]:
+        with self._db() as conn:
+            row = conn.execute("SELECT owner, expires FROM refresh_lease WHERE id = 1").fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return {"owner": row[0], "expires_in": round(row[1] - time.time(), 1),
+                "this_worker": row[0].startswith(self.process_id + "-")}
+
+    def wait_for_update(self, version: int) -> Optional[RadarSnapshot]:
+        """Attend un instantané plus récent que `version` tant qu'un autre worker détient le bail.
+
+        Retourne None si le bail est libéré ou expiré sans nouvel instantané
+        (run en échec ou worker arrêté): l'appelant peut alors le reprendre.
+        Intervalle doublé à chaque vérification: un run de plusieurs minutes
+        ne coûte que quelques requêtes SQLite.
+        """
+        delay = WAIT_POLL_SECONDS
+        while True:
+            snapshot = self.read()
+            if snapshot is not None and snapshot.version != version:
+                return snapshot
+            if self.lease_holder() is None:
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, WAIT_POLL_MAX_SECONDS)
+
+    # ------------------------------------------------------------------
+    # Relais des événements entre workers
+    # ------------------------------------------------------------------
+
+    def exchange_events(self, outgoing: List[Dict[str, Any]],
+                        after: Optional[int]) -> Tuple[int, List[Dict[str, Any]]]:
+        """Publie les événements de ce worker et lit ceux des autres publiés après `after`.
+
+        `after=None`: aucun historique, seulement la position courante.
+        Retourne (nouvelle position, événements des autres workers).
+        """
+        with self._db() as conn:
+            if outgoing:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany(
+                        "INSERT INTO events (origin, payload) VALUES (?, ?)",
+                        [(self.process_id, json.dumps(e, ensure_ascii=False, default=str)) for e in outgoing],
+                    )
+                    conn.execute("DELETE FROM events WHERE seq <= (SELECT MAX(seq) FROM events) - ?", (EVENTS_KEPT,))
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            if after is None:
+                row = conn.execute("SELECT MAX(seq) FROM events").fetchone()
+                return int(row[0] or 0), []
+            rows = conn.execute(
+                "SELECT seq, origin, payload FROM events WHERE seq > ? ORDER BY seq", (after,)
+            ).fetchall()
+        position = rows[-1][0] if rows else after
+        return position, [json.loads(payload) for _, origin, payload in rows if origin != self.process_id]
+
+
+def create_cache() -> SharedRadarCache:
+    if not RADAR_SHARED_CACHE:
+        return SharedRadarCache(None)
+    try:
+        return SharedRadarCache(RADAR_CACHE_PATH)
+    except (OSError, sqlite3.Error) as e:
+        print(f"[WARN] Cache Radar partagé indisponible ({e}); cache local au processus")
+        return SharedRadarCache(None)
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Jobs de scoring asynchrones (gros fichiers) avec résultats sur disque.
+
+Un job est soumis (le fichier est copié sur disque), placé dans une file
+bornée puis traité par un pool de threads de taille fixe, paquet par paquet.
+Les résultats sont écrits au fil de l'eau dans deux fichiers binaires
+colonnaires par job:
+- probability.f8 : probabilité (float64, NaN si ligne invalide)
+- error.i4       : code d'erreur (int32, -1 si valide) → `messages` du job
+et relus par pages via np.memmap: seule la page demandée est chargée en mémoire.
+Avec `id_column`, la colonne d'identifiant est conservée à côté:
+- ids.arrows (arrow/parquet) : flux Arrow IPC, un lot par paquet, type d'origine
+- ids.json + ids_end.i8 (csv/ndjson) : valeurs JSON concaténées et fin (int64)
+  de chaque valeur
+
+Le module ne connaît pas le modèle: main.py fournit les fonctions de scoring
+(`score_rows(rows)` et `score_table(table, strict)`), qui retournent
+(probabilités, codes d'erreur, messages) pour un paquet.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bulk_io import BulkReader
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    pa = pq = None
+
+JOBS_DIR = Path(os.getenv("SCORING_JOBS_DIR", str(Path(__file__).resolve().parent / "jobs")))
+JOBS_MAX_WORKERS = int(os.getenv("SCORING_JOBS_MAX_WORKERS", "1"))
+JOBS_MAX_PENDING = int(os.getenv("SCORING_JOBS_MAX_PENDING", "16"))
+JOBS_CHUNK_ROWS = int(os.getenv("SCORING_JOBS_CHUNK_ROWS", "5000"))
+# Durée de conservation d'un job terminé (fichiers compris)
+JOBS_TTL_SECONDS = float(os.getenv("SCORING_JOBS_TTL_SECONDS", str(24 * 3600)))
+
+INPUT_FORMATS = ("csv", "ndjson", "arrow", "parquet")
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+ChunkScores = Tuple[np.ndarray, np.ndarray, List[str]]
+RowScorer = Callable[[List[Dict[str, Any]]], ChunkScores]
+TableScorer = Callable[[Any, bool], ChunkScores]
+
+_PROBABILITY_FILE = "probability.f8"
+_ERROR_FILE = "error.i4"
+_IDS_ARROW_FILE = "ids.arrows"
+_IDS_JSON_FILE = "ids.json"
+_IDS_END_FILE = "ids_end.i8"
+
+
+class JobQueueFull(Exception):
+    """Trop de jobs en attente: le client doit réessayer plus tard."""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class ScoringJob:
+    """État d'un job (modifié par un seul worker, lu par l'API)."""
+
+    def __init__(self, job_id: str, fmt: str, directory: Path, strict: bool = False,
+                 id_column: Optional[str] = None):
+        self.id = job_id
+        self.fmt = fmt
+        self.directory = directory
+        self.strict = strict
+        self.id_column = id_column
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.rows_done = 0
+        self.invalid_rows = 0
+        self.progress = 0.0
+        self.messages: List[str] = []
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_requested = threading.Event()
+        self._message_codes: Dict[str, int] = {}
+
+    @property
+    def input_path(self) -> Path:
+        return self.directory / f"input.{self.fmt}"
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def snapshot(self) -> Dict[str, Any]:
+        finished = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "input_format": self.fmt,
+            "id_column": self.id_column,
+            "progress": round(self.progress, 4),
+            "rows_done": self.rows_done,
+            "invalid_rows": self.invalid_rows,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_s": round(finished - self.started_at, 3) if self.started_at else None,
+        }
+
+    def _global_codes(self, error_codes: np.ndarray, messages: List[str]) -> np.ndarray:
+        """Renumérote les codes d'un paquet dans le dictionnaire de messages du job."""
+        if not messages:
+            return error_codes
+        mapping = np.empty(len(messages), dtype=np.int32)
+        for i, message in enumerate(messages):
+            if message not in self._message_codes:
+                self._message_codes[message] = len(self.messages)
+                self.messages.append(message)
+            mapping[i] = self._message_codes[message]
+        return np.where(error_codes < 0, -1, mapping[np.maximum(error_codes, 0)]).astype(np.int32)
+
+
+class _IdsWriter:
+    """Écrit la colonne d'identifiant d'un job, paquet par paquet (thread du worker)."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._file: Optional[IO[bytes]] = None
+        self._ends: Optional[IO[bytes]] = None
+        self._writer: Any = None
+        self._end = 0
+
+    def write(self, ids: Any) -> None:
+        if isinstance(ids, list):
+            self._write_json(ids)
+        else:
+            self._write_arrow(ids)
+
+    def _write_json(self, ids: List[Any]) -> None:
+        if self._file is None:
+            self._file = open(self.directory / _IDS_JSON_FILE, "wb")
+            self._ends = open(self.directory / _IDS_END_FILE, "wb")
+        encoded = [json.dumps(value, ensure_ascii=False).encode("utf-8") for value in ids]
+        ends = self._end + np.cumsum([len(e) for e in encoded], dtype=np.int64)
+        self._file.write(b"".join(encoded))
+        ends.tofile(self._ends)
+        self._file.flush()
+        self._ends.flush()
+        if len(ends):
+            self._end = int(ends[-1])
+
+    def _write_arrow(self, ids: Any) -> None:
+        if self._writer is None:
+            self._file = open(self.directory / _IDS_ARROW_FILE, "wb")
+            self._writer = pa.ipc.new_stream(self._file, pa.schema([("id", ids.type)]))
+        self._writer.write_batch(pa.record_batch([ids], names=["id"]))
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        for f in (self._file, self._ends):
+            if f is not None:
+                f.close()
+
+
+class ScoringJobManager:
+    """File bornée de jobs + pool de workers (threads démarrés à la première soumission)."""
+
+    def __init__(
+        self,
+        score_rows: RowScorer,
+        score_table: TableScorer,
+        required_columns: Sequence[str],
+        directory: Path = JOBS_DIR,
+        max_workers: int = JOBS_MAX_WORKERS,
+        max_pending: int = JOBS_MAX_PENDING,
+        chunk_rows: int = JOBS_CHUNK_ROWS,
+        ttl_seconds: float = JOBS_TTL_SECONDS,
+    ):
+        self._score_rows = score_rows
+        self._score_table = score_table
+        self.required_columns = list(required_columns)
+        self.directory = Path(directory)
+        self.max_workers = max(1, max_workers)
+        self.chunk_rows = max(1, chunk_rows)
+        self.ttl_seconds = ttl_seconds
+        self._queue: "queue.Queue[ScoringJob]" = queue.Queue(maxsize=max(1, max_pending))
+        self._jobs: Dict[str, ScoringJob] = {}
+        self._lock = threading.Lock()
+        self._workers: List[threading.Thread] = []
+
+    # ------------------------------------------------------------------
+    # API (appelée depuis l'event loop: aucune opération longue)
+    # ------------------------------------------------------------------
+
+    def create(self, fmt: str, strict: bool = False, id_column: Optional[str] = None) -> ScoringJob:
+        """Réserve un job et son répertoire; le fichier d'entrée est écrit par l'appelant."""
+        if fmt not in INPUT_FORMATS:
+            raise ValueError(f"Format d'entrée non supporté: {fmt} (attendu: {', '.join(INPUT_FORMATS)})")
+        if fmt in ("arrow", "parquet") and pa is None:
+            raise ValueError("pyarrow non installé (pip install pyarrow)")
+        self.purge_expired()
+        job_id = uuid.uuid4().hex
+        job = ScoringJob(job_id, fmt, self.directory / job_id, strict, id_column or None)
+        job.directory.mkdir(parents=True, exist_ok=True)
+        return job
+
+    def submit(self, job: ScoringJob) -> None:
+        self._ensure_workers()
+        # Enregistré avant la mise en file: un worker rapide ne doit pas le croire supprimé
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            self.discard(job)
+            raise JobQueueFull(f"File de jobs pleine ({self._queue.maxsize} en attente)")
+
+    def discard(self, job: ScoringJob) -> None:
+        """Supprime les fichiers d'un job jamais soumis (upload échoué, file pleine)."""
+        shutil.rmtree(job.directory, ignore_errors=True)
+
+    def get(self, job_id: str) -> Optional[ScoringJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def snapshots(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.snapshot() for job in sorted(jobs, key=lambda j: j.created_at)]
+
+    def cancel(self, job_id: str) -> Optional[ScoringJob]:
+        """Demande l'annulation (effective au prochain paquet pour un job en cours)."""
+        job = self.get(job_id)
+        if job is None or job.is_terminal:
+            return job
+        job.cancel_requested.set()
+        if job.status == "queued":
+            self._finish(job, "cancelled")
+        return job
+
+    def delete(self, job_id: str) -> bool:
+        """Annule le job et supprime ses fichiers (un job en cours les supprime en s'arrêtant)."""
+        job = self.cancel(job_id)
+        if job is None:
+            return False
+        with self._lock:
+            self._jobs.pop(job_id, None)
+        if job.is_terminal:
+            shutil.rmtree(job.directory, ignore_errors=True)
+        return True
+
+    def purge_expired(self) -> None:
+        now = time.time()
+        with self._lock:
+            expired = [j for j in self._jobs.values()
+                       if j.is_terminal and j.finished_at and now - j.finished_at > self.ttl_seconds]
+            for job in expired:
+                self._jobs.pop(job.id, None)
+        for job in expired:
+            shutil.rmtree(job.directory, ignore_errors=True)
+
+    @staticmethod
+    def _page(job: ScoringJob, offset: int, limit: int) -> Tuple[int, int, int]:
+        # Seules les lignes comptées dans rows_done sont garanties écrites
+        total = job.rows_done
+        start = max(0, min(offset, total))
+        return total, start, max(start, min(start + limit, total))
+
+    def read_results(self, job: ScoringJob, offset: int, limit: int) -> ChunkScores:
+        """Page [offset, offset+limit) des résultats déjà écrits (lecture memmap)."""
+        total, start, stop = self._page(job, offset, limit)
+        if stop == start:
+            return np.empty(0), np.empty(0, dtype=np.int32), job.messages
+        probabilities = np.memmap(job.directory / _PROBABILITY_FILE, dtype=np.float64, mode="r", shape=(total,))
+        error_codes = np.memmap(job.directory / _ERROR_FILE, dtype=np.int32, mode="r", shape=(total,))
+        return np.array(probabilities[start:stop]), np.array(error_codes[start:stop]), job.messages
+
+    def read_ids(self, job: ScoringJob, offset: int, limit: int) -> List[Any]:
+        """Identifiants de la même page que read_results (`id_column` du job)."""
+        total, start, stop = self._page(job, offset, limit)
+        if stop == start or not job.id_column:
+            return []
+        if job.fmt in ("csv", "ndjson"):
+            ends = np.memmap(job.directory / _IDS_END_FILE, dtype=np.int64, mode="r", shape=(total,))
+            begin = int(ends[start - 1]) if start else 0
+            bounds = np.array(ends[start:stop]) - begin
+            with open(job.directory / _IDS_JSON_FILE, "rb") as f:
+                f.seek(begin)
+                data = f.read(int(bounds[-1]))
+            return [json.loads(data[a:b]) for a, b in zip(np.concatenate(([0], bounds[:-1])), bounds)]
+
+        parts = []
+        seen = 0
+        with pa.memory_map(str(job.directory / _IDS_ARROW_FILE)) as source:
+            # Lots complets uniquement: la lecture s'arrête au dernier lot de la page
+            for batch in pa.ipc.open_stream(source):
+                if seen + batch.num_rows > start:
+                    first = max(start, seen)
+                    parts.append(batch.column(0).slice(first - seen, min(stop, seen + batch.num_rows) - first))
+                seen += batch.num_rows
+                if seen >= stop:
+                    break
+        return [value for part in parts for value in part.to_pylist()]
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def _ensure_workers(self) -> None:
+        with self._lock:
+            self._workers = [t for t in self._workers if t.is_alive()]
+            while len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._worker, name=f"scoring-job-{len(self._workers)}",
+                                          daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if not job.cancel_requested.is_set():
+                    self._run(job)
+            except Exception as e:  # ne jamais tuer le worker
+                print(f"[ERROR] Job {job.id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _finish(self, job: ScoringJob, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        with self._lock:
+            orphan = job.id not in self._jobs
+        if orphan:
+            # Supprimé (DELETE) pendant l'exécution
+            shutil.rmtree(job.directory, ignore_errors=True)
+        elif status != "completed":
+            job.input_path.unlink(missing_ok=True)
+
+    def _run(self, job: ScoringJob) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        ids_out = _IdsWriter(job.directory)
+        try:
+            with open(job.directory / _PROBABILITY_FILE, "wb") as prob_out, \
+                    open(job.directory / _ERROR_FILE, "wb") as error_out:
+                for scores, ids, progress in self._iter_scores(job):
+                    if job.cancel_requested.is_set():
+                        raise JobCancelled()
+                    probabilities, error_codes, messages = scores
+                    error_codes = job._global_codes(error_codes, messages)
+                    if ids is not None:
+                        ids_out.write(ids)
+                    probabilities.astype(np.float64, copy=False).tofile(prob_out)
+                    error_codes.astype(np.int32, copy=False).tofile(error_out)
+                    prob_out.flush()
+                    error_out.flush()
+                    # rows_done en dernier: read_results ne lit jamais une ligne incomplète
+                    job.invalid_rows += int((error_codes >= 0).sum())
+                    job.rows_done += len(probabilities)
+                    job.progress = progress
+        except JobCancelled:
+            self._finish(job, "cancelled")
+            return
+        except Exception as e:
+            self._finish(job, "failed", str(e)[:500])
+            return
+        finally:
+            ids_out.close()
+        job.progress = 1.0
+        self._finish(job, "completed")
+        # L'entrée n'est plus utile une fois le job terminé
+        job.input_path.unlink(missing_ok=True)
+
+    def _iter_scores(self, job: ScoringJob) -> Iterator[Tuple[ChunkScores, Any, float]]:
+        """(scores d'un paquet, identifiants ou None, progression 0-1) pour chaque paquet de l'entrée."""
+        size = max(1, job.input_path.stat().st_size)
+        required = self.required_columns + ([job.id_column] if job.id_column else [])
+        if job.fmt in ("csv", "ndjson"):
+            with open(job.input_path, "rb") as source:
+                reader = BulkReader(source, job.fmt)
+                reader.start()
+                missing = reader.missing_columns(required)
+                if missing:
+                    raise ValueError(f"Colonnes manquantes: {', '.join(missing)}")
+                for rows in reader.chunks(self.chunk_rows):
+                    ids = [row.get(job.id_column) for row in rows] if job.id_column else None
+                    yield self._score_rows(rows), ids, reader.bytes_read / size
+        elif job.fmt == "parquet":
+            parquet = pq.ParquetFile(job.input_path, memory_map=True)
+            self._check_columns(parquet.schema_arrow.names, required)
+            total = max(1, parquet.metadata.num_rows)
+            done = 0
+            for batch in parquet.iter_batches(batch_size=self.chunk_rows, columns=required):
+                done += batch.num_rows
+                table = pa.Table.from_batches([batch])
+                yield self._score_table(table, job.strict), _table_ids(table, job.id_column), done / total
+        else:
+            with pa.memory_map(str(job.input_path)) as source:
+                for table, position in _iter_arrow_slices(source, self.chunk_rows):
+                    self._check_columns(table.column_names, required)
+                    yield (self._score_table(table, job.strict), _table_ids(table, job.id_column),
+                           position / size)
+
+    @staticmethod
+    def _check_columns(names: Sequence[str], required: Sequence[str]) -> None:
+        missing = [c for c in required if c not in names]
+        if missing:
+            raise ValueError(f"Colonnes manquantes: {', '.join(missing)}")
+
+
+def _table_ids(table: Any, id_column: Optional[str]) -> Any:
+    """Colonne d'identifiant d'un paquet Arrow (tableau contigu, type d'origine)."""
+    return table.column(id_column).combine_chunks() if id_column else None
+
+
+def _iter_arrow_slices(source: Any, chunk_rows: int) -> Iterator[Tuple[Any, int]]:
+    """Tranches zéro-copie d'un fichier Arrow IPC (flux ou fichier) mappé en mémoire."""
+    try:
+        reader = pa.ipc.open_stream(source)
+        batches: Iterator[Any] = iter(reader)
+    except pa.ArrowInvalid:
+        # Format fichier Arrow (.arrow / Feather v2)
+        source.seek(0)
+        file_reader = pa.ipc.open_file(source)
+        batches = (file_reader.get_batch(i) for i in range(file_reader.num_record_batches))
+    for batch in batches:
+        position = source.tell()
+        for start in range(0, batch.num_rows, chunk_rows):
+            yield pa.Table.from_batches([batch.slice(start, chunk_rows)]), position
+
+
+def copy_upload(source: IO[bytes], target: Path) -> None:
+    """Copie un fichier reçu (spool multipart) vers le répertoire du job."""
+    with open(target, "wb") as out:
+        shutil.copyfileobj(source, out, length=1024 * 1024)
@@ -9,23 +9,81 @@ import os
 import random
 import re
 import time
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 import feedparser
 import folium
-import requests
-from bs4 import BeautifulSoup
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_groq import ChatGroq
 
+from radar_hosts import HOSTS, HostCircuitOpen
+from radar_html import find_feed_link, iter_headlines
+from radar_store import create_cache
+
 logger = logging.getLogger(__name__)
 
+# Callback de progression du pipeline (ex: diffusion SSE), appelé depuis le thread du pipeline
+EventCallback = Optional[Callable[[Dict[str, Any]], None]]
+
+# Nombre d'actualités envoyées à Groq par appel (0 = un seul appel pour tout le lot).
+# Le découpage permet de publier les premières alertes avant la fin de l'analyse.
+LLM_CHUNK_SIZE = int(os.getenv("RADAR_LLM_CHUNK_SIZE", "10"))
+
+
+# Observateurs de durée par étape (fetch, parse, filter, llm, render): fn(stage, secondes, labels).
+# Liste vide = aucune mesure (aucun coût sur le chemin normal).
+STAGE_OBSERVERS: List[Callable[[str, float, Dict[str, Any]], None]] = []
+
+
+@contextmanager
+def _stage(name: str, **labels: Any) -> Iterator[None]:
+    if not STAGE_OBSERVERS:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        for observer in list(STAGE_OBSERVERS):
+            try:
+                observer(name, elapsed, labels)
+            except Exception as e:
+                logger.debug("Observateur d'étape en erreur (%s): %s", name, e)
+
+
+def _emit(on_event: EventCallback, event_type: str, **data: Any) -> None:
+    """Notifie un événement de progression sans jamais casser le pipeline."""
+    if on_event is None:
+        return
+    try:
+        on_event({"type": event_type, "data": data})
+    except Exception as e:
+        logger.debug("Callback d'événement en erreur (%s): %s", event_type, e)
+
 # ============================================================
 # 1. CONFIGURATION GROQ
 # ============================================================
 
-def _build_llm() -> ChatGroq:
+# Fabrique de LLM de remplacement (rejeu hors-ligne, LLM local): voir radar_replay
+_LLM_FACTORY: Optional[Callable[[], Any]] = None
+
+
+def set_llm_factory(factory: Optional[Callable[[], Any]]) -> None:
+    """Remplace ChatGroq par tout objet exposant `invoke(messages)` (None = Groq)."""
+    global _LLM_FACTORY
+    _LLM_FACTORY = factory
+
+
+def _build_llm() -> Any:
+    if _LLM_FACTORY is not None:
+        return _LLM_FACTORY()
+    return _build_groq_llm()
+
+
+def _build_groq_llm() -> ChatGroq:
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         raise RuntimeError("GROQ_API_KEY manquant (définissez-le dans python_api/.env ou dans vos variables d'environnement)")
@@ -229,46 +287,54 @@ def is_senegal_related(text: str) -> bool:
 # 4. SCRAPER OPTIMISÉ AVEC FILTRAGE
 # ============================================================
 
-def find_rss_feed(home_url: str, timeout: int = 5) -> str:
-    """Trouve le flux RSS d'un site."""
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
+def find_rss_feed(home_url: str, timeout: Optional[float] = None) -> str:
+    """Trouve le flux RSS d'un site (timeout adaptatif par hôte si non fourni)."""
 
     try:
-        r = requests.get(home_url, timeout=timeout, headers=headers)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-
-        link_tag = soup.find("link", attrs={"type": "application/rss+xml"})
-        if link_tag and link_tag.get("href"):
-            href = link_tag["href"]
+        with _stage("fetch", site=home_url):
+            r = HOSTS.get(home_url, timeout=timeout, stream=True)
+        # Lecture en flux du <head> uniquement (arrêt au <body>)
+        with r, _stage("parse", site=home_url):
+            r.raise_for_status()
+            href = find_feed_link(r)
+        if href:
             if href.startswith("/"):
                 from urllib.parse import urljoin
 
                 return urljoin(home_url, href)
             return href
+    except HostCircuitOpen:
+        return ""
     except Exception:
         pass
 
     for path in ["/rss", "/feed", "/feeds/posts/default", "/rss.xml", "/feed.xml"]:
         try:
             candidate = home_url.rstrip("/") + path
-            rr = requests.get(candidate, timeout=timeout, headers=headers)
+            with _stage("fetch", site=home_url):
+                rr = HOSTS.get(candidate, timeout=timeout)
             if rr.status_code == 200 and (
                 "xml" in rr.headers.get("content-type", "")
                 or rr.text.strip().startswith("<?xml")
             ):
                 return candidate
+        except HostCircuitOpen:
+            # Hôte mort: inutile de sonder les autres chemins
+            break
         except Exception:
             continue
 
     return ""
 
 
-def scrape_senegal_news(limit_per_site: int = 10, global_limit: int = 30) -> List[Dict[str, Any]]:
+def scrape_senegal_news(
+    limit_per_site: int = 10,
+    global_limit: int = 30,
+    on_event: EventCallback = None,
+) -> List[Dict[str, Any]]:
     """Scrape uniquement les actualités sénégalaises liées à des incidents sensibles."""
 
     all_news: List[Dict[str, Any]] = []
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
 
     keywords = [
         "manifestation",
@@ -306,75 +372,98 @@ def scrape_senegal_news(limit_per_site: int = 10, global_limit: int = 30) -> Lis
         "chaos",
     ]
 
-    for site in SENEGAL_NEWS_SITES:
+    for site_index, site in enumerate(SENEGAL_NEWS_SITES, 1):
         site_articles = 0
+        site_started = time.perf_counter()
+
+        if HOSTS.is_open(site):
+            # Disjoncteur ouvert: l'hôte est ignoré jusqu'à la fin du backoff
+            _emit(on_event, "site_fetched", site=site, index=site_index,
+                  total=len(SENEGAL_NEWS_SITES), articles=0, skipped=True)
+            continue
 
         # RSS
-        rss_url = find_rss_feed(site)
+        with _stage("find_rss_feed", site=site):
+            rss_url = find_rss_feed(site)
         if rss_url:
             try:
-                feed = feedparser.parse(rss_url)
-                for entry in feed.entries[:20]:
-                    title = entry.get("title", "")
-                    summary = entry.get("summary", "") or entry.get("description", "")
-                    full_text = f"{title} {summary}"
-
-                    if not is_senegal_related(full_text):
-                        continue
-
-                    if any(kw in full_text.lower() for kw in keywords):
-                        all_news.append(
-                            {
-                                "title": title,
-                                "summary": (summary or "")[:200],
-                                "date": entry.get("published", "Récent"),
-                                "link": entry.get("link", site),
-                                "source": site,
-                            }
-                        )
-                        site_articles += 1
-                        if site_articles >= limit_per_site:
-                            break
+                # Téléchargement via l'ordonnanceur (feedparser n'applique aucun timeout)
+                with _stage("fetch", site=site):
+                    content = HOSTS.get(rss_url).content
+                with _stage("parse", site=site):
+                    feed = feedparser.parse(content)
+                with _stage("filter", site=site):
+                    for entry in feed.entries[:20]:
+                        title = entry.get("title", "")
+                        summary = entry.get("summary", "") or entry.get("description", "")
+                        full_text = f"{title} {summary}"
+
+                        if not is_senegal_related(full_text):
+                            continue
+
+                        if any(kw in full_text.lower() for kw in keywords):
+                            all_news.append(
+                                {
+                                    "title": title,
+                                    "summary": (summary or "")[:200],
+                                    "date": entry.get("published", "Récent"),
+                                    "link": entry.get("link", site),
+                                    "source": site,
+                                }
+                            )
+                            site_articles += 1
+                            if site_articles >= limit_per_site:
+                                break
             except Exception as e:
                 logger.warning("Erreur RSS (%s): %s", site, str(e)[:200])
 
         # Fallback HTML
         if site_articles < max(3, limit_per_site // 2):
             try:
-                r = requests.get(site, headers=headers, timeout=8)
-                soup = BeautifulSoup(r.text, "html.parser")
-
-                for tag in soup.find_all(["h1", "h2", "h3", "a"], limit=40):
-                    text = tag.get_text(strip=True)
-                    if len(text) < 20 or len(text) > 220:
-                        continue
-
-                    if not is_senegal_related(text):
-                        continue
-
-                    if any(kw in text.lower() for kw in keywords):
-                        link = tag.get("href", site)
-                        if isinstance(link, str) and link.startswith("/"):
-                            from urllib.parse import urljoin
-
-                            link = urljoin(site, link)
-
-                        all_news.append(
-                            {
-                                "title": text,
-                                "summary": "",
-                                "date": "Récent",
-                                "link": link,
-                                "source": site,
-                            }
-                        )
-                        site_articles += 1
-                        if site_articles >= limit_per_site:
-                            break
+                with _stage("fetch", site=site):
+                    r = HOSTS.get(site, stream=True)
+
+                # Extraction en flux: la lecture s'arrête dès que le site a fourni assez d'articles
+                with r, _stage("parse", site=site):
+                    for text, href in iter_headlines(r, max_tags=40):
+                        if len(text) < 20 or len(text) > 220:
+                            continue
+
+                        if not is_senegal_related(text):
+                            continue
+
+                        if any(kw in text.lower() for kw in keywords):
+                            link = href or site
+                            if isinstance(link, str) and link.startswith("/"):
+                                from urllib.parse import urljoin
+
+                                link = urljoin(site, link)
+
+                            all_news.append(
+                                {
+                                    "title": text,
+                                    "summary": "",
+                                    "date": "Récent",
+                                    "link": link,
+                                    "source": site,
+                                }
+                            )
+                            site_articles += 1
+                            if site_articles >= limit_per_site:
+                                break
             except Exception as e:
                 logger.warning("Erreur HTML (%s): %s", site, str(e)[:200])
 
-        time.sleep(0.3)
+        _emit(
+            on_event,
+            "site_fetched",
+            site=site,
+            index=site_index,
+            total=len(SENEGAL_NEWS_SITES),
+            articles=site_articles,
+            via_rss=bool(rss_url),
+            elapsed_ms=round((time.perf_counter() - site_started) * 1000, 1),
+        )
 
         if len(all_news) >= global_limit:
             break
@@ -397,13 +486,8 @@ def _extract_json_object(text: str) -> str:
     return cleaned
 
 
-def analyze_with_groq(news_list: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Analyse IA: extraire des alertes structurées (JSON)."""
-
-    if not news_list:
-        return {"alerts": []}
-
-    llm = _build_llm()
+def _analyze_chunk(llm: ChatGroq, news_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Un appel Groq sur un lot d'actualités: retourne les alertes validées."""
 
     news_text = ""
     for i, n in enumerate(news_list, 1):
@@ -456,6 +540,7 @@ ATTENTION: REJETTE tout lieu hors Sénégal (USA, Syrie, etc.)
 
 JSON uniquement:"""
 
+    raw = ""
     try:
         response = llm.invoke(
             [
@@ -477,16 +562,74 @@ JSON uniquement:"""
             if is_senegal_related(f"{place} {info}"):
                 validated_alerts.append(alert)
 
-        return {"alerts": validated_alerts}
+        return validated_alerts
 
     except json.JSONDecodeError as e:
         logger.error("Erreur JSON Groq: %s", e)
         logger.debug("Réponse brute (début): %s", raw[:600])
-        return {"alerts": []}
+        return []
     except Exception as e:
         logger.error("Erreur Groq: %s", str(e)[:400])
+        return []
+
+
+def analyze_with_groq(
+    news_list: List[Dict[str, Any]],
+    on_event: EventCallback = None,
+    chunk_size: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Analyse IA: extraire des alertes structurées (JSON).
+
+    Les actualités sont envoyées par lots de `chunk_size` (défaut: LLM_CHUNK_SIZE)
+    afin que chaque lot terminé puisse être publié via `on_event` ("llm_chunk_done").
+    """
+
+    if not news_list:
         return {"alerts": []}
 
+    llm = _build_llm()
+
+    size = LLM_CHUNK_SIZE if chunk_size is None else chunk_size
+    if size <= 0:
+        size = len(news_list)
+    chunks = [news_list[i:i + size] for i in range(0, len(news_list), size)]
+
+    alerts: List[Dict[str, Any]] = []
+    seen = set()
+    for chunk_index, chunk in enumerate(chunks, 1):
+        started = time.perf_counter()
+        with _stage("llm", chunk=chunk_index):
+            raw_alerts = _analyze_chunk(llm, chunk)
+        chunk_alerts = []
+        for alert in raw_alerts:
+            # Deux lots peuvent remonter le même incident
+            key = _alert_key(alert)
+            if key in seen:
+                continue
+            seen.add(key)
+            chunk_alerts.append(alert)
+        alerts.extend(chunk_alerts)
+
+        _emit(
+            on_event,
+            "llm_chunk_done",
+            chunk=chunk_index,
+            chunks=len(chunks),
+            news_count=len(chunk),
+            alerts=chunk_alerts,
+            elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+        )
+
+    return {"alerts": alerts}
+
+
+def _alert_key(alert: Dict[str, Any]) -> Tuple[str, str, str]:
+    return (
+        str(alert.get("place", "")).strip().lower(),
+        str(alert.get("type", "")).strip().upper(),
+        str(alert.get("info", "")).strip().lower(),
+    )
+
 
 # ============================================================
 # 6. CARTE
@@ -593,46 +736,140 @@ def create_interactive_map(alerts: List[Dict[str, Any]]) -> folium.Map:
 
 
 def render_map_html(alerts: List[Dict[str, Any]]) -> str:
-    m = create_interactive_map(alerts)
-    return m.get_root().render()
+    with _stage("render"):
+        m = create_interactive_map(alerts)
+        return m.get_root().render()
 
 
 # ============================================================
 # 7. CACHE + PIPELINE
 # ============================================================
 
-_CACHE: Dict[str, Any] = {
-    "timestamp": 0.0,
-    "result": None,
-}
+# Instantané partagé entre les workers (SQLite WAL): résultat, articles et carte rendue
+SHARED_CACHE = create_cache()
+
+# Consultations du cache par issue (hit, miss, refresh forcé, instantané périmé servi pendant le run d'un
+# autre worker, attente de ce run), exposées par /metrics
+_CACHE_STATS: Dict[str, int] = {"hit": 0, "miss": 0, "refresh": 0, "stale": 0, "wait": 0}
 
 
 def has_cached_result() -> bool:
-    return _CACHE.get("result") is not None
+    return SHARED_CACHE.version() > 0
 
 
 def get_cached_result() -> Optional[Dict[str, Any]]:
-    return _CACHE.get("result")
+    snapshot = SHARED_CACHE.read()
+    return snapshot.result if snapshot is not None else None
+
+
+def get_cached_articles() -> Optional[List[Dict[str, Any]]]:
+    """Articles scrapés lors du dernier run (ceux envoyés au LLM)."""
+    snapshot = SHARED_CACHE.read()
+    return snapshot.articles if snapshot is not None else None
+
+
+def get_map_html(result: Dict[str, Any]) -> str:
+    """Carte du résultat: celle rendue au moment du run si c'est le dernier instantané, sinon rendue ici."""
+    snapshot = SHARED_CACHE.read()
+    if (snapshot is not None and snapshot.map_html is not None
+            and snapshot.result.get("generated_at") == result.get("generated_at")):
+        return snapshot.map_html
+    return render_map_html(result.get("alerts", []))
+
+
+def cache_stats() -> Dict[str, int]:
+    return dict(_CACHE_STATS)
 
 
-def run_radar(refresh: bool = False, cache_ttl_seconds: int = 600) -> Dict[str, Any]:
+def run_radar(
+    refresh: bool = False,
+    cache_ttl_seconds: int = 600,
+    on_event: EventCallback = None,
+) -> Dict[str, Any]:
+    """Pipeline complet (scraping + Groq) avec cache partagé entre workers.
+
+    Un seul worker exécute le pipeline à la fois (bail SHARED_CACHE); pendant
+    ce run, les autres servent l'instantané périmé s'il y en a un (sauf
+    refresh forcé) et attendent sinon son instantané, sans relancer scraping
+    et LLM.
+
+    `on_event` reçoit la progression du run exécuté ici: run_started,
+    site_fetched, scrape_done, llm_chunk_done, alert (une par alerte, `new` =
+    absente du résultat précédent) puis run_done. Celle d'un run exécuté par
+    un autre worker passe par le relais du bus d'événements (radar_events).
+    """
     now = time.time()
 
-    if not refresh and _CACHE["result"] is not None:
-        age = now - float(_CACHE["timestamp"])
-        if age < cache_ttl_seconds:
-            return _CACHE["result"]
+    snapshot = SHARED_CACHE.read()
+    if not refresh and snapshot is not None and now - snapshot.timestamp < cache_ttl_seconds:
+        _CACHE_STATS["hit"] += 1
+        return snapshot.result
+    _CACHE_STATS["refresh" if refresh else "miss"] += 1
+
+    seen = snapshot.version if snapshot is not None else 0
+    while not SHARED_CACHE.try_acquire():
+        if snapshot is not None and not refresh:
+            # Run en cours ailleurs: l'instantané périmé est servi tout de suite
+            _CACHE_STATS["stale"] += 1
+            return snapshot.result
+        # Pas d'instantané, ou refresh forcé: le résultat du run en cours vaut aussi pour lui
+        _CACHE_STATS["wait"] += 1
+        updated = SHARED_CACHE.wait_for_update(seen)
+        if updated is not None:
+            return updated.result
 
-    news = scrape_senegal_news()
-    alerts_result = analyze_with_groq(news)
+    try:
+        current = SHARED_CACHE.read()
+        if current is not None and current.version != seen:
+            # Un autre worker a terminé entre la lecture et la prise du bail
+            return current.result
+        return _run_pipeline(now, current.result if current is not None else {}, refresh, on_event)
+    finally:
+        SHARED_CACHE.release()
+
+
+def _run_pipeline(
+    now: float,
+    previous: Dict[str, Any],
+    refresh: bool,
+    on_event: EventCallback,
+) -> Dict[str, Any]:
+    known = {_alert_key(a) for a in previous.get("alerts", [])}
+
+    def _on_pipeline_event(event: Dict[str, Any]) -> None:
+        on_event(event)
+        if event.get("type") == "llm_chunk_done":
+            for alert in event["data"].get("alerts", []):
+                _emit(on_event, "alert", alert=alert, new=_alert_key(alert) not in known)
+
+    pipeline_event = _on_pipeline_event if on_event is not None else None
+
+    _emit(on_event, "run_started", refresh=refresh, sites=len(SENEGAL_NEWS_SITES))
+    news = scrape_senegal_news(on_event=pipeline_event)
+    _emit(on_event, "scrape_done", news_count=len(news))
+    with _stage("analyze_with_groq"):
+        alerts_result = analyze_with_groq(news, on_event=pipeline_event)
 
     result = {
         "generated_at": datetime.now(timezone.utc).isoformat(),
         "news_count": len(news),
         "alerts": alerts_result.get("alerts", []),
         "sources": list({n.get("source") for n in news if n.get("source")}),
+        "hosts": HOSTS.snapshot(),
     }
 
-    _CACHE["timestamp"] = now
-    _CACHE["result"] = result
+    try:
+        map_html: Optional[str] = render_map_html(result["alerts"])
+    except Exception as e:
+        # La carte sera rendue à la demande
+        logger.warning("Rendu de la carte Radar impossible: %s", e)
+        map_html = None
+    SHARED_CACHE.write(now, result, news, map_html)
+    _emit(
+        on_event,
+        "run_done",
+        generated_at=result["generated_at"],
+        news_count=result["news_count"],
+        alerts_count=len(result["alerts"]),
+    )
     return result
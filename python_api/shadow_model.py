@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -- coding: utf-8 --
+"""
+Modèle "shadow": un second modèle score le trafic réel hors du chemin des requêtes.
+
+Avant de promouvoir un nouveau best_recidivism_model.joblib, on le charge en
+shadow (SHADOW_MODEL_PATH). Chaque prédiction du modèle principal soumet ses
+vecteurs encodés et ses probabilités avec `submit()`: un simple ajout dans une
+file en mémoire, sans attente ni inférence. Un thread de fond vide la file par
+lots (SHADOW_BATCH_SIZE lignes), score le lot en un appel au modèle shadow et
+agrège:
+- l'accord avec le modèle principal (même niveau de risque, même décision au
+  seuil 0.5, écarts absolus de probabilité, matrice de confusion des niveaux)
+- la latence du modèle shadow (par lot et par ligne) et le délai de file
+
+Si le shadow ne suit pas, les soumissions au-delà de SHADOW_QUEUE_ROWS lignes
+sont écartées et comptées (`dropped`): le modèle principal n'attend jamais.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SHADOW_MODEL_PATH = os.getenv("SHADOW_MODEL_PATH", "")
+SHADOW_QUEUE_ROWS = int(os.getenv("SHADOW_QUEUE_ROWS", "50000"))
+SHADOW_BATCH_SIZE = int(os.getenv("SHADOW_BATCH_SIZE", "512"))
+SHADOW_FLUSH_INTERVAL_SECONDS = float(os.getenv("SHADOW_FLUSH_INTERVAL_SECONDS", "0.5"))
+
+RISK_LEVELS = ("low", "medium", "high", "critical")
+DECISION_THRESHOLD = 0.5
+# Latences récentes conservées pour les quantiles de /shadow
+LATENCY_SAMPLES_KEPT = 1000
+
+_SORTED_LEVELS = np.array(sorted(RISK_LEVELS))
+_SORTED_TO_INDEX = np.array([RISK_LEVELS.index(level) for level in _SORTED_LEVELS])
+
+ProbabilityFn = Callable[[Any, np.ndarray], np.ndarray]
+RiskLevelFn = Callable[[np.ndarray], np.ndarray]
+BatchObserver = Callable[[float, int], None]
+
+
+def _level_index(levels: np.ndarray) -> np.ndarray:
+    """Indice dans RISK_LEVELS de chaque niveau de risque (vectorisé)."""
+    return _SORTED_TO_INDEX[np.searchsorted(_SORTED_LEVELS, levels)]
+
+
+class ShadowScorer:
+    """File bornée + thread de scoring par lots pour un modèle secondaire."""
+
+    def __init__(
+        self,
+        probabilities: ProbabilityFn,
+        risk_levels: RiskLevelFn,
+        queue_rows: int = SHADOW_QUEUE_ROWS,
+        batch_size: int = SHADOW_BATCH_SIZE,
+        flush_interval: float = SHADOW_FLUSH_INTERVAL_SECONDS,
+    ):
+        self.probabilities = probabilities
+        self.risk_levels = risk_levels
+        self.queue_rows = max(1, queue_rows)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.model: Any = None
+        self.model_version: Optional[str] = None
+        self.batch_observers: List[BatchObserver] = []
+        self._queue: Deque[Tuple[np.ndarray, np.ndarray, float]] = deque()
+        self._queued = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reset()
+
+    @property
+    def enabled(self) -> bool:
+        return self.model is not None
+
+    @property
+    def depth(self) -> int:
+        return self._queued
+
+    def load(self, path: str) -> None:
+        """Charge le modèle shadow (joblib) et remet les statistiques à zéro."""
+        import hashlib
+        import warnings
+
+        import joblib
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            model = joblib.load(path)
+        digest = hashlib.sha256(Path(path).read_bytes()).hexdigest()[:12]
+        self.set_model(model, f"{type(model).__name__}:{digest}")
+
+    def set_model(self, model: Any, version: Optional[str] = None) -> None:
+        with self._lock:
+            self.model = model
+            self.model_version = version or (type(model).__name__ if model is not None else None)
+            self._queue.clear()
+            self._queued = 0
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stats: Dict[str, int] = {"submitted": 0, "dropped": 0, "scored": 0, "failed": 0, "batches": 0}
+            self._same_level = 0
+            self._same_decision = 0
+            self._abs_diff_sum = 0.0
+            self._abs_diff_max = 0.0
+            self._diff_sum = 0.0
+            self._confusion = np.zeros((len(RISK_LEVELS), len(RISK_LEVELS)), dtype=np.int64)
+            self._batch_seconds: Deque[float] = deque(maxlen=LATENCY_SAMPLES_KEPT)
+            self._row_seconds_sum = 0.0
+            self._lag_seconds: Deque[float] = deque(maxlen=LATENCY_SAMPLES_KEPT)
+
+    # ------------------------------------------------------------------
+    # Chemin des requêtes
+    # ------------------------------------------------------------------
+
+    def submit(self, features: np.ndarray, primary_probabilities: np.ndarray) -> None:
+        """Met en file des lignes déjà scorées par le modèle principal (O(1), sans inférence)."""
+        if self.model is None or len(features) == 0:
+            return
+        n = len(features)
+        with self._lock:
+            self.stats["submitted"] += n
+            if self._queued + n > self.queue_rows:
+                self.stats["dropped"] += n
+                return
+            self._queue.append((features, np.asarray(primary_probabilities, dtype=float), time.perf_counter()))
+            self._queued += n
+            full = self._queued >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    # ------------------------------------------------------------------
+    # Thread de fond
+    # ------------------------------------------------------------------
+
+    def _drain(self) -> List[Tuple[np.ndarray, np.ndarray, float]]:
+        with self._lock:
+            chunks, rows = [], 0
+            while self._queue and rows < self.batch_size:
+                chunk = self._queue.popleft()
+                chunks.append(chunk)
+                rows += len(chunk[0])
+            self._queued -= rows
+            return chunks
+
+    def _score(self, chunks: List[Tuple[np.ndarray, np.ndarray, float]]) -> None:
+        model = self.model
+        features = np.vstack([c[0] for c in chunks])
+        primary = np.concatenate([c[1] for c in chunks])
+        started = time.perf_counter()
+        try:
+            shadow = np.asarray(self.probabilities(model, features), dtype=float)
+        except Exception as e:
+            with self._lock:
+                self.stats["failed"] += len(features)
+            print(f"[WARN] Shadow: échec du scoring d'un lot de {len(features)} lignes: {e}")
+            return
+        finished = time.perf_counter()
+        elapsed = finished - started
+
+        primary_levels = self.risk_levels(primary)
+        shadow_levels = self.risk_levels(shadow)
+        confusion = np.zeros((len(RISK_LEVELS), len(RISK_LEVELS)), dtype=np.int64)
+        np.add.at(confusion, (_level_index(primary_levels), _level_index(shadow_levels)), 1)
+        diff = shadow - primary
+        with self._lock:
+            if model is not self.model:  # modèle remplacé pendant le lot
+                return
+            self.stats["scored"] += len(features)
+            self.stats["batches"] += 1
+            self._same_level += int(np.sum(primary_levels == shadow_levels))
+            self._same_decision += int(np.sum((primary >= DECISION_THRESHOLD) == (shadow >= DECISION_THRESHOLD)))
+            self._abs_diff_sum += float(np.abs(diff).sum())
+            self._abs_diff_max = max(self._abs_diff_max, float(np.abs(diff).max()))
+            self._diff_sum += float(diff.sum())
+            self._confusion += confusion
+            self._batch_seconds.append(elapsed)
+            self._row_seconds_sum += elapsed
+            self._lag_seconds.extend(finished - c[2] for c in chunks)
+        for observer in list(self.batch_observers):
+            observer(elapsed, len(features))
+
+    def flush(self) -> None:
+        """Score tout ce qui est en file (dans le thread appelant)."""
+        while True:
+            chunks = self._drain()
+            if not chunks:
+                return
+            self._score(chunks)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # ------------------------------------------------------------------
+    # Rapport
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _quantiles(samples: List[float]) -> Optional[Dict[str, float]]:
+        if not samples:
+            return None
+        values = np.quantile(np.asarray(samples), [0.5, 0.95, 0.99])
+        return {name: round(float(v) * 1000, 3) for name, v in zip(("p50_ms", "p95_ms", "p99_ms"), values)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            scored = stats["scored"]
+            confusion = self._confusion.copy()
+            agreement = {
+                "risk_level": round(self._same_level / scored, 4) if scored else None,
+                "decision": round(self._same_decision / scored, 4) if scored else None,
+                "mean_abs_diff": round(self._abs_diff_sum / scored, 4) if scored else None,
+                "max_abs_diff": round(self._abs_diff_max, 4) if scored else None,
+                # > 0: le modèle shadow donne en moyenne des probabilités plus élevées
+                "mean_diff": round(self._diff_sum / scored, 4) if scored else None,
+            }
+            batch_seconds = list(self._batch_seconds)
+            lag_seconds = list(self._lag_seconds)
+            row_seconds = self._row_seconds_sum
+        return {
+            "enabled": self.enabled,
+            "model_version": self.model_version,
+            "queue": {"rows": self._queued, "capacity": self.queue_rows},
+            "counts": stats,
+            "agreement": agreement,
+            # Lignes: niveau du modèle principal, colonnes: niveau du shadow
+            "confusion": {
+                primary: {shadow: int(confusion[i, j]) for j, shadow in enumerate(RISK_LEVELS)}
+                for i, primary in enumerate(RISK_LEVELS)
+            },
+            "latency": {
+                "batch": self._quantiles(batch_seconds),
+                "per_row_us": round(row_seconds / scored * 1e6, 2) if scored else None,
+                "queue_lag": self._quantiles(lag_seconds),
+            },
+        }
@@ -0,0 +1,53 @@
+# -- coding: utf-8 --
+"""Fixtures communes: API avec un modèle de substitution, répertoires temporaires."""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+_TMP = Path(tempfile.mkdtemp(prefix="seentu-tests-"))
+
+# Avant l'import de main: aucun fichier écrit dans l'arbre du dépôt
+os.environ.setdefault("AUDIT_DIR", str(_TMP / "audit"))
+os.environ.setdefault("SCORING_JOBS_DIR", str(_TMP / "jobs"))
+os.environ.setdefault("ARTICLES_INDEX_DIR", str(_TMP / "search_index"))
+os.environ.setdefault("RADAR_SHARED_CACHE", "0")
+# Tampon et file d'audit petits: les tests de masse les dépassent largement
+os.environ.setdefault("AUDIT_BUFFER_SIZE", "500")
+os.environ.setdefault("AUDIT_QUEUE_ROWS", "2000")
+
+sys.path[:0] = [str(ROOT), str(ROOT / "benchmarks")]
+
+
+@pytest.fixture(scope="session")
+def synthetic_model():
+    from bench_api import build_synthetic_model
+
+    return build_synthetic_model(rows=1000)
+
+
+@pytest.fixture
+def client(synthetic_model):
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        # Le démarrage recharge le modèle (absent ici): substitut posé après
+        main.model = synthetic_model
+        yield test_client
+
+
+def wait_for_job(client, job_id: str, timeout: float = 30.0) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/batch_predict/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed", "cancelled"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} non terminé après {timeout} s")
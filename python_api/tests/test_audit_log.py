@@ -0,0 +1,87 @@
+# -- coding: utf-8 --
+import gzip
+import io
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+import main
+from bench_api import random_profile
+
+ROWS = 12000
+
+
+def _profiles(n, seed=0):
+    rng = random.Random(seed)
+    return [random_profile(rng) for _ in range(n)]
+
+
+def _csv(profiles):
+    lines = [",".join(main.feature_names)]
+    lines += [",".join(str(p[name]) for name in main.feature_names) for p in profiles]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _audited_rows(endpoint):
+    directory = Path(main.AUDIT_LOG.directory)
+    count = 0
+    for path in directory.glob("predictions-*.jsonl.gz"):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            count += sum(1 for line in f if json.loads(line).get("endpoint") == endpoint)
+    if main.pa is not None:
+        for path in directory.glob("batches-*.arrows"):
+            with main.pa.ipc.open_stream(path.read_bytes()) as reader:
+                for batch in reader:
+                    count += batch.column(batch.schema.get_field_index("endpoint")).to_pylist().count(endpoint)
+    return count
+
+
+def test_bulk_scoring_beyond_buffer_is_fully_audited(client):
+    assert ROWS > main.AUDIT_LOG.capacity + main.AUDIT_LOG.queue_rows
+    before = dict(main.AUDIT_LOG.stats)
+
+    response = client.post("/batch_predict/stream?output_format=ndjson", content=_csv(_profiles(ROWS)),
+                           headers={"content-type": "text/csv"})
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == ROWS
+
+    stats = main.AUDIT_LOG.stats
+    assert stats["dropped"] == before["dropped"] == 0
+    assert stats["accepted"] - before["accepted"] == ROWS
+
+
+def test_columnar_scoring_beyond_buffer_is_fully_audited(synthetic_model):
+    pa = pytest.importorskip("pyarrow")
+    from fastapi.testclient import TestClient
+
+    profiles = _profiles(ROWS, seed=1)
+    table = pa.table({name: [p[name] for p in profiles] for name in main.feature_names})
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    with TestClient(main.app) as client:
+        main.model = synthetic_model
+        before = _audited_rows("batch_predict_columnar")
+        response = client.post("/batch_predict/columnar", content=sink.getvalue(),
+                               headers={"content-type": main.ARROW_STREAM_MEDIA_TYPE})
+        assert response.status_code == 200
+    # Arrêt: tout ce qui était en file est écrit
+    assert main.AUDIT_LOG.stats["dropped"] == 0
+    assert _audited_rows("batch_predict_columnar") - before == ROWS
+
+
+def test_columnar_batches_keep_arrow_columns():
+    pa = pytest.importorskip("pyarrow")
+    from audit_log import ArrowBatchSink, AuditBatch
+
+    inputs = {name: pa.chunked_array([pa.array(["a", "b"]).dictionary_encode()]) for name in ("Sexe", "Region")}
+    inputs["Age"] = main.np.array([20, 30])
+    batch = AuditBatch("batch_predict_columnar", "v1", inputs, main.np.zeros((2, 3)),
+                       main.np.array([0.1, 0.9]), main.np.array(["Faible", "Élevé"]))
+    table = ArrowBatchSink.table(batch)
+    assert table.num_rows == 2
+    assert table.schema.field("Sexe").type == pa.string()
+    assert table.column("features").to_pylist() == [[0.0] * 3] * 2
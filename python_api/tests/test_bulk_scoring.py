@@ -0,0 +1,112 @@
+# -- coding: utf-8 --
+import io
+import json
+
+import pytest
+
+import main
+from conftest import wait_for_job
+
+PROFILE = {
+    "Region_Name": "Dakar",
+    "Age": 25,
+    "Ethnie": "Wolof",
+    "Profession": "Étudiant",
+    "Ville_Actuelle": "Dakar",
+    "Type_Crime_Initial": "Vol",
+    "Plateforme_Principale": "Facebook",
+}
+
+# Lignes NDJSON valides pour le lecteur mais avec des catégories non textuelles
+NON_SCALAR_ROWS = [
+    PROFILE,
+    {**PROFILE, "Ethnie": ["x"]},
+    {**PROFILE, "Profession": {"a": 1}},
+    PROFILE,
+]
+
+
+def _ndjson(rows):
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
+
+
+def test_stream_rejects_non_scalar_categories_per_row(client):
+    response = client.post(
+        "/batch_predict/stream?output_format=ndjson",
+        content=_ndjson(NON_SCALAR_ROWS),
+        headers={"content-type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["row"] for r in results] == [0, 1, 2, 3]
+    assert "error" not in results[0] and "error" not in results[3]
+    assert "Ethnie" in results[1]["error"]
+    assert "Profession" in results[2]["error"]
+
+
+def test_job_rejects_non_scalar_categories_per_row(client):
+    response = client.post(
+        "/batch_predict/jobs?input_format=ndjson",
+        content=_ndjson(NON_SCALAR_ROWS),
+        headers={"content-type": "application/x-ndjson"},
+    )
+    assert response.status_code == 202
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "completed", job
+
+    page = client.get(f"/batch_predict/jobs/{job['job_id']}/results").json()
+    errors = [r.get("error") for r in page["results"]]
+    assert errors[0] is None and errors[3] is None
+    assert "Ethnie" in errors[1]
+    assert "Profession" in errors[2]
+
+
+def _pages(client, job_id, limit):
+    results, offset = [], 0
+    while offset is not None:
+        page = client.get(f"/batch_predict/jobs/{job_id}/results?offset={offset}&limit={limit}").json()
+        results += page["results"]
+        offset = page["next_offset"]
+    return results
+
+
+def test_job_results_keep_id_column_from_rows(client, monkeypatch):
+    monkeypatch.setattr(main.SCORING_JOBS, "chunk_rows", 3)
+    ids = [f"dossier-{i}" if i % 2 else i for i in range(10)]
+    rows = [{**PROFILE, "dossier": i} for i in ids]
+    response = client.post("/batch_predict/jobs?input_format=ndjson&id_column=dossier", content=_ndjson(rows),
+                           headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 202
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "completed", job
+
+    results = _pages(client, job["job_id"], limit=4)
+    assert [r["row"] for r in results] == list(range(10))
+    assert [r["dossier"] for r in results] == ids
+
+
+def test_job_results_keep_id_column_from_arrow(client, monkeypatch):
+    pa = pytest.importorskip("pyarrow")
+    monkeypatch.setattr(main.SCORING_JOBS, "chunk_rows", 3)
+    ids = list(range(100, 110))
+    table = pa.table({**{name: [PROFILE[name]] * 10 for name in main.feature_names}, "dossier": ids})
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    response = client.post("/batch_predict/jobs?input_format=arrow&id_column=dossier", content=sink.getvalue(),
+                           headers={"content-type": main.ARROW_STREAM_MEDIA_TYPE})
+    assert response.status_code == 202
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "completed", job
+
+    results = _pages(client, job["job_id"], limit=4)
+    assert [r["dossier"] for r in results] == ids
+
+
+def test_csv_job_fails_without_id_column(client):
+    csv = ",".join(PROFILE) + "\n" + ",".join(str(v) for v in PROFILE.values()) + "\n"
+    response = client.post("/batch_predict/jobs?input_format=csv&id_column=dossier", content=csv.encode("utf-8"),
+                           headers={"content-type": "text/csv"})
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "failed"
+    assert "dossier" in job["error"]
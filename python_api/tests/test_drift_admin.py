@@ -0,0 +1,29 @@
+# -- coding: utf-8 --
+import pytest
+
+import main
+import profiler
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(profiler, "ADMIN_TOKEN", "secret")
+    return "secret"
+
+
+@pytest.mark.parametrize("method", ["POST", "DELETE"])
+def test_drift_reference_without_admin_token_is_unavailable(client, monkeypatch, method):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "")
+    monkeypatch.setattr(profiler, "ADMIN_TOKEN", "")
+    response = client.request(method, "/drift/reference", headers={"X-Admin-Token": ""})
+    assert response.status_code == 503
+    assert "ADMIN_TOKEN" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("method", ["POST", "DELETE"])
+def test_drift_reference_checks_token_when_profiling_disabled(client, monkeypatch, admin_token, method):
+    monkeypatch.setattr(main, "PROFILING_ENABLED", False)
+    assert client.request(method, "/drift/reference", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    response = client.request(method, "/drift/reference", headers={"X-Admin-Token": admin_token})
+    assert response.status_code == 200
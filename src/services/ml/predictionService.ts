@@ -18,6 +18,9 @@ export interface PredictionResult {
   factors: {
     [key: string]: number;
   };
+  contributions?: {
+    [key: string]: number;
+  } | null;
 }
 
 export class RecidivePredictionService {